@@ -1,8 +1,12 @@
 #!/bin/bash
 set -e
 
-/bin/bash -c "python3 /home/$user/src/external_viz_manager/manage.py makemigrations"
-/bin/bash -c "python3 /home/$user/src/external_viz_manager/manage.py migrate"
+# migrations are part of the code base, they are only applied here; replicas
+# started against an up to date database can skip it with MIGRATE_ON_START=false
+if [ "${MIGRATE_ON_START:-true}" = "true" ]; then
+    /bin/bash -c "python3 /home/$user/src/external_viz_manager/manage.py migrate --noinput"
+fi
+
 /bin/bash -c "python3 /home/$user/src/external_viz_manager/manage.py create_superuser"
 
 sudo -E supervisord -n -c /etc/supervisord.conf
@@ -0,0 +1,136 @@
+"""
+Concurrency scaling of the async statistic routes against the threadpool ones.
+
+Both apps are driven in-process through httpx's ASGI transport, against the
+database configured in the environment (DATABASE_ENGINE, ...):
+
+    cd external_viz_manager
+    DJANGO_SETTINGS_MODULE=external_viz_manager.settings \
+        python -m benchmarks.async_vs_threadpool --seed --concurrency 1 8 32 128
+
+--seed creates a plant with --urls statistics if it does not exist yet. The
+in-process response cache is disabled unless --cache is given, so that every
+request reaches the database.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import statistics
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'external_viz_manager.settings')
+django.setup()
+
+import httpx
+from django.db import transaction
+from database.models import PlantInfo, Language, StatisticCategory, StatisticSubCategory, VizStatistics
+from database.models import StatisticCategoryLocalization, StatisticSubCategoryLocalization, StatisticsVar
+
+BENCH_PLANT = 'bench-plant'
+
+
+def seed(urls, language_code):
+    if PlantInfo.objects.filter(plant_id=BENCH_PLANT).exists():
+        return
+
+    with transaction.atomic():
+        language, _ = Language.objects.get_or_create(code=language_code, defaults={'name': language_code})
+        plant = PlantInfo.objects.create(plant_id=BENCH_PLANT, plant_name='Bench Plant', plant_location='bench', domain='bench.local')
+        sub_categories = []
+        for c in range(5):
+            category, _ = StatisticCategory.objects.get_or_create(category_id=f'bench-category-{c}')
+            StatisticCategoryLocalization.objects.get_or_create(
+                category=category, language=language, defaults={'category_name': f'Category {c}', 'url': f'/c/{c}'}
+            )
+            for s in range(4):
+                sub_category, _ = StatisticSubCategory.objects.get_or_create(category=category, sub_category_id=f'bench-sub-{s}')
+                StatisticSubCategoryLocalization.objects.get_or_create(
+                    sub_category=sub_category, language=language,
+                    defaults={'sub_category_name': f'Sub {c}.{s}', 'description': 'bench', 'url': f'/c/{c}/{s}'},
+                )
+                StatisticsVar.objects.create(sub_category=sub_category, variable_key='threshold', variable_value={'value': s})
+                sub_categories.append(sub_category)
+
+        VizStatistics.objects.bulk_create(
+            VizStatistics(plant=plant, sub_category=sub_categories[i % len(sub_categories)], url_name=f'url-{i}', url=f'https://bench.local/{i}')
+            for i in range(urls)
+        )
+
+
+async def drive(app, url, concurrency, total):
+    latencies = []
+    errors = 0
+    queue = asyncio.Queue()
+    for _ in range(total):
+        queue.put_nowait(None)
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://bench') as client:
+        async def worker():
+            nonlocal errors
+            while not queue.empty():
+                queue.get_nowait()
+                start = time.perf_counter()
+                response = await client.get(url)
+                latencies.append(time.perf_counter() - start)
+                if response.status_code != 200:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'concurrency': concurrency,
+        'requests': total,
+        'errors': errors,
+        'throughput': round(total / elapsed, 1),
+        'p50_ms': round(statistics.median(latencies) * 1000, 2),
+        'p95_ms': round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 2),
+        'max_ms': round(latencies[-1] * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32, 128])
+    parser.add_argument('--requests', type=int, default=400, help='requests per concurrency level')
+    parser.add_argument('--plant', default=BENCH_PLANT)
+    parser.add_argument('--language', default='de')
+    parser.add_argument('--seed', action='store_true')
+    parser.add_argument('--urls', type=int, default=200)
+    parser.add_argument('--cache', action='store_true', help='keep the in-process response cache enabled')
+    parser.add_argument('--json', action='store_true', help='print the report as json')
+    args = parser.parse_args()
+
+    if args.seed:
+        seed(args.urls, args.language)
+
+    from data_api.main import create_app
+    from data_api.cache.response_cache import response_cache
+    if not args.cache:
+        response_cache.max_entries = 0
+
+    url = f'/api/v1/statistic?plant_id={args.plant}&language={args.language}'
+    report = {}
+    for mode, async_routes in (('threadpool', False), ('async', True)):
+        app = create_app(async_routes=async_routes)
+        asyncio.run(drive(app, url, 1, 10))  # warm up connections and caches
+        report[mode] = [asyncio.run(drive(app, url, c, args.requests)) for c in args.concurrency]
+
+    if args.json:
+        json.dump(report, sys.stdout, indent=2)
+        return
+
+    print(f"{'mode':<11} {'conc':>5} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9} {'errors':>7}")
+    for mode, rows in report.items():
+        for row in rows:
+            print(f"{mode:<11} {row['concurrency']:>5} {row['throughput']:>9} {row['p50_ms']:>9} {row['p95_ms']:>9} {row['max_ms']:>9} {row['errors']:>7}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""
+dump_catalog / restore_catalog against Django's dumpdata / loaddata on a
+synthetic catalog, in the database configured in the environment
+(DATABASE_ENGINE, ...). It empties the catalog, use a scratch database:
+
+    cd external_viz_manager
+    python -m benchmarks.catalog_dump --plants 200 --urls 5
+
+    seconds   wall time of the dump or of the restore (snapshots not rebuilt)
+    KiB       size of the dump, dumpdata also gzipped for reference
+    peak KiB  Python allocation peak (tracemalloc), bounded for dump_catalog
+              and restore_catalog, growing with the catalog for the others
+"""
+import io
+import os
+import sys
+import gzip
+import json
+import time
+import argparse
+import tempfile
+import tracemalloc
+
+import data_api  # noqa: F401, sets Django up
+from django.db import transaction
+from django.core.management import call_command
+
+from database.models import PlantInfo
+from database.dump import TABLES, dump_catalog, restore_catalog, clear_catalog_tables
+from database.synthetic import PREFIX, generate_catalog
+
+LABELS = [f'database.{model.__name__}' for model, _ in TABLES]
+
+
+def measure(function):
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        function()
+        return time.perf_counter() - start, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run(size, directory):
+    clear_catalog_tables()
+    catalog = generate_catalog(snapshots=False, **size)
+    report = {'rows': sum(catalog.values())}
+
+    dump = io.BytesIO()
+    elapsed, peak = measure(lambda: dump_catalog(dump))
+    report['dump_catalog'] = {'seconds': elapsed, 'bytes': dump.tell(), 'peak': peak}
+
+    path = os.path.join(directory, 'catalog.json')
+    elapsed, peak = measure(lambda: call_command('dumpdata', *LABELS, output=path, verbosity=0))
+    with open(path, 'rb') as f:
+        gzipped = len(gzip.compress(f.read()))
+    report['dumpdata'] = {'seconds': elapsed, 'bytes': os.path.getsize(path), 'gzip_bytes': gzipped, 'peak': peak}
+
+    clear_catalog_tables()
+    dump.seek(0)
+    elapsed, peak = measure(lambda: restore_catalog(dump, snapshots=False))
+    report['restore_catalog'] = {'seconds': elapsed, 'peak': peak}
+
+    clear_catalog_tables()
+    # the snapshots loaddata's signals rebuild on commit are left out of the timing
+    with transaction.atomic():
+        elapsed, peak = measure(lambda: call_command('loaddata', path, verbosity=0))
+        report['loaddata'] = {'seconds': elapsed, 'peak': peak}
+        clear_catalog_tables()
+
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--plants', type=int, default=100)
+    parser.add_argument('--categories', type=int, default=8)
+    parser.add_argument('--sub-categories', type=int, default=5)
+    parser.add_argument('--languages', type=int, default=3)
+    parser.add_argument('--urls', type=int, default=5)
+    parser.add_argument('--variables', type=int, default=3)
+    parser.add_argument('--force', action='store_true', help='run even though the database holds a catalog that was not generated')
+    parser.add_argument('--json', action='store_true', help='print the report as json')
+    args = parser.parse_args()
+
+    if PlantInfo.objects.exclude(plant_id__startswith=f'{PREFIX}-').exists() and not args.force:
+        raise SystemExit("the database holds plants that were not generated and would be deleted, use a scratch database or --force")
+
+    size = dict(
+        plants=args.plants, categories=args.categories, sub_categories=args.sub_categories,
+        languages=args.languages, urls=args.urls, variables=args.variables,
+    )
+    with tempfile.TemporaryDirectory() as directory:
+        report = run(size, directory)
+
+    if args.json:
+        json.dump(report, sys.stdout, indent=2)
+        return
+
+    print(f"{report['rows']} rows")
+    print(f"{'':<16} {'seconds':>8} {'rows/s':>9} {'KiB':>9} {'gzip KiB':>9} {'peak KiB':>9}")
+    for name in ('dump_catalog', 'dumpdata', 'restore_catalog', 'loaddata'):
+        row = report[name]
+        kib = lambda key: f"{row[key] / 1024:.0f}" if key in row else ''
+        print(
+            f"{name:<16} {row['seconds']:>8.2f} {report['rows'] / row['seconds']:>9.0f} "
+            f"{kib('bytes'):>9} {kib('gzip_bytes'):>9} {kib('peak'):>9}"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,222 @@
+"""
+Latency, database queries and memory of the statistic routes across catalog
+sizes, on a synthetic catalog seeded into the database configured in the
+environment (DATABASE_ENGINE, ...):
+
+    cd external_viz_manager
+    python -m benchmarks.catalog_sizes --sizes small medium --output report.json
+    python -m benchmarks.catalog_sizes --sizes small medium --compare report.json
+
+For every size the generated catalog (database.synthetic) is replaced, then
+each route is requested --requests times, cycling through the plants:
+
+    statistic     /api/v1/statistic
+    category      /api/v1/statistic/{category_id}
+    sub_category  /api/v1/statistic/{category_id}/{sub_category_id}
+
+    p50/p95/mean  latency in ms, client side
+    queries       largest number of database queries of a request
+    peak KiB      largest Python allocation peak of a request (tracemalloc)
+
+The in-process response cache is disabled unless --cache is given, so that
+every request renders its catalog. The report (--json, --output) carries the
+commit, database and sizes, --compare prints the change against a former one.
+"""
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import statistics
+import subprocess
+import tracemalloc
+from datetime import datetime, timezone
+
+import httpx
+import django
+from django.db import connection
+
+from data_api import metrics
+from database.synthetic import PREFIX, LANGUAGE_PREFIX, generate_catalog, clear_catalog
+
+# plants x categories x sub categories per category x languages x urls per
+# plant and sub category x variables per sub category
+SIZES = {
+    'small': dict(plants=10, categories=5, sub_categories=4, languages=2, urls=2, variables=2),
+    'medium': dict(plants=50, categories=8, sub_categories=5, languages=3, urls=3, variables=3),
+    'large': dict(plants=200, categories=10, sub_categories=8, languages=3, urls=5, variables=4),
+}
+
+ROUTES = {
+    'statistic': '/api/v1/statistic',
+    'category': f'/api/v1/statistic/{PREFIX}-category-0',
+    'sub_category': f'/api/v1/statistic/{PREFIX}-category-0/{PREFIX}-sub-0',
+}
+
+
+def commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], check=True, capture_output=True, text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[max(int(len(values) * fraction) - 1, 0)]
+
+
+async def measure(app, urls, traced):
+    """
+    Request ``urls`` one after the other, the first ``traced`` of them under
+    tracemalloc. Returns the latencies, query counts and allocation peaks.
+    """
+    latencies, queries, peaks = [], [], []
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://bench') as client:
+        for n, url in enumerate(urls):
+            if n < traced:
+                tracemalloc.start()
+            start = time.perf_counter()
+            response = await client.get(url)
+            elapsed = time.perf_counter() - start
+            if n < traced:
+                peaks.append(tracemalloc.get_traced_memory()[1])
+                tracemalloc.stop()
+            else:
+                latencies.append(elapsed)
+            if response.status_code != 200:
+                raise RuntimeError(f"{url} answered {response.status_code}: {response.text[:200]}")
+            queries.append(int(response.headers["X-DB-Queries"]))
+
+    return latencies, queries, peaks
+
+
+def run_size(name, size, requests, async_routes, traced):
+    from data_api.main import create_app
+    from data_api.warmup import INDEXES
+    from data_api.cache.reference_data import reference_data
+
+    clear_catalog()
+    start = time.perf_counter()
+    catalog = generate_catalog(**size)
+    seeded = time.perf_counter() - start
+
+    # rows were bulk created, no signal told the indexes
+    for index in INDEXES:
+        index.invalidate()
+        index.get()
+
+    app = create_app(async_routes=async_routes)
+    routes = {}
+    for route, path in ROUTES.items():
+        urls = [
+            f'{path}?plant_id={PREFIX}-plant-{n % size["plants"]}&language={LANGUAGE_PREFIX}{n % size["languages"]}'
+            for n in range(traced + requests)
+        ]
+        latencies, queries, peaks = asyncio.run(measure(app, urls, traced))
+        routes[route] = {
+            'p50_ms': round(statistics.median(latencies) * 1000, 3),
+            'p95_ms': round(percentile(latencies, 0.95) * 1000, 3),
+            'mean_ms': round(statistics.fmean(latencies) * 1000, 3),
+            'queries': max(queries),
+            'peak_kib': round(max(peaks) / 1024, 1) if peaks else None,
+        }
+
+    return {
+        'size': name,
+        'catalog': catalog,
+        'seed_s': round(seeded, 2),
+        'reference_bytes': reference_data.get().footprint(),
+        'routes': routes,
+    }
+
+
+def compare(report, baseline):
+    """
+    Print the change of every latency, query count and peak against ``baseline``.
+    """
+    former = {result['size']: result for result in baseline['results']}
+    print(f"against {baseline['meta'].get('commit')} of {baseline['meta'].get('date')}")
+    print(f"{'size':<8} {'route':<13} {'metric':<9} {'before':>10} {'after':>10} {'change':>8}")
+    for result in report['results']:
+        before = former.get(result['size'])
+        if before is None:
+            continue
+        for route, row in result['routes'].items():
+            for metric, value in row.items():
+                previous = before['routes'].get(route, {}).get(metric)
+                if previous is None or value is None:
+                    continue
+                change = f"{(value - previous) / previous * 100:+.1f}%" if previous else ''
+                print(f"{result['size']:<8} {route:<13} {metric:<9} {previous:>10} {value:>10} {change:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', nargs='+', choices=SIZES, default=['small', 'medium'])
+    parser.add_argument('--requests', type=int, default=200, help='timed requests per route and size')
+    parser.add_argument('--traced', type=int, default=10, help='requests per route and size run under tracemalloc first')
+    parser.add_argument('--async', dest='async_routes', action='store_true', help='benchmark the async routes')
+    parser.add_argument('--cache', action='store_true', help='keep the in-process response cache enabled')
+    parser.add_argument('--keep', action='store_true', help='leave the last generated catalog in the database')
+    parser.add_argument('--json', action='store_true', help='print the report as json')
+    parser.add_argument('--output', help='write the report as json to this file')
+    parser.add_argument('--compare', help='report to compare against')
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    from data_api.cache.response_cache import response_cache
+    if not args.cache:
+        response_cache.max_entries = 0
+    metrics.DB_HEADERS = True
+
+    report = {
+        'meta': {
+            'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'commit': commit(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'async': args.async_routes,
+            'cache': args.cache,
+            'requests': args.requests,
+        },
+        'results': [],
+    }
+    try:
+        for name in args.sizes:
+            report['results'].append(run_size(name, SIZES[name], args.requests, args.async_routes, args.traced))
+    finally:
+        if not args.keep:
+            clear_catalog()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if baseline is not None:
+        compare(report, baseline)
+        return
+
+    if args.json:
+        json.dump(report, sys.stdout, indent=2)
+        return
+
+    print(f"{'size':<8} {'route':<13} {'p50 ms':>9} {'p95 ms':>9} {'mean ms':>9} {'queries':>8} {'peak KiB':>9}")
+    for result in report['results']:
+        for route, row in result['routes'].items():
+            print(
+                f"{result['size']:<8} {route:<13} {row['p50_ms']:>9} {row['p95_ms']:>9} {row['mean_ms']:>9} "
+                f"{row['queries']:>8} {row['peak_kib']!s:>9}"
+            )
+
+
+if __name__ == '__main__':
+    main()
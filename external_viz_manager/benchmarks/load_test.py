@@ -0,0 +1,250 @@
+"""
+Load test of the data API under concurrent dashboard polling: --users virtual
+dashboards each request a statistic route, wait --think-time seconds and
+start over, for --duration seconds.
+
+By default the app is driven in-process through httpx's ASGI transport, with
+the database configured in the environment (DATABASE_ENGINE, ...). --launch
+starts gunicorn with gunicorn.conf.py on a local port instead, --url targets
+a server that is already running:
+
+    cd external_viz_manager
+    python manage.py seed_catalog --plants 50 --languages 3
+    python -m benchmarks.load_test --users 64 --duration 30 --think-time 0.5
+    python -m benchmarks.load_test --launch --workers 4 --users 256 --json
+
+Every request picks a route after the weights of --mix, a plant among those
+of --plants (default: every plant) and a language, categories and sub
+categories among those of the catalog. With --etag a dashboard sends back
+the ETag it got for the same url, as browsers do, and 304s count as success.
+Reports the throughput, the latency percentiles and the error rate, in total
+and per route. Runs entirely offline.
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import subprocess
+
+import httpx
+
+ROUTES = ('statistic', 'category', 'sub_category')
+
+
+def parse_mix(value):
+    """
+    ``statistic=6,category=3,sub_category=1`` as weights by route.
+    """
+    weights = {}
+    for part in value.split(','):
+        route, _, weight = part.partition('=')
+        if route not in ROUTES:
+            raise argparse.ArgumentTypeError(f"unknown route {route}, one of {', '.join(ROUTES)}")
+        weights[route] = float(weight or 1)
+    return weights
+
+
+class Catalog:
+    """
+    Plants, languages and category / sub category pairs requests are drawn from.
+    """
+    def __init__(self, plant_ids=None, languages=None):
+        import data_api  # noqa: F401, sets Django up
+        from data_api.cache.reference_data import reference_data
+        from data_api.cache.plant_resolver import plant_resolver
+
+        registry = reference_data.get()
+        self.plants = plant_ids or sorted(plant_resolver.get().by_plant_id)
+        self.languages = languages or sorted(registry.languages_by_code)
+        self.categories = sorted(category.category_id for category in registry.categories.values())
+        self.sub_categories = sorted(registry.sub_categories_by_id)
+        if not self.plants or not self.languages:
+            raise SystemExit("no plant or language to request, seed a catalog with manage.py seed_catalog")
+
+    def url(self, route, rng):
+        query = f'plant_id={rng.choice(self.plants)}&language={rng.choice(self.languages)}'
+        if route == 'category' and self.categories:
+            return f'/api/v1/statistic/{rng.choice(self.categories)}?{query}'
+        if route == 'sub_category' and self.sub_categories:
+            category_id, sub_category_id = rng.choice(self.sub_categories)
+            return f'/api/v1/statistic/{category_id}/{sub_category_id}?{query}'
+        return f'/api/v1/statistic?{query}'
+
+
+def percentile(values, fraction):
+    return values[min(int(len(values) * fraction), len(values) - 1)] if values else None
+
+
+def summarize(samples, elapsed):
+    """
+    Throughput, latency percentiles in ms and error rate of ``samples``,
+    (latency, ok) pairs collected over ``elapsed`` seconds.
+    """
+    latencies = sorted(latency for latency, _ in samples)
+    errors = sum(not ok for _, ok in samples)
+    ms = lambda value: round(value * 1000, 2) if value is not None else None
+    return {
+        'requests': len(samples),
+        'throughput': round(len(samples) / elapsed, 1),
+        'p50_ms': ms(percentile(latencies, 0.50)),
+        'p95_ms': ms(percentile(latencies, 0.95)),
+        'p99_ms': ms(percentile(latencies, 0.99)),
+        'max_ms': ms(latencies[-1] if latencies else None),
+        'errors': errors,
+        'error_rate': round(errors / len(samples), 4) if samples else 0.0,
+    }
+
+
+async def run(client, catalog, args):
+    routes, weights = zip(*args.mix.items())
+    samples = {route: [] for route in routes}
+    statuses = {}
+    deadline = time.perf_counter() + args.duration
+
+    async def dashboard(user):
+        rng = random.Random(args.seed * 100003 + user)
+        etags = {}
+        # spread the first requests over the think time, like dashboards opened at different times
+        await asyncio.sleep(rng.uniform(0, args.think_time))
+        while time.perf_counter() < deadline:
+            route = rng.choices(routes, weights)[0]
+            url = catalog.url(route, rng)
+            headers = {'If-None-Match': etags[url]} if args.etag and url in etags else {}
+            start = time.perf_counter()
+            try:
+                response = await client.get(url, headers=headers)
+                status = response.status_code
+                if args.etag and 'ETag' in response.headers:
+                    etags[url] = response.headers['ETag']
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            samples[route].append((time.perf_counter() - start, status in (200, 304)))
+            statuses[status] = statuses.get(status, 0) + 1
+            if args.think_time:
+                # exponential think time, dashboards do not poll in lockstep
+                await asyncio.sleep(rng.expovariate(1 / args.think_time))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(dashboard(user) for user in range(args.users)))
+    elapsed = time.perf_counter() - start
+
+    return {
+        'total': summarize([sample for route in routes for sample in samples[route]], elapsed),
+        'routes': {route: summarize(samples[route], elapsed) for route in routes},
+        'statuses': {str(status): count for status, count in sorted(statuses.items(), key=str)},
+        'elapsed_s': round(elapsed, 2),
+    }
+
+
+async def in_process(catalog, args):
+    from data_api.main import create_app, warm_up
+
+    app = create_app(async_routes=args.async_routes)
+    await warm_up()
+    limits = httpx.Limits(max_connections=None)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://load', limits=limits) as client:
+        return await run(client, catalog, args)
+
+
+async def over_http(url, catalog, args):
+    limits = httpx.Limits(max_connections=args.users, max_keepalive_connections=args.users)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=args.timeout) as client:
+        return await run(client, catalog, args)
+
+
+def launch(args):
+    """
+    Start gunicorn on a free local port and wait until it is ready, its process and url.
+    """
+    import socket
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+
+    env = dict(os.environ, DATA_API_WORKERS=str(args.workers))
+    if args.async_routes:
+        env['DATA_API_ASYNC'] = 'true'
+    try:
+        server = subprocess.Popen(
+            ['gunicorn', '-c', 'gunicorn.conf.py', 'data_api.main:app', '-b', f'127.0.0.1:{port}'],
+            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+    except FileNotFoundError:
+        raise SystemExit("gunicorn is not installed, run in-process or against --url")
+    url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise SystemExit(f"gunicorn exited with {server.returncode}")
+        try:
+            if httpx.get(f'{url}/api/v1/ready', timeout=1).status_code == 200:
+                return server, url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+
+    server.terminate()
+    raise SystemExit("gunicorn did not get ready within 60s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=32, help='concurrent dashboards')
+    parser.add_argument('--duration', type=float, default=10, help='seconds')
+    parser.add_argument('--think-time', type=float, default=0.5, help='mean seconds between the requests of a dashboard')
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix('statistic=6,category=3,sub_category=1'),
+                        help='weights of the routes (default: statistic=6,category=3,sub_category=1)')
+    parser.add_argument('--plants', nargs='+', help='plant_ids to request (default: all)')
+    parser.add_argument('--languages', nargs='+', help='language codes to request (default: all)')
+    parser.add_argument('--etag', action='store_true', help='revalidate with If-None-Match like browsers do')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the request mix')
+    parser.add_argument('--async', dest='async_routes', action='store_true', help='serve the async routes')
+    parser.add_argument('--url', help='base url of a running data api instead of the in-process app')
+    parser.add_argument('--launch', action='store_true', help='start gunicorn with gunicorn.conf.py and target it')
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn workers with --launch')
+    parser.add_argument('--timeout', type=float, default=30, help='request timeout over http, seconds')
+    parser.add_argument('--json', action='store_true', help='print the report as json')
+    args = parser.parse_args()
+
+    catalog = Catalog(args.plants, args.languages)
+    server = None
+    try:
+        if args.launch:
+            server, args.url = launch(args)
+        if args.url:
+            report = asyncio.run(over_http(args.url, catalog, args))
+        else:
+            report = asyncio.run(in_process(catalog, args))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    report['config'] = {
+        'target': args.url or 'in-process',
+        'users': args.users,
+        'duration': args.duration,
+        'think_time': args.think_time,
+        'mix': args.mix,
+        'etag': args.etag,
+        'async': args.async_routes,
+    }
+
+    if args.json:
+        json.dump(report, sys.stdout, indent=2)
+        return
+
+    print(f"{'route':<13} {'requests':>9} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} {'errors':>7}")
+    for route, row in [('total', report['total'])] + list(report['routes'].items()):
+        print(
+            f"{route:<13} {row['requests']:>9} {row['throughput']:>8} {row['p50_ms']!s:>8} {row['p95_ms']!s:>8} "
+            f"{row['p99_ms']!s:>8} {row['max_ms']!s:>8} {row['errors']:>7}"
+        )
+    print(f"statuses: {report['statuses']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Cost of turning a statistic response into bytes, for a plant with --urls
+statistics spread over 5 categories x 4 sub categories:
+
+    cd external_viz_manager
+    python -m benchmarks.serialization --urls 500
+
+    json        jsonable_encoder + stdlib json, FastAPI's former default
+    orjson      jsonable_encoder + orjson, the default response class of create_app
+    encode      orjson alone, what a cache miss pays once in store()
+    pre-encoded the cached bytes wrapped in a response, what a cache hit pays
+
+Reports the wall and CPU time per response. No database is needed.
+"""
+import sys
+import json
+import time
+import argparse
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from data_api.responses import encode, DefaultResponse, EncodedResponse
+
+
+def payload(urls):
+    data = {}
+    for i in range(urls):
+        category_id, sub_category_id = f'category-{i % 5}', f'sub-category-{i % 20 // 5}'
+        category = data.setdefault(category_id, {"name": f"Category {category_id}", "items": {}})
+        item = category["items"].setdefault(sub_category_id, {
+            "name": f"Sub category {sub_category_id}",
+            "api_url": f"/api/{category_id}/{sub_category_id}",
+            "description": "Anteil der Störstoffe im angelieferten Abfall",
+            "var_names": {"threshold": {"value": i % 7, "unit": "%"}, "colors": ["#00ff00", "#ff0000"]},
+            "urls": [],
+        })
+        item["urls"].append({f"url-{i}": {"name": f"url-{i}", "url": f"https://grafana.example.com/d/{i}?orgId=1&kiosk"}})
+
+    return {
+        "language": "German",
+        "plant_name": "Bench Plant",
+        "plant_domain": "bench.example.com",
+        "plant_id": "bench-plant",
+        "plant_location": "bench",
+        "data": data,
+        "status_code": "ok",
+        "detail": "data retrieved successfully",
+        "status_description": "OK",
+    }
+
+
+def measure(render, iterations):
+    render()
+    wall, cpu = time.perf_counter(), time.process_time()
+    for _ in range(iterations):
+        body = render()
+    wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+    return {
+        'bytes': len(body),
+        'wall_us': round(wall / iterations * 1e6, 1),
+        'cpu_us': round(cpu / iterations * 1e6, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--urls', type=int, default=500)
+    parser.add_argument('--iterations', type=int, default=500)
+    parser.add_argument('--json', action='store_true', help='print the report as json')
+    args = parser.parse_args()
+
+    value = payload(args.urls)
+    body = encode(value)
+    report = {
+        'json': measure(lambda: JSONResponse(jsonable_encoder(value)).body, args.iterations),
+        'orjson': measure(lambda: DefaultResponse(jsonable_encoder(value)).body, args.iterations),
+        'encode': measure(lambda: encode(value), args.iterations),
+        'pre-encoded': measure(lambda: EncodedResponse(body).body, args.iterations),
+    }
+
+    if args.json:
+        json.dump(report, sys.stdout, indent=2)
+        return
+
+    print(f"{'path':<12} {'bytes':>8} {'wall us':>10} {'cpu us':>10} {'speedup':>8}")
+    for name, row in report.items():
+        speedup = report['json']['cpu_us'] / row['cpu_us'] if row['cpu_us'] else float('inf')
+        print(f"{name:<12} {row['bytes']:>8} {row['wall_us']:>10} {row['cpu_us']:>10} {speedup:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
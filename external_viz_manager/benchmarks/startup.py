@@ -0,0 +1,126 @@
+"""
+Time for a data_api worker to serve its first statistic request, started cold
+(a fresh interpreter importing and warming the app, as with gunicorn --reload)
+against forked from a master that preloaded and warmed it (gunicorn.conf.py),
+against the database configured in the environment (DATABASE_ENGINE, ...):
+
+    cd external_viz_manager
+    python -m benchmarks.startup --plant bench-plant --runs 5
+
+    import  importing data_api.main, Django setup included
+    warm    building the plant and reference data indexes (startup of the app)
+    first   the first /api/v1/statistic request of the plant
+    total   from spawning (cold) or forking (preloaded) the worker to the first response
+
+Seed a plant first with ``python -m benchmarks.async_vs_threadpool --seed``.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import statistics
+import subprocess
+
+import httpx
+
+
+def first_request(url):
+    """
+    Import, warm and serve ``url`` once in this process, the timings in seconds.
+    """
+    start = time.perf_counter()
+    from data_api.main import app, warm_up
+    imported = time.perf_counter()
+
+    asyncio.run(warm_up())
+    warmed = time.perf_counter()
+
+    async def get():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://bench') as client:
+            return await client.get(url)
+
+    response = asyncio.run(get())
+    served = time.perf_counter()
+    return {
+        'status': response.status_code,
+        'import': imported - start,
+        'warm': warmed - imported,
+        'first': served - warmed,
+    }
+
+
+def cold(url):
+    start = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.startup', '--child', url],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    timings = json.loads(output.strip().splitlines()[-1])
+    timings['total'] = time.perf_counter() - start
+    return timings
+
+
+def preloaded(url):
+    # what the gunicorn master does: import, when_ready and pre_fork. Nothing
+    # async runs before forking, the executor thread of asgiref would be lost
+    import data_api.main
+    from data_api.warmup import warm_indexes, reset_connections
+    warm_indexes()
+    reset_connections()
+
+    read, write = os.pipe()
+    start = time.perf_counter()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read)
+        timings = first_request(url)
+        os.write(write, json.dumps(timings).encode())
+        os._exit(0)
+
+    os.close(write)
+    with os.fdopen(read) as pipe:
+        timings = json.loads(pipe.read())
+    os.waitpid(pid, 0)
+    timings['total'] = time.perf_counter() - start
+    return timings
+
+
+def summarize(runs):
+    return {
+        key: round(statistics.median(run[key] for run in runs) * 1000, 1)
+        for key in ('import', 'warm', 'first', 'total')
+    } | {'errors': sum(run['status'] != 200 for run in runs)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--plant', default='bench-plant')
+    parser.add_argument('--language', default='de')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--json', action='store_true', help='print the report as json')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(first_request(args.child)))
+        return
+
+    url = f'/api/v1/statistic?plant_id={args.plant}&language={args.language}'
+    report = {
+        'cold': summarize([cold(url) for _ in range(args.runs)]),
+        'preloaded': summarize([preloaded(url) for _ in range(args.runs)]),
+    }
+
+    if args.json:
+        json.dump(report, sys.stdout, indent=2)
+        return
+
+    print(f"{'mode':<10} {'import ms':>10} {'warm ms':>9} {'first ms':>9} {'total ms':>9} {'errors':>7}")
+    for mode, row in report.items():
+        print(f"{mode:<10} {row['import']:>10} {row['warm']:>9} {row['first']:>9} {row['total']:>9} {row['errors']:>7}")
+
+
+if __name__ == '__main__':
+    main()
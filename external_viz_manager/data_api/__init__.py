@@ -0,0 +1,10 @@
+"""
+FastAPI data API over the Django models of the database app.
+
+Django is set up once, here, before any module of the package imports models.
+"""
+import os
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'external_viz_manager.settings')
+django.setup()
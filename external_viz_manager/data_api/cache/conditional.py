@@ -0,0 +1,75 @@
+import hashlib
+from email.utils import format_datetime
+
+from django.conf import settings
+from fastapi import status
+from fastapi import Response
+from data_api.responses import encoded_response
+
+CACHE_CONTROL = getattr(settings, 'DATA_API_CACHE_CONTROL', 'max-age=0, must-revalidate')
+
+
+def snapshot_etag(snapshot, plant, category_id=None, sub_category_id=None, fields=None):
+    """
+    Strong ETag of a statistic response served from ``snapshot``.
+
+    It is derived from the snapshot version, the plant / language fields
+    echoed in the response and the item ``fields`` it is restricted to, never
+    from the response body, so it is known before the catalog is loaded.
+    """
+    parts = (
+        snapshot.pk, snapshot.version, snapshot.language.name,
+        plant.plant_id, plant.plant_name, plant.plant_location, plant.domain,
+        category_id, sub_category_id,
+    )
+    if fields is not None:
+        parts += (",".join(fields),)
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode()).hexdigest()
+    return f'"{snapshot.version}-{digest[:16]}"'
+
+
+def validator_headers(snapshot, etag):
+    return {
+        "ETag": etag,
+        "Last-Modified": format_datetime(snapshot.updated_at, usegmt=True),
+        "Cache-Control": CACHE_CONTROL,
+    }
+
+
+def etag_matches(if_none_match, etag):
+    """
+    Whether the If-None-Match header value matches ``etag`` (weak comparison,
+    as RFC 9110 requires for If-None-Match).
+    """
+    if not if_none_match:
+        return False
+
+    if if_none_match.strip() == "*":
+        return True
+
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+
+    return False
+
+
+def not_modified(headers):
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+
+def body_response(body, response, if_none_match, accept_encoding=None):
+    """
+    encoded_response of the EncodedBody ``body``. A response the route could
+    not give an ETag (no snapshot, several languages) gets the ETag of the
+    body, and a matching If-None-Match is answered with a 304.
+    """
+    if "ETag" not in response.headers:
+        headers = {"ETag": body.etag, "Cache-Control": CACHE_CONTROL}
+        if etag_matches(if_none_match, body.etag):
+            return not_modified(headers)
+        response.headers.update(headers)
+    return encoded_response(body, response, accept_encoding)
@@ -0,0 +1,91 @@
+from django.conf import settings
+from database.models import PlantInfo
+from data_api.cache.warm_index import WarmIndex
+
+
+def normalize_host(host):
+    """
+    The lower case domain of a Host header value (or of a domain), without port.
+    """
+    if not host:
+        return None
+    host = host.strip().lower()
+    if host.startswith("["):
+        return host.partition("]")[0] + "]"
+    return host.rsplit(":", 1)[0] if host.count(":") == 1 else host
+
+
+class PlantIndex:
+    """
+    Immutable domain -> plants and plant_id -> plant index of every PlantInfo.
+
+    A domain given explicitly matches the plant domain exactly, like the
+    ``PlantInfo.objects.get(domain=...)`` it replaces, except that a domain
+    shared by several plants designates the first of them in the order
+    ``plants`` are given (the lowest primary key). A Host header matches
+    case-insensitively and without port, and there a plant domain
+    ``*.example.com`` matches every sub domain of example.com and
+    ``.example.com`` matches example.com and its sub domains, the longest
+    suffix winning.
+    """
+    __slots__ = ('by_domain', 'by_host_domain', 'by_plant_id', 'by_suffix')
+
+    def __init__(self, plants):
+        by_domain, by_host_domain, by_suffix = {}, {}, {}
+        for plant in plants:
+            if plant.domain:
+                by_domain.setdefault(plant.domain, []).append(plant)
+            domain = normalize_host(plant.domain)
+            if not domain:
+                continue
+            if domain.startswith("*."):
+                by_suffix.setdefault(domain[1:], (plant, False))
+            elif domain.startswith("."):
+                by_suffix.setdefault(domain, (plant, True))
+            else:
+                by_host_domain.setdefault(domain, []).append(plant)
+
+        self.by_domain = {domain: tuple(plants) for domain, plants in by_domain.items()}
+        self.by_host_domain = {domain: tuple(plants) for domain, plants in by_host_domain.items()}
+        self.by_plant_id = {plant.plant_id: plant for plant in plants}
+        self.by_suffix = by_suffix
+
+    def by_domain_name(self, domain):
+        """
+        The plant whose domain is exactly ``domain``, or None.
+        """
+        plants = self.by_domain.get(domain)
+        return plants[0] if plants else None
+
+    def by_host(self, host):
+        """
+        The plant a Host header designates, or None. Ambiguous domains
+        designate no plant.
+        """
+        domain = normalize_host(host)
+        if not domain:
+            return None
+
+        plants = self.by_host_domain.get(domain)
+        if plants:
+            return plants[0] if len(plants) == 1 else None
+
+        suffix = domain
+        while True:
+            match = self.by_suffix.get("." + suffix)
+            if match is not None and (match[1] or suffix != domain):
+                return match[0]
+            if "." not in suffix:
+                return None
+            suffix = suffix.split(".", 1)[1]
+
+
+def build_plant_index():
+    return PlantIndex(list(PlantInfo.objects.only('plant_id', 'plant_name', 'plant_location', 'domain').order_by('pk')))
+
+
+# resolves the plant of a request from memory instead of querying PlantInfo
+plant_resolver = WarmIndex(
+    "plant_resolver", build_plant_index, senders=(PlantInfo,),
+    ttl=getattr(settings, 'DATA_API_PLANT_RESOLVER_TTL', 30),
+)
@@ -0,0 +1,27 @@
+from django.conf import settings
+from database.models import Language, StatisticCategory, StatisticSubCategory, StatisticsVar
+from database.models import StatisticCategoryLocalization, StatisticSubCategoryLocalization
+from database.registry import ReferenceRegistry
+from data_api.cache.warm_index import WarmIndex
+
+
+# languages, categories, sub categories and localizations of the worker, the
+# routers only query the VizStatistics rows of the requested plant
+reference_data = WarmIndex(
+    "reference_data", ReferenceRegistry,
+    senders=(
+        Language, StatisticCategory, StatisticSubCategory, StatisticsVar,
+        StatisticCategoryLocalization, StatisticSubCategoryLocalization,
+    ),
+    ttl=getattr(settings, 'DATA_API_REFERENCE_DATA_TTL', 30),
+)
+
+
+def reference_stats():
+    """
+    Size of the registry held by this worker and how often it was built.
+    """
+    stats = reference_data.get().stats()
+    stats["rebuilds"] = reference_data.rebuilds
+    stats["built_at"] = reference_data.built_at
+    return stats
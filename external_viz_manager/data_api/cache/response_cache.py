@@ -0,0 +1,226 @@
+import json
+import time
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db.models.signals import post_save, post_delete
+from database.models import PlantInfo, StatisticCategory, StatisticSubCategory, StatisticsVar, VizStatistics
+from database.models import StatisticCategoryLocalization, StatisticSubCategoryLocalization, Language
+from data_api.cache.shared_cache import shared_cache
+from data_api.responses import encode, EncodedBody
+
+
+class LRUCache:
+    """
+    Thread safe least recently used cache bounded by number of entries, total
+    size in bytes and a time to live per entry.
+
+    Values are stored as given, callers must not mutate them once cached. The
+    size of bytes and EncodedBody values is their length, that of other values
+    is estimated.
+    """
+    def __init__(self, max_entries=1024, max_bytes=64 * 1024 * 1024, ttl=300):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, size, expires_at = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, size=None):
+        if size is None:
+            size = len(value) if isinstance(value, (bytes, EncodedBody)) else len(json.dumps(value, default=str))
+
+        if size > self.max_bytes or self.max_entries <= 0:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = (value, size, time.monotonic() + self.ttl)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate(self, predicate=None):
+        """
+        Drop every entry whose key matches ``predicate``, or all entries if no
+        predicate is given.
+        """
+        with self._lock:
+            keys = [key for key in self._entries if predicate is None or predicate(key)]
+            for key in keys:
+                self._remove(key)
+            self.invalidations += len(keys)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+
+config = getattr(settings, 'DATA_API_RESPONSE_CACHE', {})
+response_cache = LRUCache(
+    max_entries=config.get('MAX_ENTRIES', 1024),
+    max_bytes=config.get('MAX_BYTES', 64 * 1024 * 1024),
+    ttl=config.get('TTL', 300),
+)
+
+
+def cache_key(plant, language, category_id=None, sub_category_id=None, snapshot=None, fields=None, versions=None):
+    """
+    Key of a rendered statistic response, ``plant`` being a PlantInfo and
+    ``language`` a language code, or None if the response must not be cached.
+
+    Responses are keyed on the version of the snapshot they are rendered from
+    (``versions`` of the snapshots of each language for several languages) and
+    on the plant fields they echo. Both are read from the database by every
+    worker, so a write made in any process moves the key, whichever process
+    received its signals. Responses without a fresh snapshot for each of their
+    languages have no such version and are not cached. Responses restricted
+    to some item ``fields`` are keyed on them too.
+    """
+    if versions is not None:
+        if None in versions:
+            return None
+        version = tuple(versions)
+    elif snapshot is not None:
+        version = snapshot.version
+    else:
+        return None
+
+    key = (
+        plant.pk, language, category_id, sub_category_id, version,
+        plant.plant_id, plant.plant_name, plant.plant_location, plant.domain,
+    )
+    if fields is not None:
+        key += (",".join(fields),)
+    return key
+
+
+class CacheTicket:
+    """
+    Outcome of a lookup: ``value`` is the encoded response or None, ``status``
+    the X-Cache header value and ``lock`` the shared rebuild lock held on a miss.
+    A ticket of no ``key`` bypasses both caches.
+    """
+    __slots__ = ('key', 'version', 'value', 'status', 'lock')
+
+    def __init__(self, key, version, value, status, lock=None):
+        self.key = key
+        self.version = version
+        self.value = value
+        self.status = status
+        self.lock = lock
+
+
+def lookup(key):
+    """
+    Look a response up in the in-process cache, then in the shared cache.
+
+    On a miss the caller builds the response, hands it to ``store`` and must
+    ``release`` the ticket whatever the outcome, so other workers waiting on
+    the rebuild lock are not held up. A ``key`` of None (see cache_key) is
+    neither looked up nor stored.
+    """
+    if key is None:
+        return CacheTicket(None, None, None, "BYPASS")
+
+    version = shared_cache.version()
+    value = response_cache.get(key + (version,))
+    if value is not None:
+        return CacheTicket(key, version, value, "HIT")
+
+    value, lock = shared_cache.get(key, version), None
+    if value is None:
+        value, lock = shared_cache.acquire(key, version)
+    if value is not None:
+        response_cache.set(key + (version,), value)
+        return CacheTicket(key, version, value, "HIT-SHARED")
+
+    return CacheTicket(key, version, None, "MISS", lock)
+
+
+def store(ticket, value):
+    """
+    Encode and compress the response ``value`` once, cache the EncodedBody and
+    return it, so that neither this request nor the hits that follow encode or
+    compress it again.
+    """
+    body = EncodedBody.compress(encode(value))
+    if ticket.key is None:
+        return body
+    response_cache.set(ticket.key + (ticket.version,), body)
+    shared_cache.set(ticket.key, ticket.version, body)
+    return body
+
+
+def release(ticket):
+    if ticket is not None:
+        shared_cache.release(ticket.lock)
+
+
+# keys move with the snapshot versions, these only free the entries of this
+# process that can no longer be hit
+def invalidate_plant(sender, instance, **kwargs):
+    response_cache.invalidate(lambda key: key[0] == instance.pk)
+
+
+def invalidate_all(sender, instance, **kwargs):
+    response_cache.invalidate()
+
+
+post_save.connect(invalidate_plant, sender=PlantInfo, dispatch_uid="response_cache_PlantInfo_save")
+post_delete.connect(invalidate_plant, sender=PlantInfo, dispatch_uid="response_cache_PlantInfo_delete")
+
+# a VizStatistics row may move between plants, so it cannot be scoped to one plant
+models = (
+    VizStatistics, StatisticCategory, StatisticSubCategory, StatisticsVar,
+    StatisticCategoryLocalization, StatisticSubCategoryLocalization, Language,
+)
+for model in models:
+    post_save.connect(invalidate_all, sender=model, dispatch_uid=f"response_cache_{model.__name__}_save")
+    post_delete.connect(invalidate_all, sender=model, dispatch_uid=f"response_cache_{model.__name__}_delete")
@@ -0,0 +1,142 @@
+import time
+import uuid
+import logging
+
+from django.conf import settings
+from django.core.cache import caches
+from database.cache_version import CATALOG_CACHE, VERSION_KEY, initial_version
+
+logger = logging.getLogger(__name__)
+
+
+class SharedCache:
+    """
+    Response cache shared by all workers, backed by a Django cache (Redis in
+    production, LocMemCache or any other backend in tests).
+
+    Keys are namespaced with the catalog version, which catalog writes move
+    forward, so invalidation never has to enumerate keys. When the backend
+    fails the cache is bypassed for ``retry_after`` seconds and callers behave
+    as if nothing was cached.
+    """
+    def __init__(self, cache, lock_timeout=10, lock_wait=2, retry_after=30):
+        self.cache = cache
+        self.lock_timeout = lock_timeout
+        self.lock_wait = lock_wait
+        self.retry_after = retry_after
+        self._down_until = 0
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.lock_waits = 0
+
+    @property
+    def available(self):
+        return time.monotonic() >= self._down_until
+
+    def _failed(self, operation):
+        self.errors += 1
+        self._down_until = time.monotonic() + self.retry_after
+        logger.warning("shared cache %s failed, bypassing it for %ss", operation, self.retry_after, exc_info=True)
+
+    def version(self):
+        """
+        The current catalog version, or None if the shared cache is unavailable.
+        """
+        if not self.available:
+            return None
+        try:
+            version = self.cache.get(VERSION_KEY)
+            if version is None:
+                self.cache.add(VERSION_KEY, initial_version(), timeout=None)
+                version = self.cache.get(VERSION_KEY)
+            return version
+        except Exception:
+            self._failed("version")
+            return None
+
+    @staticmethod
+    def _key(key, version):
+        return "statistic:%s:%s" % (version, ":".join("" if part is None else str(part) for part in key))
+
+    def get(self, key, version):
+        if version is None or not self.available:
+            return None
+        try:
+            value = self.cache.get(self._key(key, version))
+        except Exception:
+            self._failed("get")
+            return None
+
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key, version, value):
+        if version is None or not self.available:
+            return
+        try:
+            self.cache.set(self._key(key, version), value)
+        except Exception:
+            self._failed("set")
+
+    def acquire(self, key, version):
+        """
+        Take the rebuild lock of ``key``. Returns ``(value, lock)``: if another
+        worker holds the lock, waits up to ``lock_wait`` seconds for the value it
+        is building and returns it with no lock, otherwise returns no value and
+        the lock to pass to ``release`` once the response is built.
+        """
+        if version is None or not self.available:
+            return None, None
+
+        lock_key = self._key(key, version) + ":lock"
+        token = uuid.uuid4().hex
+        try:
+            if self.cache.add(lock_key, token, timeout=self.lock_timeout):
+                return None, (lock_key, token)
+
+            self.lock_waits += 1
+            deadline = time.monotonic() + self.lock_wait
+            while time.monotonic() < deadline:
+                time.sleep(0.05)
+                value = self.cache.get(self._key(key, version))
+                if value is not None:
+                    self.hits += 1
+                    return value, None
+                if self.cache.add(lock_key, token, timeout=self.lock_timeout):
+                    return None, (lock_key, token)
+        except Exception:
+            self._failed("lock")
+
+        return None, None
+
+    def release(self, lock):
+        if lock is None:
+            return
+        lock_key, token = lock
+        try:
+            if self.cache.get(lock_key) == token:
+                self.cache.delete(lock_key)
+        except Exception:
+            self._failed("unlock")
+
+    def stats(self):
+        return {
+            "available": self.available,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "lock_waits": self.lock_waits,
+        }
+
+
+config = getattr(settings, 'DATA_API_SHARED_CACHE', {})
+shared_cache = SharedCache(
+    caches[CATALOG_CACHE],
+    lock_timeout=config.get('LOCK_TIMEOUT', 10),
+    lock_wait=config.get('LOCK_WAIT', 2),
+    retry_after=config.get('RETRY_AFTER', 30),
+)
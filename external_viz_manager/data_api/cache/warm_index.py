@@ -0,0 +1,69 @@
+import time
+import threading
+
+from asgiref.sync import sync_to_async
+from django.db.models.signals import post_save, post_delete
+from data_api.cache.shared_cache import shared_cache
+from data_api.connections import request_scoped
+
+
+class WarmIndex:
+    """
+    Immutable in-memory index of database rows, built by ``build()`` and kept
+    by each worker. A new index is built and swapped in atomically, readers
+    keep using the one they got.
+
+    The index is rebuilt when one of the ``senders`` models changes in this
+    process, when the shared catalog version moves (catalog writes of other
+    processes) or at the latest ``ttl`` seconds after it was built.
+    """
+    def __init__(self, name, build, senders=(), ttl=30):
+        self.name = name
+        self.build = build
+        self.ttl = ttl
+        self._state = None
+        self._lock = threading.Lock()
+        self.rebuilds = 0
+        self.built_at = None
+        # a rebuild queries the database: off the thread sensitive code shares,
+        # releasing its connections in the executor thread it ran in
+        self.aget = sync_to_async(request_scoped(self.get), thread_sensitive=False)
+
+        for sender in senders:
+            post_save.connect(self.invalidate, sender=sender, dispatch_uid=f"{name}_{sender.__name__}_save")
+            post_delete.connect(self.invalidate, sender=sender, dispatch_uid=f"{name}_{sender.__name__}_delete")
+
+    def _fresh(self, state, version):
+        return state is not None and state[1] == version and state[2] > time.monotonic()
+
+    def get(self):
+        state = self._state
+        version = shared_cache.version()
+        if self._fresh(state, version):
+            return state[0]
+
+        with self._lock:
+            state = self._state
+            if not self._fresh(state, version):
+                state = self._state = (self.build(), version, time.monotonic() + self.ttl)
+                self.rebuilds += 1
+                self.built_at = time.time()
+            return state[0]
+
+    @property
+    def warm(self):
+        """
+        Whether the index was built at least once in this process (or in the
+        process it was forked from).
+        """
+        return self.built_at is not None
+
+    def invalidate(self, *args, **kwargs):
+        self._state = None
+
+    def stats(self):
+        return {
+            "warm": self.warm,
+            "rebuilds": self.rebuilds,
+            "built_at": self.built_at,
+        }
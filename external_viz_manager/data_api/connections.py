@@ -0,0 +1,46 @@
+import asyncio
+import functools
+
+from asgiref.sync import sync_to_async
+from fastapi.routing import APIRoute
+from django.db import close_old_connections
+
+# Django connections belong to the thread that opened them: sync handlers run
+# in a threadpool thread, the async ORM in the thread sync_to_async uses.
+arelease_connections = sync_to_async(close_old_connections)
+
+
+def request_scoped(endpoint):
+    """
+    Wrap ``endpoint`` so that the database connections it used are released
+    when it returns, in the thread it ran in, like Django does at the end of
+    a request: with the pooled backend they go back to the pool, otherwise
+    they are closed once older than CONN_MAX_AGE or unusable.
+    """
+    if asyncio.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def scoped(*args, **kwargs):
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                await arelease_connections()
+
+        return scoped
+
+    @functools.wraps(endpoint)
+    def scoped(*args, **kwargs):
+        close_old_connections()
+        try:
+            return endpoint(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    return scoped
+
+
+class ConnectionRoute(APIRoute):
+    """
+    Route releasing the database connections of its endpoint after every request.
+    """
+    def __init__(self, path, endpoint, **kwargs):
+        super().__init__(path, request_scoped(endpoint), **kwargs)
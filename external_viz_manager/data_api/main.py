@@ -4,6 +4,7 @@ from typing import Optional, Any
 from fastapi import FastAPI, Depends, APIRouter
 from asgi_correlation_id import CorrelationIdMiddleware
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 
 
 from fastapi import HTTPException, Body, status, Request
@@ -12,11 +13,32 @@ from fastapi.exception_handlers import http_exception_handler
 from asgi_correlation_id import correlation_id
 
 
+from django.conf import settings
+from asgiref.sync import sync_to_async
 from data_api.routers.statistic import query_statistic_data
 from data_api.routers.category import get_category_stats
 from data_api.routers.sub_category import get_subcategory_stats
+from data_api.responses import DefaultResponse, MIN_SIZE, GZIP_LEVEL
+from data_api.routers.cache import get_cache_stats
+from data_api.routers.batch import get_batch_stats
+from data_api.routers.export import export_catalog
+from data_api.routers.connections import get_connection_stats
+from data_api.routers.health import get_readiness
+from data_api.routers.metrics import get_metrics
+from data_api.connections import arelease_connections
+from data_api.warmup import warm_indexes
+
+
+async def warm_up():
+    # build the in-memory indexes before the first request, a no-op in workers
+    # forked from a gunicorn master that preloaded the app and built them already
+    await sync_to_async(warm_indexes)()
+    await arelease_connections()
+
+def create_app(async_routes: Optional[bool] = None) -> FastAPI:
+    if async_routes is None:
+        async_routes = settings.DATA_API_ASYNC
 
-def create_app() -> FastAPI:
     tags_meta = [
         {
             "name": "External Viz Dashboard DATA API",
@@ -35,7 +57,9 @@ def create_app() -> FastAPI:
             "url": "https://wasteant.com",
             "email": "tannous.geagea@wasteant.com",            
         },
-        openapi_url="/openapi.json"
+        openapi_url="/openapi.json",
+        default_response_class=DefaultResponse,
+        on_startup=[warm_up],
     )
 
     origins = ["http//localhost:8000"]
@@ -46,10 +70,22 @@ def create_app() -> FastAPI:
         allow_headers=["X-Requested-With", "X-Request-ID"],
         expose_headers=["X-Request-ID"],
     )
+    # statistic responses come precompressed from the cache, this covers the others
+    app.add_middleware(GZipMiddleware, minimum_size=MIN_SIZE, compresslevel=GZIP_LEVEL)
 
-    app.include_router(query_statistic_data.router)
-    app.include_router(get_category_stats.router)
-    app.include_router(get_subcategory_stats.router)
+    app.include_router(get_batch_stats.router)
+    if async_routes:
+        from data_api.routers.async_statistic import async_statistic_data
+        app.include_router(async_statistic_data.router)
+    else:
+        app.include_router(query_statistic_data.router)
+        app.include_router(get_category_stats.router)
+        app.include_router(get_subcategory_stats.router)
+    app.include_router(get_cache_stats.router)
+    app.include_router(get_connection_stats.router)
+    app.include_router(get_readiness.router)
+    app.include_router(get_metrics.router)
+    app.include_router(export_catalog.router)
     
     return app
 
@@ -0,0 +1,170 @@
+import os
+import time
+import logging
+from contextvars import ContextVar
+
+from fastapi import Request
+from fastapi import Response
+from django.conf import settings
+from django.db.backends.signals import connection_created
+
+from data_api.connections import ConnectionRoute
+
+try:
+    # reads PROMETHEUS_MULTIPROC_DIR at import: gunicorn.conf.py sets it before the app is loaded
+    import prometheus_client
+    from prometheus_client import Counter, Gauge, Histogram
+    from prometheus_client import multiprocess
+except ImportError:
+    prometheus_client = None
+
+logger = logging.getLogger(__name__)
+
+MULTIPROCESS = bool(os.environ.get('PROMETHEUS_MULTIPROC_DIR'))
+
+config = getattr(settings, 'DATA_API_QUERY_BUDGET', {})
+DB_HEADERS = config.get('HEADERS', False)
+MAX_QUERIES = config.get('MAX_QUERIES', 10)
+MAX_DB_TIME = config.get('MAX_TIME', 0.5)
+
+if prometheus_client is not None:
+    REQUESTS = Counter(
+        'data_api_requests_total', 'Requests served by route and status code.',
+        ['method', 'route', 'status'],
+    )
+    LATENCY = Histogram(
+        'data_api_request_duration_seconds', 'Time spent serving a request, by route.',
+        ['method', 'route'],
+        buckets=(.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10),
+    )
+    IN_PROGRESS = Gauge(
+        'data_api_requests_in_progress', 'Requests being served, by route.',
+        ['method', 'route'], multiprocess_mode='livesum',
+    )
+    DB_QUERIES = Histogram(
+        'data_api_db_queries_per_request', 'Database queries run by a request, by route.',
+        ['route'],
+        buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89),
+    )
+    DB_TIME = Histogram(
+        'data_api_db_time_seconds', 'Time a request spent in database queries, by route.',
+        ['route'],
+        buckets=(.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1),
+    )
+    CACHE = Counter(
+        'data_api_cache_lookups_total', 'Response cache lookups by route and X-Cache outcome (hit, hit-shared, miss, bypass).',
+        ['route', 'result'],
+    )
+
+
+class QueryStats:
+    """
+    Number of and time spent in the database queries of one request.
+    """
+    __slots__ = ('count', 'duration')
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+
+# the threadpool and sync_to_async copy the context, so queries run on behalf
+# of a request find its QueryStats in whichever thread they run
+current_queries = ContextVar('data_api_queries', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    stats = current_queries.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.count += 1
+        stats.duration += time.perf_counter() - start
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+connection_created.connect(install_query_recorder, dispatch_uid="data_api_query_recorder")
+
+
+def over_budget(queries):
+    return queries.count > MAX_QUERIES or queries.duration > MAX_DB_TIME
+
+
+def observe(method, route, status_code, duration, queries, cache_status):
+    if prometheus_client is None:
+        return
+
+    REQUESTS.labels(method, route, str(status_code)).inc()
+    LATENCY.labels(method, route).observe(duration)
+    DB_QUERIES.labels(route).observe(queries.count)
+    DB_TIME.labels(route).observe(queries.duration)
+    if cache_status:
+        CACHE.labels(route, cache_status.lower()).inc()
+
+
+class TimedRoute(ConnectionRoute):
+    """
+    Route setting X-Response-Time and recording the latency, status code,
+    in-flight requests, database queries and response cache outcome of every
+    request for /metrics.
+
+    With DATA_API_QUERY_BUDGET['HEADERS'] the number of queries and the time
+    spent in them are returned as X-DB-Queries and X-DB-Time, and requests
+    running more than MAX_QUERIES queries or MAX_TIME seconds of them are
+    logged as warnings.
+    """
+    def get_route_handler(self):
+        original_route_handler = super().get_route_handler()
+        method_route = {method: (method, self.path) for method in self.methods}
+
+        async def custom_route_handler(request: Request) -> Response:
+            method, route = method_route.get(request.method, (request.method, self.path))
+            in_progress = IN_PROGRESS.labels(method, route) if prometheus_client is not None else None
+            if in_progress is not None:
+                in_progress.inc()
+
+            queries = QueryStats()
+            token = current_queries.set(queries)
+            before = time.perf_counter()
+            status_code, cache_status = 500, None
+            try:
+                response: Response = await original_route_handler(request)
+                status_code, cache_status = response.status_code, response.headers.get("X-Cache")
+                response.headers["X-Response-Time"] = str(time.perf_counter() - before)
+                if DB_HEADERS:
+                    response.headers["X-DB-Queries"] = str(queries.count)
+                    response.headers["X-DB-Time"] = str(queries.duration)
+                return response
+            finally:
+                current_queries.reset(token)
+                if in_progress is not None:
+                    in_progress.dec()
+                if over_budget(queries):
+                    logger.warning(
+                        "%s %s ran %d queries in %.3fs, over the budget of %d queries / %.3fs",
+                        request.method, request.url.path, queries.count, queries.duration, MAX_QUERIES, MAX_DB_TIME,
+                    )
+                observe(method, route, status_code, time.perf_counter() - before, queries, cache_status)
+
+        return custom_route_handler
+
+
+def render_metrics():
+    """
+    The exposition of the metrics and its content type: those of every worker
+    in multiprocess mode, those of this process otherwise.
+    """
+    if MULTIPROCESS:
+        registry = prometheus_client.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = prometheus_client.REGISTRY
+    return prometheus_client.generate_latest(registry), prometheus_client.CONTENT_TYPE_LATEST
@@ -0,0 +1,146 @@
+import gzip
+import json
+import hashlib
+
+from django.conf import settings
+from fastapi.responses import Response, JSONResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+config = getattr(settings, 'DATA_API_COMPRESSION', {})
+MIN_SIZE = config.get('MIN_SIZE', 1024)
+GZIP_LEVEL = config.get('GZIP_LEVEL', 6)
+BROTLI_QUALITY = config.get('BROTLI_QUALITY', 5)
+
+
+def encode(value):
+    """
+    The JSON body of ``value`` as bytes, as DefaultResponse would render it.
+    """
+    if orjson is not None:
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(value, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+class DefaultResponse(JSONResponse):
+    """
+    Default response class of the app, rendering with orjson when it is
+    installed and with the standard json module otherwise.
+    """
+    def render(self, content):
+        return encode(content)
+
+
+class EncodedResponse(Response):
+    """
+    Response whose content is an already encoded JSON body, written as is.
+    """
+    media_type = "application/json"
+
+
+def accepted_encodings(accept_encoding):
+    """
+    The quality of each content coding of an Accept-Encoding header value.
+    """
+    qualities = {}
+    for part in (accept_encoding or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding.strip().lower()] = quality
+    return qualities
+
+
+class EncodedBody:
+    """
+    Encoded JSON body with its gzip and brotli variants, compressed once when
+    the response is cached so that serving it only picks a variant. Bodies
+    smaller than MIN_SIZE are not compressed.
+    """
+    __slots__ = ('identity', 'gzip', 'br', '_etag')
+
+    def __init__(self, identity, gzip=None, br=None):
+        self.identity = identity
+        self.gzip = gzip
+        self.br = br
+        self._etag = None
+
+    @property
+    def etag(self):
+        """
+        Strong ETag of the body, a digest of its bytes computed once.
+        """
+        # bodies cached before the slot existed come back without it
+        if getattr(self, '_etag', None) is None:
+            self._etag = '"%s"' % hashlib.sha1(self.identity).hexdigest()[:20]
+        return self._etag
+
+    @classmethod
+    def compress(cls, body):
+        if len(body) < MIN_SIZE:
+            return cls(body)
+        return cls(
+            body,
+            gzip=gzip.compress(body, GZIP_LEVEL, mtime=0),
+            br=brotli.compress(body, quality=BROTLI_QUALITY) if brotli is not None else None,
+        )
+
+    def variant(self, accept_encoding):
+        """
+        ``(content coding, content)`` of the best variant for ``accept_encoding``,
+        brotli winning ties, the coding being None for the uncompressed body.
+        """
+        qualities = accepted_encodings(accept_encoding)
+        best, content, best_quality = None, self.identity, 0.0
+        for coding in ("br", "gzip"):
+            variant = getattr(self, coding)
+            quality = qualities.get(coding, qualities.get("*", 0.0))
+            if variant is not None and quality > best_quality:
+                best, content, best_quality = coding, variant, quality
+        return best, content
+
+    def __len__(self):
+        return sum(len(variant) for variant in (self.identity, self.gzip, self.br) if variant is not None)
+
+
+def encoded_response(body, response, accept_encoding=None):
+    """
+    EncodedResponse of ``body`` carrying the status code and headers set on the
+    ``response`` parameter of a route, which FastAPI only applies to the bodies
+    it renders itself. ``body`` is encoded first if it is not bytes yet.
+
+    For an EncodedBody the variant matching ``accept_encoding`` is sent. A
+    compressed variant gets a weak ETag, as its bytes differ from the body the
+    ETag was computed for.
+    """
+    coding = None
+    if isinstance(body, EncodedBody):
+        coding, body = body.variant(accept_encoding)
+    elif not isinstance(body, bytes):
+        body = encode(body)
+
+    # uncompressed bodies get their Vary header from the GZipMiddleware
+    if coding is not None:
+        response.headers.add_vary_header("Accept-Encoding")
+        response.headers["Content-Encoding"] = coding
+        etag = response.headers.get("ETag")
+        if etag and not etag.startswith("W/"):
+            response.headers["ETag"] = "W/" + etag
+
+    return EncodedResponse(body, status_code=response.status_code or 200, headers=response.headers)
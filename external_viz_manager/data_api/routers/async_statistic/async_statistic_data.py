@@ -0,0 +1,260 @@
+from fastapi import status
+from typing import Optional
+from fastapi import Depends
+from fastapi import Header
+from fastapi import Response
+from fastapi import APIRouter
+
+from asgiref.sync import sync_to_async
+from database.catalog import arender_catalog, slice_catalog, LocalizationNotFound
+from database.snapshots import aget_snapshot, aload_snapshot_data
+from data_api.cache.response_cache import cache_key, lookup, store, release
+from data_api.cache.plant_resolver import plant_resolver
+from data_api.cache.reference_data import reference_data
+from data_api.cache.conditional import snapshot_etag, validator_headers, etag_matches, not_modified, body_response
+from data_api.routers.statistic.query_statistic_data import description as statistic_description
+from data_api.routers.category.get_category_stats import description as category_description
+from data_api.routers.sub_category.get_subcategory_stats import description as sub_category_description
+from data_api.metrics import TimedRoute
+from data_api.connections import request_scoped
+from data_api.routers.statistic.query_statistic_data import StatsRequest
+from data_api.routers.statistic.multi_language import is_multi_language, multi_language_stats
+from data_api.routers.statistic.sparse_fields import requested_fields, fields_error
+from data_api.routers.statistic.errors import (
+    category_error, sub_category_error, missing_plant_error, domain_error, plant_id_error, language_error,
+    statistic_error, localization_error, exception_error,
+)
+
+# Asynchronous implementation of the /statistic, /statistic/{category_id} and
+# /statistic/{category_id}/{sub_category_id} routes, served instead of the
+# threadpool ones when DATA_API_ASYNC is set. Responses are identical.
+router = APIRouter(
+    prefix="/api/v1",
+    route_class=TimedRoute,
+    responses={404: {"description": "Not found"}},
+)
+
+# the shared cache may block on Redis or on a rebuild lock
+alookup = sync_to_async(lookup, thread_sensitive=False)
+astore = sync_to_async(store, thread_sensitive=False)
+arelease = sync_to_async(release, thread_sensitive=False)
+# not in the one thread sensitive code shares, concurrent requests would queue
+# for it: the connections it opens are released in the executor thread it ran in
+amulti_language_stats = sync_to_async(request_scoped(multi_language_stats), thread_sensitive=False)
+
+
+async def resolve_plant(request, results, response, host=None):
+    """
+    The PlantInfo designated by the request, or None after filling ``results``
+    with the error to return.
+    """
+    plants = await plant_resolver.aget()
+    if not request.domain and not request.plant_id:
+        plant_info = plants.by_host(host)
+        if plant_info is None:
+            results["error"] = missing_plant_error()
+            response.status_code = status.HTTP_400_BAD_REQUEST
+        return plant_info
+
+    if request.domain:
+        plant_info = plants.by_domain_name(request.domain)
+        if plant_info is None:
+            results["error"] = domain_error(request.domain)
+            response.status_code = status.HTTP_404_NOT_FOUND
+        return plant_info
+
+    plant_info = plants.by_plant_id.get(request.plant_id)
+    if plant_info is None:
+        results["error"] = plant_id_error(request.plant_id)
+        response.status_code = status.HTTP_404_NOT_FOUND
+    return plant_info
+
+
+async def render(response, registry, plant_info, request, if_none_match, category_id=None, sub_category_id=None, load=None, accept_encoding=None, fields=None):
+    """
+    Shared tail of the three routes: conditional request, cache lookup, then
+    the snapshot or ``load(language)`` to build the data tree. Snapshots hold
+    every field, ``load`` renders a sparse fieldset ``fields``.
+    Returns the response body, or a Response for 304.
+    """
+    results = {}
+    snapshot = await aget_snapshot(plant_info, request.language)
+    if snapshot:
+        headers = validator_headers(snapshot, snapshot_etag(snapshot, plant_info, category_id, sub_category_id, fields))
+        if etag_matches(if_none_match, headers["ETag"]):
+            return not_modified(headers)
+        response.headers.update(headers)
+
+    ticket = await alookup(cache_key(plant_info, request.language, category_id, sub_category_id, snapshot=snapshot, fields=fields))
+    try:
+        response.headers["X-Cache"] = ticket.status
+        if ticket.value is not None:
+            return body_response(ticket.value, response, if_none_match, accept_encoding)
+
+        language = registry.languages_by_code[request.language]
+        try:
+            if snapshot and fields is None:
+                await aload_snapshot_data(snapshot)
+                if category_id is None:
+                    data = snapshot.data
+                else:
+                    data = slice_catalog(snapshot.data, snapshot.layout, category_id, sub_category_id)
+            else:
+                data = await load(language)
+        except LocalizationNotFound as e:
+            results["error"] = localization_error(e, plant_info, language, category_id)
+            response.status_code = status.HTTP_404_NOT_FOUND
+            return results
+
+        if not data and category_id is None:
+            results["error"] = statistic_error(plant_info)
+            response.status_code = status.HTTP_404_NOT_FOUND
+            return results
+
+        results = {
+            "language": language.name,
+            "plant_name": plant_info.plant_name,
+            "plant_domain": plant_info.domain,
+            "plant_id": plant_info.plant_id,
+            "plant_location": plant_info.plant_location,
+            "data": data,
+        }
+
+        results['status_code'] = "ok"
+        results["detail"] = "data retrieved successfully"
+        results["status_description"] = "OK"
+        return body_response(await astore(ticket, results), response, if_none_match, accept_encoding)
+
+    finally:
+        await arelease(ticket)
+
+
+@router.api_route(
+    "/statistic", methods=["GET"], tags=["Statistic"], description=statistic_description,
+)
+async def get_stats(response: Response, request: StatsRequest = Depends(), if_none_match: Optional[str] = Header(default=None), accept_encoding: Optional[str] = Header(default=None), host: Optional[str] = Header(default=None)):
+    results = {}
+    try:
+        try:
+            fields = requested_fields(request)
+        except ValueError as e:
+            results["error"] = fields_error(e, response)
+            return results
+
+        registry = await reference_data.aget()
+        plant_info = await resolve_plant(request, results, response, host)
+        if plant_info is None:
+            return results
+
+        if is_multi_language(request.language):
+            return await amulti_language_stats(response, plant_info, request.language, if_none_match=if_none_match, accept_encoding=accept_encoding, fields=fields)
+
+        if request.language not in registry.languages_by_code:
+            results["error"] = language_error(request.language)
+            response.status_code = status.HTTP_404_NOT_FOUND
+            return results
+
+        return await render(
+            response, registry, plant_info, request, if_none_match,
+            accept_encoding=accept_encoding, fields=fields,
+            load=lambda language: arender_catalog(registry, plant_info, language, fields=fields),
+        )
+
+    except Exception as e:
+        results['error'] = exception_error(e, response)
+
+    return results
+
+
+@router.api_route(
+    "/statistic/{category_id}", methods=["GET"], tags=["Category"], description=category_description,
+)
+async def get_category_stats(response: Response, category_id:str, request: StatsRequest = Depends(), if_none_match: Optional[str] = Header(default=None), accept_encoding: Optional[str] = Header(default=None), host: Optional[str] = Header(default=None)):
+    results = {}
+    try:
+        try:
+            fields = requested_fields(request)
+        except ValueError as e:
+            results["error"] = fields_error(e, response)
+            return results
+
+        registry = await reference_data.aget()
+        if category_id not in registry.categories_by_id:
+            results["error"] = category_error(category_id)
+            response.status_code = status.HTTP_404_NOT_FOUND
+            return results
+
+        plant_info = await resolve_plant(request, results, response, host)
+        if plant_info is None:
+            return results
+
+        category = registry.categories_by_id[category_id]
+        if is_multi_language(request.language):
+            return await amulti_language_stats(response, plant_info, request.language, category=category, if_none_match=if_none_match, accept_encoding=accept_encoding, fields=fields)
+
+        if request.language not in registry.languages_by_code:
+            results["error"] = language_error(request.language)
+            response.status_code = status.HTTP_404_NOT_FOUND
+            return results
+
+        return await render(
+            response, registry, plant_info, request, if_none_match, category_id,
+            accept_encoding=accept_encoding, fields=fields,
+            load=lambda language: arender_catalog(registry, plant_info, language, category=category, fields=fields),
+        )
+
+    except Exception as e:
+        results['error'] = exception_error(e, response)
+
+    return results
+
+
+@router.api_route(
+    "/statistic/{category_id}/{sub_category_id}", methods=["GET"], tags=["SubCategory"], description=sub_category_description,
+)
+async def get_subcategory_stats(response: Response, category_id:str, sub_category_id:str, request: StatsRequest = Depends(), if_none_match: Optional[str] = Header(default=None), accept_encoding: Optional[str] = Header(default=None), host: Optional[str] = Header(default=None)):
+    results = {}
+    try:
+        try:
+            fields = requested_fields(request)
+        except ValueError as e:
+            results["error"] = fields_error(e, response)
+            return results
+
+        registry = await reference_data.aget()
+        if category_id not in registry.categories_by_id:
+            results["error"] = category_error(category_id)
+            response.status_code = status.HTTP_404_NOT_FOUND
+            return results
+
+        category = registry.categories_by_id[category_id]
+        if (category_id, sub_category_id) not in registry.sub_categories_by_id:
+            results["error"] = sub_category_error(category_id, sub_category_id)
+            response.status_code = status.HTTP_404_NOT_FOUND
+            return results
+
+        plant_info = await resolve_plant(request, results, response, host)
+        if plant_info is None:
+            return results
+
+        sub_category = registry.sub_categories_by_id[(category_id, sub_category_id)]
+        if is_multi_language(request.language):
+            return await amulti_language_stats(
+                response, plant_info, request.language, category=category, sub_category=sub_category, if_none_match=if_none_match, accept_encoding=accept_encoding, fields=fields,
+            )
+
+        if request.language not in registry.languages_by_code:
+            results["error"] = language_error(request.language)
+            response.status_code = status.HTTP_404_NOT_FOUND
+            return results
+
+        return await render(
+            response, registry, plant_info, request, if_none_match, category_id, sub_category_id,
+            accept_encoding=accept_encoding, fields=fields,
+            load=lambda language: arender_catalog(registry, plant_info, language, category=category, sub_category=sub_category, fields=fields),
+        )
+
+    except Exception as e:
+        results['error'] = exception_error(e, response)
+
+    return results
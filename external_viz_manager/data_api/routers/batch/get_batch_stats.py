@@ -0,0 +1,167 @@
+from fastapi import status
+from typing import List
+from typing import Optional
+from fastapi import Body
+from fastapi import Response
+from fastapi import APIRouter
+from pydantic import BaseModel
+
+from django.conf import settings
+from database.catalog import LocalizationNotFound
+from database.snapshots import load_snapshot_catalogs
+from data_api.cache.plant_resolver import plant_resolver
+from data_api.cache.reference_data import reference_data
+from data_api.metrics import TimedRoute
+from data_api.routers.statistic.errors import (
+    category_error, sub_category_error, missing_plant_error, domain_error, plant_id_error, language_error,
+    statistic_error, localization_error,
+)
+
+router = APIRouter(
+    prefix="/api/v1",
+    tags=["Batch"],
+    route_class=TimedRoute,
+    responses={404: {"description": "Not found"}},
+)
+
+MAX_ITEMS = getattr(settings, 'DATA_API_BATCH_MAX_ITEMS', 500)
+
+
+class BatchItem(BaseModel):
+    plant_id:Optional[str] = None
+    domain:Optional[str] = None
+    language:Optional[str] = 'de'
+    category:Optional[str] = None
+    sub_category:Optional[str] = None
+
+
+description = """
+    API Description for the get_batch_stats Endpoint:
+
+    Endpoint: /statistic/batch
+    Method: POST
+    Tags: Batch
+
+    Answers many /statistic, /statistic/{category_id} and /statistic/{category_id}/{sub_category_id}
+    requests in one call. The body is a list of items, each taking the query parameters of those endpoints:
+
+        [
+            {"domain": "plant-a.example.com", "language": "de"},
+            {"plant_id": "plant-b", "language": "en", "category": "waste"},
+            {"plant_id": "plant-b", "language": "en", "category": "waste", "sub_category": "impurities"}
+        ]
+
+    Plants are resolved in memory, languages, categories, snapshots and catalog rows are read with one IN query each, whatever
+    the number of items (at most DATA_API_BATCH_MAX_ITEMS, 500 by default).
+
+    Response Structure:
+
+        results: one entry per item, in order, with the body the single endpoint would have returned,
+                 either the plant data (status_code "ok") or an "error" dict in the same shape as today's.
+
+    Error Handling:
+
+        400 Bad Request: If the batch holds more than DATA_API_BATCH_MAX_ITEMS items.
+"""
+
+
+def _resolve(item, plants, languages, categories, sub_categories):
+    """
+    The (plant, language, category, sub_category) of ``item``, or the error dict
+    the single endpoints would return for it, checked in the same order.
+    """
+    category = sub_category = None
+    if item.category is not None:
+        category = categories.get(item.category)
+        if category is None:
+            return {"error": category_error(item.category)}
+
+        if item.sub_category is not None:
+            sub_category = sub_categories.get((item.category, item.sub_category))
+            if sub_category is None:
+                return {"error": sub_category_error(item.category, item.sub_category)}
+
+    if not item.domain and not item.plant_id:
+        return {"error": missing_plant_error()}
+
+    if item.domain:
+        plant_info = plants.by_domain_name(item.domain)
+        if plant_info is None:
+            return {"error": domain_error(item.domain)}
+    else:
+        plant_info = plants.by_plant_id.get(item.plant_id)
+        if plant_info is None:
+            return {"error": plant_id_error(item.plant_id)}
+
+    language = languages.get(item.language)
+    if language is None:
+        return {"error": language_error(item.language)}
+
+    return plant_info, language, category, sub_category
+
+
+@router.api_route(
+    "/statistic/batch", methods=["POST"], tags=["Batch"], description=description,
+)
+def get_batch_stats(response: Response, items: List[BatchItem] = Body(...)):
+    results = {}
+    if len(items) > MAX_ITEMS:
+        results["error"] = {
+            "status_code": "bad request",
+            "status_description": f"batch of {len(items)} items exceeds the limit of {MAX_ITEMS}",
+            "detail": f"split the batch in requests of at most {MAX_ITEMS} items",
+        }
+        response.status_code = status.HTTP_400_BAD_REQUEST
+        return results
+
+    try:
+        plants = plant_resolver.get()
+        registry = reference_data.get()
+        resolved = [
+            _resolve(item, plants, registry.languages_by_code, registry.categories_by_id, registry.sub_categories_by_id)
+            for item in items
+        ]
+        entries = [entry for entry in resolved if isinstance(entry, tuple)]
+
+        catalogs = iter(load_snapshot_catalogs(entries))
+
+        batch = []
+        for item, entry in zip(items, resolved):
+            if not isinstance(entry, tuple):
+                batch.append(entry)
+                continue
+
+            plant_info, language, category, sub_category = entry
+            data = next(catalogs)
+            if isinstance(data, LocalizationNotFound):
+                batch.append({"error": localization_error(data, plant_info, language, category)})
+                continue
+
+            if not data and category is None:
+                batch.append({"error": statistic_error(plant_info)})
+                continue
+
+            batch.append({
+                "language": language.name,
+                "plant_name": plant_info.plant_name,
+                "plant_domain": plant_info.domain,
+                "plant_id": plant_info.plant_id,
+                "plant_location": plant_info.plant_location,
+                "data": data,
+                "status_code": "ok",
+                "detail": "data retrieved successfully",
+                "status_description": "OK",
+            })
+
+        results["results"] = batch
+
+    except Exception as e:
+        results['error'] = {
+            'status_code': 'server-error',
+            "status_description": "Internal Server Error",
+            "detail": str(e),
+        }
+
+        response.status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
+
+    return results
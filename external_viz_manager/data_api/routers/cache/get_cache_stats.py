@@ -0,0 +1,49 @@
+from fastapi import APIRouter
+
+from data_api.cache.response_cache import response_cache
+from data_api.cache.shared_cache import shared_cache
+from data_api.cache.reference_data import reference_stats
+from data_api.metrics import TimedRoute
+
+router = APIRouter(
+    prefix="/api/v1",
+    tags=["Cache"],
+    route_class=TimedRoute,
+    responses={404: {"description": "Not found"}},
+)
+
+
+description = """
+    API Description for the get_cache_stats Endpoint:
+
+    Endpoint: /cache
+    Method: GET
+    Tags: Cache
+
+    Returns the counters of the in-process response cache of the worker serving the request,
+    used to size the cache (DATA_API_CACHE_MAX_ENTRIES, DATA_API_CACHE_MAX_BYTES, DATA_API_CACHE_TTL),
+    and those of the shared (Redis) cache as seen by this worker under "shared".
+    "reference" reports the registry of reference data held in memory by the worker.
+
+    Response Structure:
+
+        entries: number of cached responses.
+        bytes: approximate size of the cached responses.
+        hits, misses, hit_ratio: lookups served from / missing the cache.
+        evictions: entries dropped to stay within max_entries / max_bytes.
+        expirations: entries dropped because their ttl elapsed.
+        invalidations: entries dropped after a change of the catalog.
+        shared: available, hits, misses, errors and lock_waits of the shared cache.
+        reference: languages, categories, sub_categories and localizations held by the registry,
+                   its approximate size in bytes, how often it was built (rebuilds) and when (built_at).
+"""
+
+
+@router.api_route(
+    "/cache", methods=["GET"], tags=["Cache"], description=description,
+)
+def get_cache_stats():
+    stats = response_cache.stats()
+    stats["shared"] = shared_cache.stats()
+    stats["reference"] = reference_stats()
+    return stats
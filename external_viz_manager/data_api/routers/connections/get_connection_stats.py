@@ -0,0 +1,42 @@
+from fastapi import APIRouter
+
+from database.backends.pool import pool_stats
+from data_api.metrics import TimedRoute
+
+router = APIRouter(
+    prefix="/api/v1",
+    tags=["Connections"],
+    route_class=TimedRoute,
+    responses={404: {"description": "Not found"}},
+)
+
+
+description = """
+    API Description for the get_connection_stats Endpoint:
+
+    Endpoint: /connections
+    Method: GET
+    Tags: Connections
+
+    Returns the database connection pool of the worker serving the request by database alias, used
+    to size it (DATABASE_POOL_SIZE, DATABASE_POOL_MAX_OVERFLOW, DATABASE_POOL_TIMEOUT) so that
+    workers x (size + max_overflow) stays below max_connections of PostgreSQL. Empty when the
+    database backend is not pooled.
+
+    Response Structure:
+
+        size, max_overflow: connections kept open / opened on top of them under load.
+        open, idle, in_use: connections currently open, waiting in the pool and checked out.
+        checkouts: connections handed out.
+        waits, wait_time, max_wait_time: checkouts that had to wait for a connection and for how long, in seconds.
+        timeouts: checkouts that failed after DATABASE_POOL_TIMEOUT seconds.
+        recycled: connections closed after DATABASE_POOL_MAX_AGE seconds.
+        ping_failures: idle connections found broken before being handed out.
+"""
+
+
+@router.api_route(
+    "/connections", methods=["GET"], tags=["Connections"], description=description,
+)
+def get_connection_stats():
+    return pool_stats()
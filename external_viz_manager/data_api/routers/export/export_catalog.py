@@ -0,0 +1,143 @@
+import json
+from typing import Optional
+from fastapi import status
+from fastapi import Response
+from fastapi import APIRouter
+from fastapi.responses import StreamingResponse
+
+from django.conf import settings
+from django.db import close_old_connections
+from database.models import PlantInfo, Language
+from database.catalog import LocalizationNotFound
+from database.snapshots import load_snapshot_catalogs
+from data_api.metrics import TimedRoute
+from data_api.routers.statistic.multi_language import language_codes
+from data_api.routers.statistic.errors import language_error, localization_error
+
+router = APIRouter(
+    prefix="/api/v1",
+    tags=["Export"],
+    route_class=TimedRoute,
+    responses={404: {"description": "Not found"}},
+)
+
+CHUNK_SIZE = getattr(settings, 'DATA_API_EXPORT_CHUNK_SIZE', 100)
+
+
+description = """
+    API Description for the export_catalog Endpoint:
+
+    Endpoint: /export/statistic
+    Method: GET
+    Tags: Export
+
+    Streams the catalog of every plant in every language as newline delimited JSON (application/x-ndjson),
+    one line per plant x language, replacing one /statistic call per plant.
+
+    Request Parameters:
+
+        language: (Optional) comma separated language codes to export, every language by default.
+        chunk_size: (Optional) number of plants read and rendered at a time, DATA_API_EXPORT_CHUNK_SIZE by default.
+
+    Plants are read in pages of chunk_size by primary key and rendered chunk by chunk, from their snapshots when
+    they exist, and a chunk is only rendered once the previous one has been written to the client, so
+    the memory used does not depend on the number of plants.
+
+    Line Structure:
+
+        plant_id, plant_name, plant_domain, plant_location: the plant.
+        language, language_name: the language code and name.
+        data: the same tree as /statistic, or
+        error: the /statistic error if a localization is missing.
+
+    Plants without statistics are left out.
+
+    Error Handling:
+
+        404 Not Found: If one of the requested languages does not exist, before anything is streamed.
+"""
+
+
+def _line(value):
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode() + b"\n"
+
+
+def _chunk_lines(plants, languages):
+    entries = [(plant, language, None, None) for plant in plants for language in languages]
+    for (plant, language, _, _), data in zip(entries, load_snapshot_catalogs(entries)):
+        line = {
+            "plant_id": plant.plant_id,
+            "plant_name": plant.plant_name,
+            "plant_domain": plant.domain,
+            "plant_location": plant.plant_location,
+            "language": language.code,
+            "language_name": language.name,
+        }
+        if isinstance(data, LocalizationNotFound):
+            line["error"] = localization_error(data, plant, language, None)
+        elif not data:
+            continue
+        else:
+            line["data"] = data
+
+        yield _line(line)
+
+
+def export_lines(languages, chunk_size=CHUNK_SIZE):
+    """
+    The NDJSON lines of the export, rendered ``chunk_size`` plants at a time.
+
+    The threadpool may advance the iterator from another thread every time, so
+    each chunk is read with its own query and rendered at once, then the
+    connection of the thread is released: nothing is held between chunks.
+    """
+    last = None
+    while True:
+        plants = PlantInfo.objects.order_by('pk')
+        if last is not None:
+            plants = plants.filter(pk__gt=last)
+        chunk = list(plants[:chunk_size])
+        if not chunk:
+            return
+
+        last = chunk[-1].pk
+        lines = b"".join(_chunk_lines(chunk, languages))
+        close_old_connections()
+        if lines:
+            yield lines
+
+
+@router.api_route(
+    "/export/statistic", methods=["GET"], tags=["Export"], description=description,
+)
+def export_catalog(response: Response, language: Optional[str] = None, chunk_size: Optional[int] = None):
+    results = {}
+    try:
+        languages = Language.objects.order_by('pk')
+        if language:
+            codes = language_codes(language)
+            found = {item.code: item for item in languages.filter(code__in=codes)}
+            missing = [code for code in codes if code not in found]
+            if missing:
+                results["error"] = language_error(','.join(missing))
+                response.status_code = status.HTTP_404_NOT_FOUND
+                return results
+            languages = [found[code] for code in codes]
+
+        # a sync iterator is advanced in the threadpool one chunk at a time, as the
+        # client consumes them, so a slow client never makes the worker buffer the export
+        return StreamingResponse(
+            export_lines(list(languages), max(1, chunk_size or CHUNK_SIZE)),
+            media_type="application/x-ndjson",
+        )
+
+    except Exception as e:
+        results['error'] = {
+            'status_code': 'server-error',
+            "status_description": "Internal Server Error",
+            "detail": str(e),
+        }
+
+        response.status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
+
+    return results
@@ -0,0 +1,50 @@
+from fastapi import status
+from fastapi import Response
+from fastapi import APIRouter
+
+from data_api.metrics import TimedRoute
+from data_api.warmup import INDEXES, warm_indexes
+
+router = APIRouter(
+    prefix="/api/v1",
+    tags=["Health"],
+    route_class=TimedRoute,
+    responses={503: {"description": "Not ready"}},
+)
+
+
+description = """
+    API Description for the get_readiness Endpoint:
+
+    Endpoint: /ready
+    Method: GET
+    Tags: Health
+
+    Readiness probe of the worker serving the request: ready once the in-memory indexes the statistic
+    routes resolve plants and reference data from are built. Workers preloaded by the gunicorn master
+    are ready from the start, the others build the indexes at startup; a probe retries a build that failed.
+
+    Response Structure:
+
+        ready: whether the worker can serve traffic without building anything first.
+        indexes: for each index, whether it is warm, how often it was built (rebuilds) and when (built_at).
+
+    Status Codes:
+
+        200 OK: ready.
+        503 Service Unavailable: an index could not be built yet, e.g. the database is not reachable.
+"""
+
+
+@router.api_route(
+    "/ready", methods=["GET"], tags=["Health"], description=description,
+)
+def get_readiness(response: Response):
+    ready = warm_indexes()
+    if not ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+
+    return {
+        "ready": ready,
+        "indexes": {index.name: index.stats() for index in INDEXES},
+    }
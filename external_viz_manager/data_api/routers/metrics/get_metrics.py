@@ -0,0 +1,55 @@
+from fastapi import status
+from fastapi import Response
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from data_api import metrics
+
+# served at the root like Prometheus expects, and not timed itself
+router = APIRouter(
+    tags=["Metrics"],
+    responses={503: {"description": "Metrics not available"}},
+)
+
+
+description = """
+    API Description for the get_metrics Endpoint:
+
+    Endpoint: /metrics
+    Method: GET
+    Tags: Metrics
+
+    Prometheus exposition of the data API. Under gunicorn the workers write their samples to
+    PROMETHEUS_MULTIPROC_DIR (gunicorn.conf.py) and any worker answers for all of them.
+
+    Metrics:
+
+        data_api_requests_total: requests by method, route and status code.
+        data_api_request_duration_seconds: latency histogram by method and route.
+        data_api_requests_in_progress: requests being served by method and route.
+        data_api_db_queries_per_request, data_api_db_time_seconds: database queries run by a request and the time spent in them, by route.
+        data_api_cache_lookups_total: response cache lookups by route and outcome (hit, hit-shared, miss, bypass), the hit ratio being hit + hit-shared over all.
+
+    Status Codes:
+
+        200 OK: the metrics, in the Prometheus text format.
+        503 Service Unavailable: prometheus_client is not installed.
+"""
+
+
+@router.api_route(
+    "/metrics", methods=["GET"], tags=["Metrics"], description=description,
+)
+def get_metrics():
+    if metrics.prometheus_client is None:
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={
+                "status_code": "service unavailable",
+                "status_description": "metrics are not available",
+                "detail": "prometheus_client is not installed",
+            },
+        )
+
+    content, media_type = metrics.render_metrics()
+    return Response(content=content, media_type=media_type)
@@ -0,0 +1,95 @@
+from fastapi import status
+from fastapi import HTTPException
+from django.core.exceptions import ObjectDoesNotExist
+
+# Error bodies of the statistic routes, shared by the sync, async, batch and
+# export implementations so that they answer alike. Some carry their detail
+# under "deatil", as they always did: clients may read that key.
+
+
+def not_found_error(description, detail, key="detail"):
+    return {
+        "status_code": "not found",
+        "status_description": description,
+        key: detail,
+    }
+
+
+def missing_plant_error():
+    return {
+        "status_code": "bad request",
+        "description": "neither domain or plant_id are provided",
+        "detail": "at least one of domain or plant_id has to be given"
+    }
+
+
+def domain_error(domain):
+    return not_found_error(f"domain {domain} not found", "please provide a valid domain")
+
+
+def plant_id_error(plant_id):
+    return not_found_error(f"plant id {plant_id} not found", "please provide a valid plant id")
+
+
+def category_error(category_id):
+    return not_found_error(f"category_id {category_id} not found", "please provide a valid category_id")
+
+
+def sub_category_error(category_id, sub_category_id):
+    return not_found_error(f"sub_category_id {sub_category_id} for {category_id} not found", "please provide a valid sub_category_id")
+
+
+def language_error(code):
+    message = f"language {code} not found"
+    return not_found_error(message, message, key="deatil")
+
+
+def statistic_error(plant_info):
+    message = f"statistic for {plant_info.domain} [{plant_info.plant_id}] not found"
+    return not_found_error(message, message, key="deatil")
+
+
+def localization_error(e, plant_info, language, category):
+    """
+    Body of a LocalizationNotFound ``e`` raised rendering the catalog of
+    ``plant_info`` in ``language``, ``category`` being None for the whole
+    catalog.
+    """
+    if category is None:
+        kind = "statistic" if e.kind == "category" else "statistic sub category"
+        message = f"{kind} localization for {language.name} for {plant_info.domain} [{plant_info.plant_id}] not found"
+        return not_found_error(message, message, key="deatil")
+
+    if e.kind == "category":
+        message = f"Category Localization for {e.category_id} and {language.name} not found"
+    else:
+        message = f"SubCategory Localization for {e.sub_category_id} and {language.name} not found"
+    return not_found_error(message, message)
+
+
+def exception_error(e, response):
+    """
+    Body of an exception a route did not expect, setting the status of ``response``.
+    """
+    if isinstance(e, ObjectDoesNotExist):
+        response.status_code = status.HTTP_404_NOT_FOUND
+        return {
+            'status_code': "non-matching-query",
+            'status_description': f'Matching query was not found',
+            'detail': f"matching query does not exist. {e}"
+        }
+
+    if isinstance(e, HTTPException):
+        response.status_code = status.HTTP_404_NOT_FOUND
+        return {
+            "status_code": "not found",
+            "status_description": "Request not Found",
+            "detail": f"{e}",
+        }
+
+    response.status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
+    return {
+        'status_code': 'server-error',
+        "status_description": "Internal Server Error",
+        "detail": str(e),
+    }
@@ -0,0 +1,107 @@
+from fastapi import status
+
+from database.catalog import LocalizationNotFound
+from database.snapshots import load_snapshot_catalogs, snapshot_versions
+from data_api.cache.response_cache import cache_key, lookup, store, release
+from data_api.cache.reference_data import reference_data
+from data_api.cache.conditional import body_response
+from data_api.routers.statistic.errors import language_error, statistic_error, localization_error
+
+ALL_LANGUAGES = "*"
+
+
+def is_multi_language(language):
+    """
+    Whether the ``language`` query parameter asks for several languages,
+    either a comma separated list of codes (``de,en``) or ``*`` for all.
+    """
+    return language == ALL_LANGUAGES or "," in language
+
+
+def language_codes(language):
+    codes = []
+    for code in language.split(","):
+        code = code.strip()
+        if code and code not in codes:
+            codes.append(code)
+    return codes
+
+
+def multi_language_stats(response, plant_info, language, category=None, sub_category=None, if_none_match=None, accept_encoding=None, fields=None):
+    """
+    Body of a statistic request for several languages: ``languages`` maps each
+    code to its name and ``data`` each code to the tree the single language
+    request would return.
+
+    The catalog of every language is rendered from its snapshot or, for the
+    others, together with one localization query per model. A language with a
+    missing localization fails the request like a single language one, except
+    with ``*`` where it is left out. ``fields`` restricts the items as for a
+    single language. The ETag is that of the body, see body_response.
+    """
+    results = {}
+    registry = reference_data.get()
+    if language == ALL_LANGUAGES:
+        languages = list(registry.languages.values())
+        key = ALL_LANGUAGES
+    else:
+        codes = language_codes(language)
+        found = registry.languages_by_code
+        missing = [code for code in codes if code not in found]
+        if missing or not codes:
+            results["error"] = language_error(','.join(missing) or language)
+            response.status_code = status.HTTP_404_NOT_FOUND
+            return results
+
+        languages = [found[code] for code in codes]
+        key = ",".join(codes)
+
+    category_id = category.category_id if category is not None else None
+    sub_category_id = sub_category.sub_category_id if sub_category is not None else None
+    # keyed on the snapshot versions like a single language response, for a
+    # snapshot rebuilt by another process to be served at once
+    versions = snapshot_versions(plant_info, languages)
+    ticket = lookup(cache_key(plant_info, key, category_id, sub_category_id, fields=fields, versions=versions))
+    try:
+        response.headers["X-Cache"] = ticket.status
+        if ticket.value is not None:
+            return body_response(ticket.value, response, if_none_match, accept_encoding)
+
+        catalogs = load_snapshot_catalogs([(plant_info, item, category, sub_category) for item in languages], fields)
+        names, data, error = {}, {}, None
+        for item, catalog in zip(languages, catalogs):
+            if isinstance(catalog, LocalizationNotFound):
+                error = error or localization_error(catalog, plant_info, item, category)
+                if language == ALL_LANGUAGES:
+                    continue
+                break
+
+            names[item.code] = item.name
+            data[item.code] = catalog
+
+        if error is not None and (language != ALL_LANGUAGES or not data):
+            results["error"] = error
+            response.status_code = status.HTTP_404_NOT_FOUND
+            return results
+
+        if category is None and not any(data.values()):
+            results["error"] = statistic_error(plant_info)
+            response.status_code = status.HTTP_404_NOT_FOUND
+            return results
+
+        results = {
+            "languages": names,
+            "plant_name": plant_info.plant_name,
+            "plant_domain": plant_info.domain,
+            "plant_id": plant_info.plant_id,
+            "plant_location": plant_info.plant_location,
+            "data": data,
+        }
+
+        results['status_code'] = "ok"
+        results["detail"] = "data retrieved successfully"
+        results["status_description"] = "OK"
+        return body_response(store(ticket, results), response, if_none_match, accept_encoding)
+
+    finally:
+        release(ticket)
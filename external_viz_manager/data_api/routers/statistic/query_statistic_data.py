@@ -1,38 +1,31 @@
 import os
-import time
-import django
 from fastapi import status
 from datetime import datetime
 from typing import Callable
 from typing import Optional
 from fastapi import Depends
+from fastapi import Header
 from fastapi import Request
 from fastapi import Response
 from fastapi import APIRouter
-from fastapi import HTTPException
 from fastapi.routing import APIRoute
 from pydantic import BaseModel
 
-django.setup()
-from django.core.exceptions import ObjectDoesNotExist
 from database.models import PlantInfo, StatisticCategory, StatisticSubCategory, StatisticsVar, VizStatistics
 from database.models import StatisticCategoryLocalization, StatisticSubCategoryLocalization, Language
+from database.catalog import render_catalog, LocalizationNotFound
+from database.snapshots import get_snapshot
+from data_api.cache.response_cache import cache_key, lookup, store, release
+from data_api.metrics import TimedRoute
+from data_api.cache.plant_resolver import plant_resolver
+from data_api.cache.reference_data import reference_data
+from data_api.cache.conditional import snapshot_etag, validator_headers, etag_matches, not_modified, body_response
+from data_api.routers.statistic.multi_language import is_multi_language, multi_language_stats
+from data_api.routers.statistic.sparse_fields import requested_fields, fields_error
+from data_api.routers.statistic.errors import (
+    missing_plant_error, domain_error, plant_id_error, language_error, localization_error, statistic_error, exception_error,
+)
 
-class TimedRoute(APIRoute):
-    def get_route_handler(self) -> Callable:
-        original_route_handler = super().get_route_handler()
-        async def custom_route_handler(request: Request) -> Response:
-            before = time.time()
-            response: Response = await original_route_handler(request)
-            duration = time.time() - before
-            response.headers["X-Response-Time"] = str(duration)
-            print(f"route duration: {duration}")
-            print(f"route response: {response}")
-            print(f"route response headers: {response.headers}")
-            return response
-
-        return custom_route_handler
-    
 router = APIRouter(
     prefix="/api/v1",
     tags=["Statistic"],
@@ -44,6 +37,9 @@ class StatsRequest(BaseModel):
     plant_id:Optional[str] = None
     domain:Optional[str] = None
     language:Optional[str] = 'de'
+    fields:Optional[str] = None
+    include:Optional[str] = None
+    exclude:Optional[str] = None
 
 
 description = """
@@ -62,8 +58,13 @@ description = """
         plant_id: (Optional) The unique identifier for the plant. Used to filter statistics by plant.
         domain: (Optional) The domain of the plant. Used to filter statistics by domain.
         language: (Optional, default: 'de') The language code to return the localized names of categories and subcategories. Default is German ('de').
+                  Several codes separated by commas (e.g. 'de,en') or '*' for every language return all of them in one response.
+        fields: (Optional) Comma separated fields of the subcategory items to return, among name, api_url, description,
+                var_names and urls (e.g. 'urls,name'). include is a synonym. The fields left out are neither queried nor rendered.
+        exclude: (Optional) Comma separated fields of the subcategory items to leave out.
 
-    At least one of plant_id or domain must be provided.
+    At least one of plant_id or domain must be provided, unless the Host header of the request is the domain of a plant.
+    A plant domain '*.example.com' matches every sub domain of example.com, '.example.com' also matches example.com itself.
     Response Structure:
 
         language: The name of the requested language (e.g., 'German').
@@ -79,9 +80,12 @@ description = """
                 description: A localized description of the subcategory.
                 var_names: A dictionary of variable names and values relevant to the subcategory.
 
+    For several languages, language is replaced by languages, mapping each language code to its name, and data maps
+    each language code to the data of that language. With '*' the languages a localization is missing for are left out.
+
     Error Handling:
 
-        400 Bad Request: If neither plant_id nor domain are provided.
+        400 Bad Request: If neither plant_id nor domain are provided, or for an unknown field in fields, include or exclude.
 
             {
                 "error": {
@@ -118,125 +122,80 @@ description = """
 @router.api_route(
     "/statistic", methods=["GET"], tags=["Statistic"], description=description,
 )
-def get_stats(response: Response, request: StatsRequest = Depends()):
+def get_stats(response: Response, request: StatsRequest = Depends(), if_none_match: Optional[str] = Header(default=None), accept_encoding: Optional[str] = Header(default=None), host: Optional[str] = Header(default=None)):
     results = {}
+    ticket = None
     try:
-        print(request.language)
+        try:
+            fields = requested_fields(request)
+        except ValueError as e:
+            results["error"] = fields_error(e, response)
+            return results
+
+        registry = reference_data.get()
         plant_info = None
+        plants = plant_resolver.get()
         if not request.domain and not request.plant_id:
-            results["error"] = {
-                "status_code": "bad request",
-                "description": "neither domain or plant_id are provided",
-                "detail": "at least one of domain or plant_id has to be given"
-            }
-            response.status_code = status.HTTP_400_BAD_REQUEST
-            return results
+            plant_info = plants.by_host(host)
+            if plant_info is None:
+                results["error"] = missing_plant_error()
+                response.status_code = status.HTTP_400_BAD_REQUEST
+                return results
         
         if request.domain:
-            if not PlantInfo.objects.filter(domain=request.domain).exists():
-                results["error"] = {
-                    "status_code": "not found",
-                    "status_description": f"domain {request.domain} not found",
-                    "detail": f"please provide a valid domain",
-                }
+            plant_info = plants.by_domain_name(request.domain)
+            if plant_info is None:
+                results["error"] = domain_error(request.domain)
             
                 response.status_code = status.HTTP_404_NOT_FOUND
                 return results
             
-            plant_info = PlantInfo.objects.get(domain=request.domain)
-            
         if request.plant_id and not plant_info:
-            if not PlantInfo.objects.filter(plant_id=request.plant_id):
-                results["error"] = {
-                    "status_code": "not found",
-                    "status_description": f"plant id {request.plant_id} not found",
-                    "detail": f"please provide a valid plant id",
-                }
+            plant_info = plants.by_plant_id.get(request.plant_id)
+            if plant_info is None:
+                results["error"] = plant_id_error(request.plant_id)
             
                 response.status_code = status.HTTP_404_NOT_FOUND
                 return results
-            
-            plant_info = PlantInfo.objects.get(plant_id=request.plant_id)
         
         
-        if not Language.objects.filter(code=request.language).exists():
-            results["error"] = {
-                "status_code": "not found",
-                "status_description": f"language {request.language} not found",
-                "deatil": f"language {request.language} not found",
-            }
+        if is_multi_language(request.language):
+            return multi_language_stats(response, plant_info, request.language, if_none_match=if_none_match, accept_encoding=accept_encoding, fields=fields)
+
+        if request.language not in registry.languages_by_code:
+            results["error"] = language_error(request.language)
         
             response.status_code = status.HTTP_404_NOT_FOUND
             return results
         
-        statistics = VizStatistics.objects.filter(plant=plant_info)
-        if not statistics:
-            results["error"] = {
-                "status_code": "not found",
-                "status_description": f"statistic for {plant_info.domain} [{plant_info.plant_id}] not found",
-                "deatil": f"statistic for {plant_info.domain} [{plant_info.plant_id}] not found",
-            }
+        snapshot = get_snapshot(plant_info, request.language)
+        if snapshot:
+            headers = validator_headers(snapshot, snapshot_etag(snapshot, plant_info, fields=fields))
+            if etag_matches(if_none_match, headers["ETag"]):
+                return not_modified(headers)
+            response.headers.update(headers)
+        
+        ticket = lookup(cache_key(plant_info, request.language, snapshot=snapshot, fields=fields))
+        response.headers["X-Cache"] = ticket.status
+        if ticket.value is not None:
+            return body_response(ticket.value, response, if_none_match, accept_encoding)
+        
+        language = registry.languages_by_code[request.language]
+        
+        try:
+            # snapshots hold every field, a sparse fieldset only renders what it needs
+            data = snapshot.data if snapshot and fields is None else render_catalog(registry, plant_info, language, fields=fields)
+        except LocalizationNotFound as e:
+            results["error"] = localization_error(e, plant_info, language, None)
         
             response.status_code = status.HTTP_404_NOT_FOUND
             return results
         
-        language = Language.objects.get(code=request.language)
+        if not data:
+            results["error"] = statistic_error(plant_info)
         
-        print(language)
-        data = {}
-        for stat in statistics:
-            category = stat.sub_category.category
-            if not StatisticCategoryLocalization.objects.filter(category=category, language=language).exists():
-                results["error"] = {
-                    "status_code": "not found",
-                    "status_description": f"statistic localization for {language.name} for {plant_info.domain} [{plant_info.plant_id}] not found",
-                    "deatil": f"statistic localization for {language.name} for {plant_info.domain} [{plant_info.plant_id}] not found",
-                }
-            
-                response.status_code = status.HTTP_404_NOT_FOUND
-                return results
-            
-            category_loc = StatisticCategoryLocalization.objects.get(category=category, language=language)
-            
-            if not StatisticSubCategoryLocalization.objects.filter(sub_category=stat.sub_category, language=language).exists():
-                results["error"] = {
-                    "status_code": "not found",
-                    "status_description": f"statistic sub category localization for {language.name} for {plant_info.domain} [{plant_info.plant_id}] not found",
-                    "deatil": f"statistic sub category localization for {language.name} for {plant_info.domain} [{plant_info.plant_id}] not found",
-                }
-            
-                response.status_code = status.HTTP_404_NOT_FOUND
-                return results
-            
-            sub_categories_loc = StatisticSubCategoryLocalization.objects.get(sub_category=stat.sub_category, language=language)
-            
-            if category.category_id not in data:
-                data[category.category_id] = {
-                    "name": category_loc.category_name,
-                    "items": {},
-                }
-            
-            var_names = StatisticsVar.objects.filter(sub_category=stat.sub_category)
-            if not stat.sub_category.sub_category_id in data[category.category_id]['items']:
-                data[category.category_id]["items"][stat.sub_category.sub_category_id] = {
-                    "name": sub_categories_loc.sub_category_name,
-                    "api_url": sub_categories_loc.url,
-                    "description": sub_categories_loc.description,
-                    "var_names": {
-                        var.variable_key: var.variable_value for var in var_names
-                    },
-                    "urls": []
-
-                }
-  
-            data[category.category_id]["items"][stat.sub_category.sub_category_id]['urls'].append(
-                {
-                    stat.url_name: {
-                        "name": stat.url_name,
-                        "url": stat.url
-                    }
-                }
-            )
+            response.status_code = status.HTTP_404_NOT_FOUND
+            return results
         
         results = {
             "language": language.name,
@@ -250,32 +209,12 @@ def get_stats(response: Response, request: StatsRequest = Depends()):
         results['status_code'] = "ok"
         results["detail"] = "data retrieved successfully"
         results["status_description"] = "OK"
+        return body_response(store(ticket, results), response, if_none_match, accept_encoding)
         
-    except ObjectDoesNotExist as e:
-        results['error'] = {
-            'status_code': "non-matching-query",
-            'status_description': f'Matching query was not found',
-            'detail': f"matching query does not exist. {e}"
-        }
-
-        response.status_code = status.HTTP_404_NOT_FOUND
-        
-    except HTTPException as e:
-        results['error'] = {
-            "status_code": "not found",
-            "status_description": "Request not Found",
-            "detail": f"{e}",
-        }
-        
-        response.status_code = status.HTTP_404_NOT_FOUND
-    
     except Exception as e:
-        results['error'] = {
-            'status_code': 'server-error',
-            "status_description": "Internal Server Error",
-            "detail": str(e),
-        }
-        
-        response.status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
+        results['error'] = exception_error(e, response)
+    
+    finally:
+        release(ticket)
     
     return results
@@ -0,0 +1,26 @@
+from fastapi import status
+
+from database.catalog import item_fields
+
+
+def field_names(value):
+    return tuple(name.strip() for name in value.split(",") if name.strip()) if value else ()
+
+
+def requested_fields(request):
+    """
+    The item fields asked for by the ``fields`` (or ``include``) and
+    ``exclude`` query parameters of a statistic request, comma separated
+    names of database.catalog.ITEM_FIELDS: None for all of them.
+    Raises ValueError for an unknown field.
+    """
+    return item_fields(field_names(request.fields) + field_names(request.include), field_names(request.exclude))
+
+
+def fields_error(e, response):
+    response.status_code = status.HTTP_400_BAD_REQUEST
+    return {
+        "status_code": "bad request",
+        "status_description": str(e),
+        "detail": "fields, include and exclude take comma separated item fields",
+    }
@@ -0,0 +1,35 @@
+import logging
+
+from django.db import connections
+from database.backends.pool import close_pools
+from data_api.cache.plant_resolver import plant_resolver
+from data_api.cache.reference_data import reference_data
+
+logger = logging.getLogger(__name__)
+
+# in-memory indexes a worker needs before it serves traffic
+INDEXES = (plant_resolver, reference_data)
+
+
+def warm_indexes():
+    """
+    Build the indexes that were not built yet and return whether all are warm.
+    Failures (e.g. the database not being reachable yet) are reported and
+    left to the next call.
+    """
+    for index in INDEXES:
+        if not index.warm:
+            try:
+                index.get()
+            except Exception:
+                logger.exception("failed to warm %s", index.name)
+    return all(index.warm for index in INDEXES)
+
+
+def reset_connections():
+    """
+    Close every database connection of this process, pooled ones included,
+    so that processes forked from it never share a socket with it.
+    """
+    connections.close_all()
+    close_pools()
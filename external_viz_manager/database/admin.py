@@ -1,21 +1,50 @@
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
 
 # Register your models here.
 from .models import PlantInfo
 from .models import StatisticCategory, VizStatistics, StatisticsVar, StatisticSubCategory
 from .models import Language, StatisticCategoryLocalization, StatisticSubCategoryLocalization
+from .models import CatalogSnapshot, CatalogTemplate, CatalogTemplateItem
+from .catalog_templates import apply_template
+from .paginators import EstimatedCountPaginator, PaginatedInlineMixin
 
 class StatisticsVarInline(admin.TabularInline):
     model = StatisticsVar
     extra = 0
 
 
+class ApplyTemplateForm(ActionForm):
+    template = forms.ModelChoiceField(queryset=CatalogTemplate.objects.all(), required=False, label='Template')
+
+
 @admin.register(PlantInfo)
 class PlantInfoAdmin(admin.ModelAdmin):
     list_display = ('plant_id', 'plant_name', 'plant_location', 'domain', 'created_at')
     search_fields = ('plant_id', 'plant_name', 'plant_location')
     list_filter = ('plant_location', 'created_at')
     ordering = ('-created_at',)
+    action_form = ApplyTemplateForm
+    actions = ['apply_catalog_template']
+
+    @admin.action(description='Apply catalog template to selected plants')
+    def apply_catalog_template(self, request, queryset):
+        template = CatalogTemplate.objects.filter(pk=request.POST.get('template') or None).first()
+        if template is None:
+            self.message_user(request, 'Select the template to apply.', messages.WARNING)
+            return
+        try:
+            result = apply_template(template, queryset)
+        except ValueError as e:
+            self.message_user(request, f'{template} not applied: {e}', messages.ERROR)
+            return
+        self.message_user(
+            request,
+            f'{template} applied to {len(result.plant_ids)} plants: {result.rows} statistics matched, {result.created} created, {result.updated} updated '
+            f'({result.rows_per_second:.0f} rows/s).',
+            messages.SUCCESS,
+        )
 
 @admin.register(Language)
 class LanguageAdmin(admin.ModelAdmin):
@@ -33,6 +62,9 @@ class StatisticCategoryAdmin(admin.ModelAdmin):
         extra = 1
         min_num = 1
 
+        def get_queryset(self, request):
+            return super().get_queryset(request).select_related('language')
+
     class StatisticSubCategoryInline(admin.TabularInline):
         model = StatisticSubCategory
         extra = 1
@@ -44,6 +76,8 @@ class StatisticCategoryAdmin(admin.ModelAdmin):
 @admin.register(StatisticCategoryLocalization)
 class StatisticCategoryLocalizationAdmin(admin.ModelAdmin):
     list_display = ('category', 'language', 'category_name', 'url')
+    list_select_related = ('category', 'language')
+    autocomplete_fields = ('category',)
     search_fields = ('category__category_id', 'category_name', 'language__name')
     list_filter = ('language',)
     ordering = ('category', 'language')
@@ -55,45 +89,111 @@ class StatisticSubCategoryAdmin(admin.ModelAdmin):
     search_fields = ('sub_category_id', 'category__category_id')
     list_filter = ('category',)
     ordering = ('created_at',)
+    autocomplete_fields = ('category',)
     
     class StatisticSubCategoryLocalizationInline(admin.TabularInline):
         model = StatisticSubCategoryLocalization
         extra = 1
         min_num = 1
+
+        def get_queryset(self, request):
+            return super().get_queryset(request).select_related('language')
         
-    class VizStatisticsInline(admin.TabularInline):
+    # a sub category has statistics for every plant, list them a page at a time
+    class VizStatisticsInline(PaginatedInlineMixin, admin.TabularInline):
         model = VizStatistics
         extra = 1
         min_num = 1
+        autocomplete_fields = ('plant',)
         
-    class StatisticsVarInline(admin.TabularInline):
+    class StatisticsVarInline(PaginatedInlineMixin, admin.TabularInline):
         model = StatisticsVar
         extra = 1
         min_num = 1
         
     inlines = [StatisticSubCategoryLocalizationInline, VizStatisticsInline, StatisticsVarInline]
 
+    def get_queryset(self, request):
+        # the changelist and the autocomplete of the other admins print sub
+        # categories, whose name includes their category
+        return super().get_queryset(request).select_related('category')
+
 
 @admin.register(StatisticSubCategoryLocalization)
 class StatisticSubCategoryLocalizationAdmin(admin.ModelAdmin):
     list_display = ('sub_category', 'language', 'sub_category_name', 'description', 'url')
+    list_select_related = ('sub_category__category', 'language')
+    autocomplete_fields = ('sub_category',)
     search_fields = ('sub_category__sub_category_id', 'sub_category_name', 'language__name')
     list_filter = ('language',)
     ordering = ('sub_category', 'language')
 
 
+# Statistics and variables grow with plants x sub categories: the changelists
+# filter by category rather than listing every plant and sub category in the
+# sidebar (search by plant_id or sub_category_id instead), are ordered by the
+# primary key rather than sorting the table by an unindexed created_at, and
+# do not count the whole table for every page.
+
 @admin.register(VizStatistics)
 class VizStatisticsAdmin(admin.ModelAdmin):
     list_display = ('plant', 'sub_category', 'url_name', 'url', 'created_at')
     search_fields = ('plant__plant_id', 'sub_category__sub_category_id', 'url_name')
-    list_filter = ('plant', 'sub_category')
-    ordering = ('created_at',)
+    list_filter = ('sub_category__category',)
+    list_select_related = ('plant', 'sub_category__category')
+    autocomplete_fields = ('plant', 'sub_category')
+    ordering = ('pk',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 @admin.register(StatisticsVar)
 class StatisticsVarAdmin(admin.ModelAdmin):
     list_display = ('sub_category', 'variable_key', 'variable_value', 'created_at')
     search_fields = ('sub_category__sub_category_id', 'variable_key')
-    list_filter = ('sub_category',)
-    ordering = ('created_at',)
+    list_filter = ('sub_category__category',)
+    list_select_related = ('sub_category__category',)
+    autocomplete_fields = ('sub_category',)
+    ordering = ('pk',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
 
+
+@admin.register(CatalogSnapshot)
+class CatalogSnapshotAdmin(admin.ModelAdmin):
+    list_display = ('plant', 'language', 'version', 'updated_at')
+    search_fields = ('plant__plant_id', 'plant__plant_name', 'language__code')
+    list_filter = ('language',)
+    list_select_related = ('plant', 'language')
+    ordering = ('plant', 'language')
+    readonly_fields = ('plant', 'language', 'data', 'version', 'updated_at')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        # the rendered catalogs are only shown on the change page
+        queryset = super().get_queryset(request)
+        if request.resolver_match and request.resolver_match.url_name.endswith('_changelist'):
+            queryset = queryset.defer('data', 'layout')
+        return queryset
+
+
+class CatalogTemplateItemInline(admin.TabularInline):
+    model = CatalogTemplateItem
+    extra = 1
+    autocomplete_fields = ('sub_category',)
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        # the selected sub category of every row is printed with its category
+        if db_field.name == 'sub_category':
+            kwargs['queryset'] = StatisticSubCategory.objects.select_related('category')
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+
+@admin.register(CatalogTemplate)
+class CatalogTemplateAdmin(admin.ModelAdmin):
+    list_display = ('name', 'description', 'created_at')
+    search_fields = ('name',)
+    ordering = ('name',)
+    inlines = [CatalogTemplateItemInline]
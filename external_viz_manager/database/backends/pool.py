@@ -0,0 +1,229 @@
+import os
+import time
+import logging
+import threading
+
+from django.db.utils import OperationalError
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeout(OperationalError):
+    """
+    Raised when no connection became available within the timeout of the pool.
+    """
+
+
+class ConnectionPool:
+    """
+    Bounded pool of DB-API connections shared by the threads of a process.
+
+    At most ``size`` idle connections are kept open, up to ``max_overflow``
+    more are opened under load and closed as soon as they are returned.
+    Checkouts beyond ``size + max_overflow`` open connections wait ``timeout``
+    seconds for one to be returned before failing with PoolTimeout.
+
+    Connections older than ``max_age`` seconds are closed instead of being
+    reused and, with ``pre_ping``, an idle connection is checked with a
+    ``SELECT 1`` before it is handed out again.
+    """
+    def __init__(self, connect, size=5, max_overflow=5, timeout=10, max_age=300, pre_ping=True):
+        self.connect = connect
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.max_age = max_age
+        self.pre_ping = pre_ping
+        self._idle = []
+        self._opened_at = {}
+        self._open = 0
+        self._condition = threading.Condition()
+        self.checkouts = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.max_wait_time = 0.0
+        self.timeouts = 0
+        self.recycled = 0
+        self.ping_failures = 0
+
+    def _available(self):
+        return self._idle or self._open < self.size + self.max_overflow
+
+    def _reserve(self):
+        """
+        An idle connection, or None once a slot for a new one is reserved.
+        """
+        start = time.monotonic()
+        with self._condition:
+            if not self._available():
+                self.waits += 1
+                if not self._condition.wait_for(self._available, self.timeout):
+                    self.timeouts += 1
+                    raise PoolTimeout(
+                        f"no database connection available within {self.timeout}s, "
+                        f"{self._open} of {self.size} + {self.max_overflow} overflow in use"
+                    )
+                elapsed = time.monotonic() - start
+                self.wait_time += elapsed
+                self.max_wait_time = max(self.max_wait_time, elapsed)
+
+            self.checkouts += 1
+            if self._idle:
+                return self._idle.pop()
+            self._open += 1
+            return None
+
+    def _release_slot(self, connection=None):
+        with self._condition:
+            self._open -= 1
+            if connection is not None:
+                self._opened_at.pop(id(connection), None)
+            self._condition.notify()
+
+    def _close(self, connection):
+        self._release_slot(connection)
+        try:
+            connection.close()
+        except Exception:
+            logger.debug("failed to close a pooled connection", exc_info=True)
+
+    def _expired(self, connection):
+        return self.max_age is not None and time.monotonic() - self._opened_at[id(connection)] > self.max_age
+
+    def _usable(self, connection):
+        if getattr(connection, 'closed', False):
+            return False
+        if self._expired(connection):
+            self.recycled += 1
+            return False
+        if self.pre_ping:
+            try:
+                cursor = connection.cursor()
+                try:
+                    cursor.execute("SELECT 1")
+                finally:
+                    cursor.close()
+                connection.rollback()
+            except Exception:
+                self.ping_failures += 1
+                return False
+        return True
+
+    def checkout(self):
+        """
+        A connection for the exclusive use of the caller until checkin.
+        """
+        while True:
+            connection = self._reserve()
+            if connection is None:
+                break
+            if self._usable(connection):
+                return connection
+            # stale, close it and take another one
+            self._close(connection)
+
+        try:
+            connection = self.connect()
+        except BaseException:
+            self._release_slot()
+            raise
+        with self._condition:
+            self._opened_at[id(connection)] = time.monotonic()
+        return connection
+
+    def checkin(self, connection, discard=False):
+        """
+        Return a connection checked out before. It is kept for reuse unless it
+        is closed, expired, an overflow connection or ``discard`` is set.
+        """
+        if not discard and not getattr(connection, 'closed', False):
+            try:
+                # leave no transaction open for the next user
+                connection.rollback()
+            except Exception:
+                discard = True
+
+        with self._condition:
+            keep = (
+                not discard
+                and not getattr(connection, 'closed', False)
+                and len(self._idle) < self.size
+                and self._open <= self.size
+                and not self._expired(connection)
+            )
+            if keep:
+                self._idle.append(connection)
+                self._condition.notify()
+                return
+
+        self._close(connection)
+
+    def close(self):
+        """
+        Close the idle connections, those checked out are closed on checkin.
+        """
+        with self._condition:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            self._close(connection)
+
+    def stats(self):
+        with self._condition:
+            return {
+                "size": self.size,
+                "max_overflow": self.max_overflow,
+                "open": self._open,
+                "idle": len(self._idle),
+                "in_use": self._open - len(self._idle),
+                "checkouts": self.checkouts,
+                "waits": self.waits,
+                "wait_time": self.wait_time,
+                "max_wait_time": self.max_wait_time,
+                "timeouts": self.timeouts,
+                "recycled": self.recycled,
+                "ping_failures": self.ping_failures,
+            }
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, connect, options):
+    """
+    The ConnectionPool of database ``alias`` in this process, created on first
+    use: a pool inherited through fork is never shared with the parent.
+    """
+    key = (alias, os.getpid())
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(
+                connect,
+                size=options.get('SIZE', 5),
+                max_overflow=options.get('MAX_OVERFLOW', 5),
+                timeout=options.get('TIMEOUT', 10),
+                max_age=options.get('MAX_AGE', 300),
+                pre_ping=options.get('PRE_PING', True),
+            )
+        return pool
+
+
+def pool_stats():
+    """
+    The stats of the pools of this process by database alias.
+    """
+    pid = os.getpid()
+    return {alias: pool.stats() for (alias, owner), pool in list(_pools.items()) if owner == pid}
+
+
+def close_pools():
+    """
+    Close the idle connections of the pools of this process, before forking
+    workers that must not share them.
+    """
+    pid = os.getpid()
+    with _pools_lock:
+        pools = [pool for (alias, owner), pool in _pools.items() if owner == pid]
+    for pool in pools:
+        pool.close()
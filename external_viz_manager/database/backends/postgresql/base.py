@@ -0,0 +1,32 @@
+from django.db.backends.postgresql import base
+from django.db.backends.postgresql.psycopg_any import IsolationLevel
+
+from database.backends.pool import get_pool
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    PostgreSQL backend taking its connections from a per process
+    ConnectionPool, configured by the ``POOL`` entry of the database settings.
+    Closing the connection of a thread returns it to the pool, so threads
+    only hold one while they use it.
+    """
+    @property
+    def pool(self):
+        return get_pool(self.alias, self._connect, self.settings_dict.get('POOL') or {})
+
+    def _connect(self):
+        return super().get_new_connection(self.get_connection_params())
+
+    def get_new_connection(self, conn_params):
+        connection = self.pool.checkout()
+        # set by the parent when it opens a connection, reused ones need it too
+        self.isolation_level = IsolationLevel(
+            self.settings_dict["OPTIONS"].get("isolation_level", IsolationLevel.READ_COMMITTED)
+        )
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self.pool.checkin(self.connection, discard=self.errors_occurred)
@@ -0,0 +1,29 @@
+import time
+import logging
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+CATALOG_CACHE = getattr(settings, 'CATALOG_CACHE_ALIAS', 'catalog')
+VERSION_KEY = 'catalog:version'
+
+
+def initial_version():
+    # a version that was never handed out before, so entries cached under
+    # an older version cannot be served again if the key was lost
+    return time.time_ns()
+
+
+def bump_catalog_version():
+    """
+    Invalidate every response cached in the shared catalog cache by moving the
+    catalog version forward. Errors of the cache are logged and ignored.
+    """
+    cache = caches[CATALOG_CACHE]
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, initial_version(), timeout=None)
+    except Exception:
+        logger.exception("failed to bump the catalog version of the shared cache")
@@ -0,0 +1,460 @@
+from django.db.models import Prefetch, Q
+
+from .models import StatisticSubCategory, VizStatistics
+from .models import StatisticCategoryLocalization, StatisticSubCategoryLocalization
+
+# fields of a sub category item of the data tree, in the order they are rendered
+ITEM_FIELDS = ('name', 'api_url', 'description', 'var_names', 'urls')
+
+
+class LocalizationNotFound(Exception):
+    """
+    Raised when a category or sub category of the requested catalog has no
+    localization in the requested language.
+
+    ``kind`` is either ``"category"`` or ``"sub_category"``, ``sub_category_id``
+    is only set for the latter.
+    """
+    def __init__(self, kind, category_id, sub_category_id=None):
+        super().__init__(f"{kind} localization for {category_id} {sub_category_id or ''} not found")
+        self.kind = kind
+        self.category_id = category_id
+        self.sub_category_id = sub_category_id
+
+
+def item_fields(include=None, exclude=None):
+    """
+    The fields of the items to render, in ITEM_FIELDS order, from the
+    ``include`` and ``exclude`` lists of field names, or None for all of them.
+    Raises ValueError for a name not in ITEM_FIELDS.
+    """
+    unknown = [name for name in [*(include or ()), *(exclude or ())] if name not in ITEM_FIELDS]
+    if unknown:
+        raise ValueError(f"unknown field {unknown[0]}, one of {', '.join(ITEM_FIELDS)}")
+
+    fields = tuple(name for name in ITEM_FIELDS if (not include or name in include) and name not in (exclude or ()))
+    return None if fields == ITEM_FIELDS else fields
+
+
+def _sub_category_queryset(language, fields=None):
+    """
+    Sub categories with their category, the localizations in ``language`` and
+    their variables prefetched, so rendering them costs a fixed number of queries.
+    Variables are left out when ``fields`` does not render them.
+    """
+    lookups = [
+        Prefetch(
+            'Localizations',
+            queryset=StatisticSubCategoryLocalization.objects.filter(language_id=language.pk),
+            to_attr='localized',
+        ),
+        Prefetch(
+            'category__Localizations',
+            queryset=StatisticCategoryLocalization.objects.filter(language_id=language.pk),
+            to_attr='localized',
+        ),
+    ]
+    if fields is None or 'var_names' in fields:
+        lookups.append('variables')
+    return StatisticSubCategory.objects.select_related('category').prefetch_related(*lookups)
+
+
+def _localizations(sub_category):
+    category = sub_category.category
+    if not category.localized:
+        raise LocalizationNotFound('category', category.category_id)
+    if not sub_category.localized:
+        raise LocalizationNotFound('sub_category', category.category_id, sub_category.sub_category_id)
+    return category.localized[0], sub_category.localized[0]
+
+
+class _Localizer:
+    """
+    Localizes sub categories in one language from localizations fetched for many
+    languages at once, keyed by ``(language pk, category pk)`` and
+    ``(language pk, sub category pk)``.
+    """
+    def __init__(self, language_id, category_locs, sub_category_locs):
+        self.language_id = language_id
+        self.category_locs = category_locs
+        self.sub_category_locs = sub_category_locs
+
+    def __call__(self, sub_category):
+        category_loc = self.category_locs.get((self.language_id, sub_category.category_id))
+        if category_loc is None:
+            raise LocalizationNotFound('category', sub_category.category.category_id)
+        sub_category_loc = self.sub_category_locs.get((self.language_id, sub_category.pk))
+        if sub_category_loc is None:
+            raise LocalizationNotFound('sub_category', sub_category.category.category_id, sub_category.sub_category_id)
+        return category_loc, sub_category_loc
+
+
+def _render_item(sub_category, sub_category_loc, fields=None):
+    if fields is None:
+        return {
+            "name": sub_category_loc.sub_category_name,
+            "api_url": sub_category_loc.url,
+            "description": sub_category_loc.description,
+            "var_names": {
+                var.variable_key: var.variable_value for var in sub_category.variables.all()
+            },
+            "urls": []
+        }
+
+    item = {}
+    if "name" in fields:
+        item["name"] = sub_category_loc.sub_category_name
+    if "api_url" in fields:
+        item["api_url"] = sub_category_loc.url
+    if "description" in fields:
+        item["description"] = sub_category_loc.description
+    if "var_names" in fields:
+        item["var_names"] = {var.variable_key: var.variable_value for var in sub_category.variables.all()}
+    if "urls" in fields:
+        item["urls"] = []
+    return item
+
+
+def _render_url(stat):
+    return {
+        stat.url_name: {
+            "name": stat.url_name,
+            "url": stat.url
+        }
+    }
+
+
+def _render_plant(statistics, localize=_localizations, fields=None):
+    urls = fields is None or "urls" in fields
+    data = {}
+    for stat in statistics:
+        category_loc, sub_category_loc = localize(stat.sub_category)
+        category_id = stat.sub_category.category.category_id
+        if category_id not in data:
+            data[category_id] = {
+                "name": category_loc.category_name,
+                "items": {},
+            }
+
+        items = data[category_id]["items"]
+        if stat.sub_category.sub_category_id not in items:
+            items[stat.sub_category.sub_category_id] = _render_item(stat.sub_category, sub_category_loc, fields)
+
+        if urls:
+            items[stat.sub_category.sub_category_id]['urls'].append(_render_url(stat))
+
+    return data
+
+
+def _render_category(category, sub_categories, statistics, localize=_localizations, fields=None):
+    urls = fields is None or "urls" in fields
+    by_sub_category = {}
+    for stat in statistics:
+        by_sub_category.setdefault(stat.sub_category_id, []).append(stat)
+
+    data = {}
+    for sub_category in sub_categories:
+        category_loc, sub_category_loc = localize(sub_category)
+        for stat in by_sub_category.get(sub_category.pk, []):
+            if category.category_id not in data:
+                data[category.category_id] = {
+                    "name": category_loc.category_name,
+                    "items": {},
+                }
+
+            items = data[category.category_id]["items"]
+            if sub_category.sub_category_id not in items:
+                items[sub_category.sub_category_id] = _render_item(sub_category, sub_category_loc, fields)
+
+            if urls:
+                items[sub_category.sub_category_id]['urls'].append(_render_url(stat))
+
+    return data
+
+
+class _Statistic:
+    """
+    The fields of a VizStatistics row the renderers use, with its sub category
+    taken from a ReferenceRegistry.
+    """
+    __slots__ = ('sub_category', 'sub_category_id', 'url_name', 'url')
+
+    def __init__(self, sub_category, url_name=None, url=None):
+        self.sub_category = sub_category
+        self.sub_category_id = sub_category.pk
+        self.url_name = url_name
+        self.url = url
+
+
+def _plant_statistics(plant, language, fields=None):
+    return VizStatistics.objects.filter(plant=plant).prefetch_related(
+        Prefetch('sub_category', queryset=_sub_category_queryset(language, fields))
+    )
+
+
+def _category_sub_categories(language, category, sub_category=None, fields=None):
+    if sub_category is None:
+        return _sub_category_queryset(language, fields).filter(category_id=category.pk)
+    return _sub_category_queryset(language, fields).filter(pk=sub_category.pk)
+
+
+def load_catalog(plant, language, category=None, sub_category=None, fields=None):
+    """
+    Build the ``data`` tree (category -> items -> urls) served by the statistic
+    endpoints for ``plant`` in ``language``. ``language``, ``category`` and
+    ``sub_category`` may be models or their ReferenceRegistry refs.
+
+    Without ``category`` the tree covers every VizStatistics row of the plant and
+    follows the order of those rows. With ``category`` (and optionally one of its
+    ``sub_category``) the tree is restricted to it, follows the sub category order
+    and every selected sub category must be localized, whether or not the plant has
+    statistics for it.
+
+    ``fields`` (see item_fields) restricts the items to some of their fields,
+    the variables are not queried unless ``var_names`` is one of them.
+
+    The number of queries does not depend on the size of the catalog.
+    Raises LocalizationNotFound if a required localization is missing.
+    """
+    if category is None:
+        return _render_plant(_plant_statistics(plant, language, fields), fields=fields)
+
+    sub_categories = list(_category_sub_categories(language, category, sub_category, fields))
+    if not sub_categories:
+        return {}
+
+    statistics = VizStatistics.objects.filter(plant=plant, sub_category__in=sub_categories)
+    return _render_category(category, sub_categories, statistics, fields=fields)
+
+
+def _registry_selection(registry, plant, category, sub_category, fields=None):
+    """
+    The ``(sub_category_id, url_name, url)`` rows of ``plant`` to render and,
+    with ``category``, the selected sub categories. Both are None when the
+    category has no sub category to select. Rows are only ``(sub_category_id,)``
+    when ``fields`` leaves the urls out.
+    """
+    columns = ('sub_category_id', 'url_name', 'url') if fields is None or 'urls' in fields else ('sub_category_id',)
+    statistics = VizStatistics.objects.filter(plant=plant)
+    if category is None:
+        return statistics.values_list(*columns), ()
+
+    if sub_category is None:
+        selected = registry.category_sub_categories.get(category.pk, ())
+    else:
+        selected = (sub_category,)
+    if not selected:
+        return None, None
+
+    statistics = statistics.filter(sub_category_id__in=[item.pk for item in selected])
+    return statistics.values_list(*columns), selected
+
+
+def _render_registry(registry, rows, language, category, selected, fields=None):
+    if fields is None or 'urls' in fields:
+        statistics = [
+            _Statistic(registry.sub_categories[sub_category_pk], url_name, url)
+            for sub_category_pk, url_name, url in rows
+        ]
+    else:
+        statistics = [_Statistic(registry.sub_categories[sub_category_pk]) for sub_category_pk, in rows]
+    localize = _Localizer(language.pk, registry.category_locs, registry.sub_category_locs)
+    if category is None:
+        return _render_plant(statistics, localize, fields)
+    return _render_category(category, selected, statistics, localize, fields)
+
+
+def render_catalog(registry, plant, language, category=None, sub_category=None, fields=None):
+    """
+    load_catalog taking languages, categories, sub categories, variables and
+    localizations from ``registry`` (a ReferenceRegistry, of which ``language``,
+    ``category`` and ``sub_category`` are refs): only the VizStatistics rows of
+    the plant are queried, without their urls when ``fields`` leaves them out.
+
+    Falls back to load_catalog when the rows reference a sub category the
+    registry does not know yet.
+    """
+    rows, selected = _registry_selection(registry, plant, category, sub_category, fields)
+    if rows is None:
+        return {}
+
+    try:
+        return _render_registry(registry, list(rows), language, category, selected, fields)
+    except KeyError:
+        return load_catalog(plant, language, category, sub_category, fields)
+
+
+async def arender_catalog(registry, plant, language, category=None, sub_category=None, fields=None):
+    """
+    Asynchronous version of render_catalog.
+    """
+    rows, selected = _registry_selection(registry, plant, category, sub_category, fields)
+    if rows is None:
+        return {}
+
+    try:
+        return _render_registry(registry, [row async for row in rows], language, category, selected, fields)
+    except KeyError:
+        return await aload_catalog(plant, language, category, sub_category, fields)
+
+
+async def aload_catalog(plant, language, category=None, sub_category=None, fields=None):
+    """
+    Asynchronous version of load_catalog, using the async queryset API.
+    """
+    if category is None:
+        statistics = [stat async for stat in _plant_statistics(plant, language, fields)]
+        return _render_plant(statistics, fields=fields)
+
+    sub_categories = [item async for item in _category_sub_categories(language, category, sub_category, fields)]
+    if not sub_categories:
+        return {}
+
+    statistics = [stat async for stat in VizStatistics.objects.filter(plant=plant, sub_category__in=sub_categories)]
+    return _render_category(category, sub_categories, statistics, fields=fields)
+
+
+def load_catalogs(entries, fields=None):
+    """
+    Set based load_catalog for many ``(plant, language, category, sub_category)``
+    entries (category and sub_category may be None) at once: every model is read
+    with a single ``IN`` query whatever the number of entries. ``fields`` is
+    that of load_catalog.
+
+    Returns, in the order of ``entries``, the data tree of each entry or the
+    LocalizationNotFound load_catalog would have raised for it.
+    """
+    if not entries:
+        return []
+
+    plant_ids = {plant.pk for plant, _, _, _ in entries}
+    language_ids = {language.pk for _, language, _, _ in entries}
+    category_ids = {category.pk for _, _, category, _ in entries if category is not None}
+
+    statistics = VizStatistics.objects.filter(plant_id__in=plant_ids)
+    sub_categories = StatisticSubCategory.objects.select_related('category')
+    if fields is None or 'var_names' in fields:
+        sub_categories = sub_categories.prefetch_related('variables')
+    sub_categories = list(
+        sub_categories.filter(Q(pk__in=statistics.values('sub_category_id')) | Q(category_id__in=category_ids))
+    )
+    sub_categories_by_pk = {sub_category.pk: sub_category for sub_category in sub_categories}
+
+    category_locs = {
+        (loc.language_id, loc.category_id): loc
+        for loc in StatisticCategoryLocalization.objects.filter(
+            language_id__in=language_ids,
+            category_id__in={sub_category.category_id for sub_category in sub_categories},
+        )
+    }
+    sub_category_locs = {
+        (loc.language_id, loc.sub_category_id): loc
+        for loc in StatisticSubCategoryLocalization.objects.filter(
+            language_id__in=language_ids,
+            sub_category_id__in=sub_categories_by_pk,
+        )
+    }
+
+    plant_statistics = {}
+    for stat in statistics:
+        stat.sub_category = sub_categories_by_pk[stat.sub_category_id]
+        plant_statistics.setdefault(stat.plant_id, []).append(stat)
+
+    results = []
+    for plant, language, category, sub_category in entries:
+        localize = _Localizer(language.pk, category_locs, sub_category_locs)
+        try:
+            if category is None:
+                results.append(_render_plant(plant_statistics.get(plant.pk, []), localize, fields))
+                continue
+
+            selected = [
+                item for item in sub_categories
+                if item.category_id == category.pk and (sub_category is None or item.pk == sub_category.pk)
+            ]
+            selected_ids = {item.pk for item in selected}
+            stats = [stat for stat in plant_statistics.get(plant.pk, []) if stat.sub_category_id in selected_ids]
+            results.append(_render_category(category, selected, stats, localize, fields))
+        except LocalizationNotFound as e:
+            results.append(e)
+
+    return results
+
+
+def catalog_layout(language):
+    """
+    For every category, whether it is localized in ``language``, the ids of its
+    sub categories in order and those of them not localized in ``language``.
+
+    Stored next to a whole plant ``data`` tree, it lets slice_catalog answer a
+    category or sub category exactly as load_catalog would.
+    """
+    sub_categories = StatisticSubCategory.objects.select_related('category').prefetch_related(
+        Prefetch(
+            'Localizations',
+            queryset=StatisticSubCategoryLocalization.objects.filter(language=language),
+            to_attr='localized',
+        ),
+        Prefetch(
+            'category__Localizations',
+            queryset=StatisticCategoryLocalization.objects.filter(language=language),
+            to_attr='localized',
+        ),
+    )
+
+    layout = {}
+    for sub_category in sub_categories:
+        category = sub_category.category
+        if category.category_id not in layout:
+            layout[category.category_id] = {
+                "localized": bool(category.localized),
+                "sub_categories": [],
+                "not_localized": [],
+            }
+
+        layout[category.category_id]["sub_categories"].append(sub_category.sub_category_id)
+        if not sub_category.localized:
+            layout[category.category_id]["not_localized"].append(sub_category.sub_category_id)
+
+    return layout
+
+
+def slice_catalog(data, layout, category_id, sub_category_id=None):
+    """
+    Restrict a ``data`` tree built by load_catalog for a whole plant to one
+    category, and optionally one of its sub categories, ``layout`` being the
+    catalog_layout of the same language.
+
+    Raises LocalizationNotFound if a required localization is missing.
+    """
+    category_layout = layout.get(category_id)
+    if category_layout is None:
+        return {}
+
+    if sub_category_id is None:
+        sub_category_ids = category_layout["sub_categories"]
+    elif sub_category_id in category_layout["sub_categories"]:
+        sub_category_ids = [sub_category_id]
+    else:
+        return {}
+
+    for item_id in sub_category_ids:
+        if not category_layout["localized"]:
+            raise LocalizationNotFound('category', category_id)
+        if item_id in category_layout["not_localized"]:
+            raise LocalizationNotFound('sub_category', category_id, item_id)
+
+    if category_id not in data:
+        return {}
+
+    items = data[category_id]["items"]
+    items = {item_id: items[item_id] for item_id in sub_category_ids if item_id in items}
+    if not items:
+        return {}
+
+    return {
+        category_id: {
+            "name": data[category_id]["name"],
+            "items": items,
+        }
+    }
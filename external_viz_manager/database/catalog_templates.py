@@ -0,0 +1,99 @@
+import time
+import string
+
+from django.db import transaction
+
+from .models import PlantInfo, VizStatistics
+from .importer import upsert
+from .signals import schedule_rebuild
+
+# fields of the plant a url pattern can refer to
+PLACEHOLDERS = ('plant_id', 'plant_name', 'plant_location', 'domain')
+
+
+def check_pattern(pattern):
+    """
+    Raise ValueError if ``pattern`` refers to something else than PLACEHOLDERS
+    or is not a valid format string.
+    """
+    try:
+        fields = [field for _, field, _, _ in string.Formatter().parse(pattern) if field is not None]
+    except ValueError as e:
+        raise ValueError(f"invalid url pattern: {e}")
+    unknown = [field for field in fields if field not in PLACEHOLDERS]
+    if unknown:
+        raise ValueError(f"unknown placeholder {{{unknown[0]}}}, use {', '.join(f'{{{p}}}' for p in PLACEHOLDERS)}")
+
+
+class TemplateResult:
+    """
+    What apply_template did: statistic rows of the template for the plants
+    covered, of which created and updated (the others already held the url
+    of the template), primary keys of the plants covered and seconds spent.
+    """
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.updated = 0
+        self.plant_ids = []
+        self.elapsed = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+
+def apply_template(template, plants=None, batch_size=1000, snapshots=True):
+    """
+    Upsert the statistic urls of ``template`` for each plant of the ``plants``
+    queryset (default: all plants), in one transaction.
+
+    Plants are read a chunk of ``batch_size`` at a time and the rows of a
+    chunk upserted at once on (plant, sub_category, url_name): applying a
+    template again creates nothing and only rewrites the urls whose pattern
+    changed. Rows are bulk written, so the snapshots of the plants are
+    rebuilt once on commit if any row was written, unless ``snapshots`` is
+    False.
+    """
+    items = list(template.items.values_list('sub_category_id', 'url_name', 'url_pattern'))
+    for _, _, pattern in items:
+        check_pattern(pattern)
+
+    if plants is None:
+        plants = PlantInfo.objects.all()
+    plants = plants.order_by('pk').values('pk', *PLACEHOLDERS)
+
+    result = TemplateResult()
+    start = time.perf_counter()
+    with transaction.atomic():
+        chunk = []
+
+        def write_chunk():
+            pks = [plant['pk'] for plant in chunk]
+            rows = []
+            for plant in chunk:
+                values = {key: plant[key] or '' for key in PLACEHOLDERS}
+                rows.extend(
+                    VizStatistics(plant_id=plant['pk'], sub_category_id=sub_category_id, url_name=url_name, url=pattern.format_map(values))
+                    for sub_category_id, url_name, pattern in items
+                )
+            created, updated = upsert(VizStatistics, rows, ('plant_id', 'sub_category_id', 'url_name'), ['url'], batch_size)
+            result.created += created
+            result.updated += updated
+            result.rows += len(rows)
+            result.plant_ids.extend(pks)
+
+        if items:
+            for plant in plants.iterator(chunk_size=batch_size):
+                chunk.append(plant)
+                if len(chunk) >= batch_size:
+                    write_chunk()
+                    chunk = []
+            if chunk:
+                write_chunk()
+
+        if snapshots and (result.created or result.updated):
+            schedule_rebuild(result.plant_ids)
+        result.elapsed = time.perf_counter() - start
+
+    return result
@@ -0,0 +1,397 @@
+import json
+import zlib
+from datetime import datetime, timedelta, timezone
+
+from django.db import connection, transaction, IntegrityError
+from django.db.models import Q
+
+from .models import PlantInfo, Language, StatisticCategory, StatisticSubCategory, StatisticsVar, VizStatistics
+from .models import StatisticCategoryLocalization, StatisticSubCategoryLocalization, CatalogSnapshot
+from .models import CatalogTemplate, CatalogTemplateItem
+from .snapshots import rebuild_snapshots
+from .cache_version import bump_catalog_version
+
+MAGIC = b'EVCATDMP'
+FORMAT_VERSION = 2
+
+# How each field is encoded:
+#   int       zigzag varint, for primary keys as in the source database
+#   fk        a foreign key, as int, remapped to the primary keys of the target on restore
+#   text      varint length + 1 then utf-8, 0 for None: values seldom repeated, like urls
+#   dict      dictionary encoded: 0 None, 1 a new string (length + utf-8) added to the
+#             dictionary, n + 2 the n-th string of the dictionary
+#   json      the json text of the value, dictionary encoded
+#   datetime  zigzag varint of microseconds since the epoch, UTC
+#
+# Tables are written parents first. Only parents carry their primary key, for
+# the foreign keys of their children to be remapped on restore. Catalog
+# snapshots are derived data, restore rebuilds them.
+TABLES = (
+    (Language, (('id', 'int'), ('code', 'dict'), ('name', 'dict'), ('created_at', 'datetime'))),
+    (PlantInfo, (
+        ('id', 'int'), ('plant_id', 'text'), ('plant_name', 'text'), ('plant_location', 'dict'),
+        ('domain', 'text'), ('created_at', 'datetime'), ('meta_info', 'json'),
+    )),
+    (StatisticCategory, (('id', 'int'), ('category_id', 'dict'), ('created_at', 'datetime'))),
+    (StatisticSubCategory, (('id', 'int'), ('category_id', 'fk'), ('sub_category_id', 'dict'), ('created_at', 'datetime'))),
+    (StatisticCategoryLocalization, (('category_id', 'fk'), ('language_id', 'fk'), ('category_name', 'dict'), ('url', 'dict'))),
+    (StatisticSubCategoryLocalization, (
+        ('sub_category_id', 'fk'), ('language_id', 'fk'), ('sub_category_name', 'dict'), ('description', 'dict'), ('url', 'dict'),
+    )),
+    (StatisticsVar, (('sub_category_id', 'fk'), ('variable_key', 'dict'), ('variable_value', 'json'), ('created_at', 'datetime'))),
+    (VizStatistics, (('plant_id', 'fk'), ('sub_category_id', 'fk'), ('url_name', 'dict'), ('url', 'text'), ('created_at', 'datetime'))),
+    # since format version 2
+    (CatalogTemplate, (('id', 'int'), ('name', 'text'), ('description', 'text'), ('created_at', 'datetime'))),
+    (CatalogTemplateItem, (('template_id', 'fk'), ('sub_category_id', 'fk'), ('url_name', 'dict'), ('url_pattern', 'dict'))),
+)
+
+# Fields identifying a row across databases. A row of the dump whose natural
+# key is already in the database is not restored, the rows of the dump
+# pointing to it are attached to the row of the database.
+NATURAL_KEYS = {
+    Language: ('code',),
+    PlantInfo: ('plant_id',),
+    StatisticCategory: ('category_id',),
+    StatisticSubCategory: ('category_id', 'sub_category_id'),
+    StatisticCategoryLocalization: ('category_id', 'language_id'),
+    StatisticSubCategoryLocalization: ('sub_category_id', 'language_id'),
+    StatisticsVar: ('sub_category_id', 'variable_key'),
+    VizStatistics: ('plant_id', 'sub_category_id', 'url_name'),
+    CatalogTemplate: ('name',),
+    CatalogTemplateItem: ('template_id', 'sub_category_id', 'url_name'),
+}
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+class DumpFormatError(ValueError):
+    """
+    Raised for a file that is not a catalog dump or of a newer format version.
+    """
+
+
+def _zigzag(value):
+    return (value << 1) ^ (value >> 63) if value < 0 else value << 1
+
+
+def _unzigzag(value):
+    return (value >> 1) ^ -(value & 1)
+
+
+def _varint(out, value):
+    while value > 0x7f:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _micros(value):
+    return (value - EPOCH) // timedelta(microseconds=1)
+
+
+class _Encoder:
+    def __init__(self):
+        self.strings = {}
+
+    def text(self, out, value):
+        if value is None:
+            out.append(0)
+            return
+        data = value.encode()
+        _varint(out, len(data) + 1)
+        out += data
+
+    def dict(self, out, value):
+        if value is None:
+            out.append(0)
+            return
+        index = self.strings.get(value)
+        if index is not None:
+            _varint(out, index + 2)
+            return
+        self.strings[value] = len(self.strings)
+        data = value.encode()
+        out.append(1)
+        _varint(out, len(data))
+        out += data
+
+    def encoders(self, fields):
+        kinds = {
+            'int': lambda out, value: _varint(out, _zigzag(value)),
+            'fk': lambda out, value: _varint(out, _zigzag(value)),
+            'text': self.text,
+            'dict': self.dict,
+            'json': lambda out, value: self.dict(out, None if value is None else json.dumps(value, separators=(',', ':'))),
+            'datetime': lambda out, value: _varint(out, _zigzag(_micros(value))),
+        }
+        return [kinds[kind] for _, kind in fields]
+
+
+def dump_catalog(stream, chunk_size=2000, level=6):
+    """
+    Write the catalog to the binary ``stream`` in the dump format: MAGIC, the
+    format version, then a zlib stream of a json header describing the tables
+    followed by the rows of each table in chunks of ``chunk_size``.
+
+    Rows are read with ``iterator()`` a chunk at a time, memory stays bounded
+    by the chunk and the dictionary of repeated strings. Returns the number of
+    rows written by model name.
+    """
+    stream.write(MAGIC + bytes([FORMAT_VERSION]))
+    compressor = zlib.compressobj(level)
+    encoder = _Encoder()
+
+    header = json.dumps({
+        'version': FORMAT_VERSION,
+        'vendor': connection.vendor,
+        'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'tables': [[model.__name__, [[name, kind] for name, kind in fields]] for model, fields in TABLES],
+    }).encode()
+    out = bytearray()
+    _varint(out, len(header))
+    out += header
+    stream.write(compressor.compress(bytes(out)))
+
+    counts = {}
+    for model, fields in TABLES:
+        names = [name for name, _ in fields]
+        encoders = encoder.encoders(fields)
+        count = 0
+        rows = []
+
+        def write_chunk():
+            out = bytearray()
+            _varint(out, len(rows))
+            for row in rows:
+                for encode, value in zip(encoders, row):
+                    encode(out, value)
+            stream.write(compressor.compress(bytes(out)))
+
+        for row in model.objects.order_by('pk').values_list(*names).iterator(chunk_size=chunk_size):
+            rows.append(row)
+            if len(rows) >= chunk_size:
+                write_chunk()
+                count += len(rows)
+                rows = []
+        if rows:
+            write_chunk()
+            count += len(rows)
+        # end of the table
+        stream.write(compressor.compress(b'\x00'))
+        counts[model.__name__] = count
+
+    stream.write(compressor.flush())
+    return counts
+
+
+class _Reader:
+    """
+    Decompress a dump from ``stream`` a block at a time and decode its values.
+    """
+    def __init__(self, stream, block_size=1 << 16):
+        self.stream = stream
+        self.block_size = block_size
+        self.decompressor = zlib.decompressobj()
+        self.buffer = b''
+        self.position = 0
+        self.strings = []
+
+    def _fill(self, size):
+        while len(self.buffer) - self.position < size:
+            block = self.stream.read(self.block_size)
+            if not block:
+                data = self.decompressor.flush()
+                if not data:
+                    raise DumpFormatError("truncated catalog dump")
+            else:
+                data = self.decompressor.decompress(block)
+            self.buffer = self.buffer[self.position:] + data
+            self.position = 0
+
+    def varint(self):
+        result = shift = 0
+        while True:
+            if self.position >= len(self.buffer):
+                self._fill(1)
+            byte = self.buffer[self.position]
+            self.position += 1
+            result |= (byte & 0x7f) << shift
+            if byte < 0x80:
+                return result
+            shift += 7
+
+    def bytes(self, size):
+        if len(self.buffer) - self.position < size:
+            self._fill(size)
+        data = self.buffer[self.position:self.position + size]
+        self.position += size
+        return data
+
+    def int(self):
+        return _unzigzag(self.varint())
+
+    fk = int
+
+    def text(self):
+        size = self.varint()
+        return None if size == 0 else self.bytes(size - 1).decode()
+
+    def dict(self):
+        index = self.varint()
+        if index == 0:
+            return None
+        if index == 1:
+            value = self.bytes(self.varint()).decode()
+            self.strings.append(value)
+            return value
+        return self.strings[index - 2]
+
+    def json(self):
+        value = self.dict()
+        return None if value is None else json.loads(value)
+
+    def datetime(self):
+        return EPOCH + timedelta(microseconds=self.int())
+
+
+def read_header(stream):
+    """
+    Check the magic and version of a dump, a reader positioned on its rows and the header.
+    """
+    start = stream.read(len(MAGIC) + 1)
+    if len(start) <= len(MAGIC) or start[:len(MAGIC)] != MAGIC:
+        raise DumpFormatError("not a catalog dump")
+    if start[len(MAGIC)] > FORMAT_VERSION:
+        raise DumpFormatError(f"catalog dump of format version {start[len(MAGIC)]}, this version reads up to {FORMAT_VERSION}")
+
+    reader = _Reader(stream)
+    header = json.loads(reader.bytes(reader.varint()))
+    return reader, header
+
+
+def _natural_key(model, row):
+    return tuple(getattr(row, name) for name in NATURAL_KEYS[model])
+
+
+def _existing_pks(model, keys):
+    """
+    The primary key of the row of ``model`` of each natural key of ``keys``
+    found in the database, the oldest row for a key held by several.
+    """
+    names = NATURAL_KEYS[model]
+    if not keys:
+        return {}
+    # one IN per field, the few extra combinations it matches are filtered out below
+    condition = Q(**{f'{name}__in': {key[n] for key in keys} for n, name in enumerate(names)})
+    pks = {}
+    for *key, pk in model.objects.filter(condition).order_by('pk').values_list(*names, 'pk'):
+        pks.setdefault(tuple(key), pk)
+    return {key: pks[key] for key in keys if key in pks}
+
+
+def _insert(model, rows, batch_size):
+    """
+    Insert the ``(old_pk, instance)`` rows of ``model`` whose natural key is
+    neither in the database nor earlier in ``rows``, keeping the created_at
+    of the dump, and return the primary key each old primary key maps to.
+    """
+    keys = [_natural_key(model, row) for _, row in rows]
+    pks = _existing_pks(model, set(keys))
+
+    new, seen = [], set()
+    for key, (_, row) in zip(keys, rows):
+        if key not in pks and key not in seen:
+            seen.add(key)
+            new.append(row)
+
+    if new:
+        # created_at is set on insert by auto_now_add, written back afterwards
+        created = [row.created_at for row in new] if hasattr(model, 'created_at') else None
+        try:
+            model.objects.bulk_create(new, batch_size=batch_size)
+        except IntegrityError as e:
+            # another unique constraint, e.g. the name and location of a plant
+            raise DumpFormatError(f"{model.__name__} rows of the dump conflict with rows of the database: {e}") from e
+        if any(row.pk is None for row in new):
+            # backends not returning the primary keys of the inserted rows
+            inserted = _existing_pks(model, seen)
+            for row in new:
+                row.pk = inserted[_natural_key(model, row)]
+        pks.update((_natural_key(model, row), row.pk) for row in new)
+
+        if created is not None:
+            for row, created_at in zip(new, created):
+                row.created_at = created_at
+            model.objects.bulk_update(new, ['created_at'], batch_size=batch_size)
+
+    return {old: pks[key] for key, (old, _) in zip(keys, rows)}
+
+
+def clear_catalog_tables():
+    """
+    Delete every row of the catalog and of the catalog templates, children
+    first and without firing the signals that would rebuild the snapshots of
+    each plant.
+    """
+    deleted = 0
+    for model in [CatalogSnapshot] + [model for model, _ in reversed(TABLES)]:
+        queryset = model.objects.all()
+        deleted += queryset._raw_delete(queryset.db)
+    return deleted
+
+
+def restore_catalog(stream, replace=False, snapshots=True, batch_size=2000):
+    """
+    Restore a dump written by dump_catalog in one transaction, a chunk of
+    rows at a time with ``bulk_create``.
+
+    Rows already in the database with the same natural key (language code,
+    plant_id, category_id, ...) are kept as they are and the rows of the
+    dump pointing to them are attached to them: foreign keys of the dump are
+    remapped to the primary keys of the target database. With ``replace`` the
+    catalog is emptied first, making the database a copy of the dump.
+    Returns the number of rows read by model name.
+    """
+    reader, header = read_header(stream)
+    models = {model.__name__: model for model, _ in TABLES}
+    tables = []
+    for name, fields in header['tables']:
+        if name not in models:
+            raise DumpFormatError(f"unknown table {name} in the catalog dump")
+        tables.append((models[name], fields))
+
+    remap = {model: {} for model, _ in tables}
+    counts = {}
+    with transaction.atomic():
+        if replace:
+            clear_catalog_tables()
+
+        for model, fields in tables:
+            decoders = [getattr(reader, kind) for _, kind in fields]
+            names = [name for name, _ in fields]
+            parent = 'id' in names
+            foreign_keys = [(name, remap[model._meta.get_field(name).related_model]) for name, kind in fields if kind == 'fk']
+            count = 0
+            while True:
+                size = reader.varint()
+                if size == 0:
+                    break
+                rows = []
+                for _ in range(size):
+                    values = dict(zip(names, [decode() for decode in decoders]))
+                    old_pk = values.pop('id', None)
+                    for name, pks in foreign_keys:
+                        values[name] = pks[values[name]]
+                    rows.append((old_pk, model(**values)))
+
+                pks = _insert(model, rows, batch_size)
+                if parent:
+                    remap[model].update(pks)
+                count += size
+            counts[model.__name__] = count
+
+        if snapshots:
+            rebuild_snapshots()
+        transaction.on_commit(bump_catalog_version)
+
+    return counts
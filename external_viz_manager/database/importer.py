@@ -0,0 +1,368 @@
+import os
+import csv
+import json
+
+from django.db import transaction
+from django.db.models import Q
+
+from .models import PlantInfo, Language, StatisticCategory, StatisticSubCategory, StatisticsVar, VizStatistics
+from .models import StatisticCategoryLocalization, StatisticSubCategoryLocalization
+from .snapshots import rebuild_snapshots
+from .cache_version import bump_catalog_version
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+FORMATS = ('json', 'jsonl', 'csv', 'yaml')
+EXTENSIONS = {'.json': 'json', '.jsonl': 'jsonl', '.ndjson': 'jsonl', '.csv': 'csv', '.yaml': 'yaml', '.yml': 'yaml'}
+
+# fields of each record type, parents are referenced by their natural keys
+RECORDS = {
+    'language': ('code', 'name'),
+    'plant': ('plant_id', 'plant_name', 'plant_location', 'domain'),
+    'category': ('category_id',),
+    'category_localization': ('category_id', 'language', 'name', 'url'),
+    'sub_category': ('category_id', 'sub_category_id'),
+    'sub_category_localization': ('category_id', 'sub_category_id', 'language', 'name', 'description', 'url'),
+    'variable': ('category_id', 'sub_category_id', 'key', 'value'),
+    'statistic': ('plant_id', 'category_id', 'sub_category_id', 'url_name', 'url'),
+}
+REQUIRED = {
+    'language': ('code', 'name'),
+    'plant': ('plant_id', 'plant_name', 'plant_location'),
+    'category': ('category_id',),
+    'category_localization': ('category_id', 'language', 'name', 'url'),
+    'sub_category': ('category_id', 'sub_category_id'),
+    'sub_category_localization': ('category_id', 'sub_category_id', 'language', 'name', 'url'),
+    'variable': ('category_id', 'sub_category_id', 'key', 'value'),
+    'statistic': ('plant_id', 'category_id', 'sub_category_id', 'url_name', 'url'),
+}
+
+
+def upsert(model, rows, key, update_fields, batch_size=1000):
+    """
+    Insert the ``rows`` of ``model`` whose natural ``key`` (attribute names)
+    is not in the database yet and write the ``update_fields`` of the others
+    to every row of the database holding their key, duplicates included. Rows
+    whose values are already those of the database are not written again.
+
+    For the tables whose natural key is not backed by a unique constraint,
+    where ``bulk_create(update_conflicts=True)`` cannot be used. ``rows`` must
+    not hold a key twice. Returns the numbers of rows created and updated.
+    """
+    if not rows:
+        return 0, 0
+    # one IN per field, the few extra combinations it matches are skipped below
+    condition = Q(**{f'{name}__in': {getattr(row, name) for row in rows} for name in key})
+    existing = {}
+    for values in model.objects.filter(condition).values('pk', *key, *update_fields).iterator(chunk_size=batch_size):
+        existing.setdefault(tuple(values[name] for name in key), []).append(values)
+
+    created, updated = [], []
+    for row in rows:
+        matches = existing.get(tuple(getattr(row, name) for name in key))
+        if matches is None:
+            created.append(row)
+            continue
+        for values in matches:
+            # json values compare equal whatever their key order, which jsonb
+            # does not keep
+            if any(values[field] != getattr(row, field) for field in update_fields):
+                updated.append(model(pk=values['pk'], **{field: getattr(row, field) for field in update_fields}))
+
+    model.objects.bulk_create(created, batch_size=batch_size)
+    model.objects.bulk_update(updated, update_fields, batch_size=batch_size)
+    return len(created), len(updated)
+
+
+class CatalogImportError(ValueError):
+    """
+    Raised for a record that cannot be imported, the whole import is rolled back.
+    """
+    def __init__(self, number, message):
+        super().__init__(f"record {number}: {message}")
+        self.number = number
+
+
+def detect_format(path):
+    return EXTENSIONS.get(os.path.splitext(path)[1].lower())
+
+
+def read_records(stream, format):
+    """
+    The records of ``stream``, dicts with a ``type`` among RECORDS, read as
+    they come for jsonl, csv and yaml (one record or a list of them per
+    document). json documents, a list of records or ``{"records": [...]}``,
+    are loaded at once.
+    """
+    if format == 'jsonl':
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+    elif format == 'json':
+        document = json.load(stream)
+        yield from document['records'] if isinstance(document, dict) else document
+    elif format == 'csv':
+        for row in csv.DictReader(stream):
+            record = {key: value for key, value in row.items() if value not in ('', None)}
+            if record.get('type') == 'variable' and 'value' in record:
+                # variables are JSON values, plain strings are taken as is
+                try:
+                    record['value'] = json.loads(record['value'])
+                except ValueError:
+                    pass
+            yield record
+    elif format == 'yaml':
+        if yaml is None:
+            raise ValueError("PyYAML is not installed, convert the input to json, jsonl or csv")
+        for document in yaml.safe_load_all(stream):
+            if isinstance(document, dict) and 'records' in document:
+                document = document['records']
+            yield from document if isinstance(document, list) else [document]
+    else:
+        raise ValueError(f"unknown format {format}, one of {', '.join(FORMATS)}")
+
+
+class CatalogImporter:
+    """
+    Upsert catalog records by batches of ``batch_size`` rows per table, keyed
+    on the natural keys of the rows (plant_id, category_id, language code,
+    ...): one ``bulk_create(update_conflicts=True)`` per batch on the tables
+    with a unique constraint on it, ``upsert`` on the variables and
+    statistics, of which the database may hold duplicates.
+
+    Records reference their parents by natural key, parents being records
+    seen before or rows already in the database. Pending batches are written
+    parents first, so references always resolve. Use it in a transaction:
+    rows are written as batches fill up and the import stops at the first
+    record that cannot be imported.
+    """
+    def __init__(self, batch_size=1000):
+        self.batch_size = batch_size
+        self.pending = {kind: {} for kind in RECORDS}
+        self.counts = {kind: 0 for kind in RECORDS}
+        self.languages = {}
+        self.plants = {}
+        self.categories = {}
+        self.sub_categories = {}
+        self.plant_pks = set()
+        self.layout_changed = False
+
+    def add(self, number, record):
+        kind = record.get('type')
+        if kind not in RECORDS:
+            raise CatalogImportError(number, f"unknown type {kind!r}, one of {', '.join(RECORDS)}")
+        missing = [field for field in REQUIRED[kind] if record.get(field) in (None, '')]
+        if missing:
+            raise CatalogImportError(number, f"{kind} without {', '.join(missing)}")
+
+        fields = RECORDS[kind]
+        values = {field: record.get(field) for field in fields}
+        key = self._key(kind, values)
+        # the last record of a key wins, a batch must not upsert a row twice
+        self.pending[kind][key] = (number, values)
+        if len(self.pending[kind]) >= self.batch_size:
+            self.flush()
+
+    @staticmethod
+    def _key(kind, values):
+        if kind in ('language', 'plant', 'category'):
+            return values[RECORDS[kind][0]]
+        if kind == 'category_localization':
+            return values['category_id'], values['language']
+        if kind == 'sub_category':
+            return values['category_id'], values['sub_category_id']
+        if kind == 'sub_category_localization':
+            return values['category_id'], values['sub_category_id'], values['language']
+        if kind == 'variable':
+            return values['category_id'], values['sub_category_id'], values['key']
+        return values['plant_id'], values['category_id'], values['sub_category_id'], values['url_name']
+
+    def _resolve(self, cache, keys, lookup):
+        """
+        Fill ``cache`` with the primary keys of ``keys`` not in it yet, read
+        from the database by ``lookup(keys)`` returning (key, pk) pairs.
+        """
+        missing = {key for key in keys if key not in cache}
+        if missing:
+            cache.update(lookup(missing))
+
+    def _pk(self, cache, key, number, what):
+        pk = cache.get(key)
+        if pk is None:
+            raise CatalogImportError(number, f"unknown {what} {key}")
+        return pk
+
+    def _resolve_languages(self, codes):
+        self._resolve(self.languages, codes, lambda missing: Language.objects.filter(code__in=missing).values_list('code', 'pk'))
+
+    def _resolve_plants(self, plant_ids):
+        self._resolve(self.plants, plant_ids, lambda missing: PlantInfo.objects.filter(plant_id__in=missing).values_list('plant_id', 'pk'))
+
+    def _resolve_categories(self, category_ids):
+        self._resolve(
+            self.categories, category_ids,
+            lambda missing: StatisticCategory.objects.filter(category_id__in=missing).values_list('category_id', 'pk'),
+        )
+
+    def _resolve_sub_categories(self, keys):
+        def lookup(missing):
+            rows = StatisticSubCategory.objects.filter(
+                category__category_id__in={category_id for category_id, _ in missing},
+                sub_category_id__in={sub_category_id for _, sub_category_id in missing},
+            ).values_list('category__category_id', 'sub_category_id', 'pk')
+            return (((category_id, sub_category_id), pk) for category_id, sub_category_id, pk in rows)
+
+        self._resolve(self.sub_categories, keys, lookup)
+
+    def _write(self, kind, model, rows, **options):
+        model.objects.bulk_create(rows, batch_size=self.batch_size, **options)
+        self.counts[kind] += len(rows)
+
+    def _upsert(self, kind, model, rows, key, update_fields):
+        upsert(model, rows, key, update_fields, self.batch_size)
+        self.counts[kind] += len(rows)
+
+    def flush(self):
+        """
+        Write every pending batch, parents first.
+        """
+        pending = self.pending
+        if pending['language']:
+            rows = [Language(code=values['code'], name=values['name']) for _, values in pending['language'].values()]
+            self._write('language', Language, rows, update_conflicts=True, unique_fields=['code'], update_fields=['name'])
+            self.layout_changed = True
+
+        if pending['plant']:
+            rows = [
+                PlantInfo(
+                    plant_id=values['plant_id'], plant_name=values['plant_name'],
+                    plant_location=values['plant_location'], domain=values['domain'],
+                )
+                for _, values in pending['plant'].values()
+            ]
+            self._write(
+                'plant', PlantInfo, rows,
+                update_conflicts=True, unique_fields=['plant_id'], update_fields=['plant_name', 'plant_location', 'domain'],
+            )
+            self._resolve_plants([row.plant_id for row in rows])
+            self.plant_pks.update(self.plants[row.plant_id] for row in rows)
+
+        if pending['category']:
+            rows = [StatisticCategory(category_id=values['category_id']) for _, values in pending['category'].values()]
+            self._write('category', StatisticCategory, rows, ignore_conflicts=True)
+            self.layout_changed = True
+
+        if pending['category_localization']:
+            entries = pending['category_localization'].values()
+            self._resolve_categories([values['category_id'] for _, values in entries])
+            self._resolve_languages([values['language'] for _, values in entries])
+            rows = [
+                StatisticCategoryLocalization(
+                    category_id=self._pk(self.categories, values['category_id'], number, 'category'),
+                    language_id=self._pk(self.languages, values['language'], number, 'language'),
+                    category_name=values['name'], url=values['url'],
+                )
+                for number, values in entries
+            ]
+            self._write(
+                'category_localization', StatisticCategoryLocalization, rows,
+                update_conflicts=True, unique_fields=['category', 'language'], update_fields=['category_name', 'url'],
+            )
+            self.layout_changed = True
+
+        if pending['sub_category']:
+            entries = pending['sub_category'].values()
+            self._resolve_categories([values['category_id'] for _, values in entries])
+            rows = [
+                StatisticSubCategory(
+                    category_id=self._pk(self.categories, values['category_id'], number, 'category'),
+                    sub_category_id=values['sub_category_id'],
+                )
+                for number, values in entries
+            ]
+            self._write('sub_category', StatisticSubCategory, rows, ignore_conflicts=True)
+            self.layout_changed = True
+
+        if pending['sub_category_localization']:
+            entries = pending['sub_category_localization'].values()
+            self._resolve_sub_categories([(values['category_id'], values['sub_category_id']) for _, values in entries])
+            self._resolve_languages([values['language'] for _, values in entries])
+            rows = [
+                StatisticSubCategoryLocalization(
+                    sub_category_id=self._pk(self.sub_categories, (values['category_id'], values['sub_category_id']), number, 'sub category'),
+                    language_id=self._pk(self.languages, values['language'], number, 'language'),
+                    sub_category_name=values['name'], description=values['description'], url=values['url'],
+                )
+                for number, values in entries
+            ]
+            self._write(
+                'sub_category_localization', StatisticSubCategoryLocalization, rows,
+                update_conflicts=True, unique_fields=['sub_category', 'language'],
+                update_fields=['sub_category_name', 'description', 'url'],
+            )
+            self.layout_changed = True
+
+        if pending['variable']:
+            entries = pending['variable'].values()
+            self._resolve_sub_categories([(values['category_id'], values['sub_category_id']) for _, values in entries])
+            rows = [
+                StatisticsVar(
+                    sub_category_id=self._pk(self.sub_categories, (values['category_id'], values['sub_category_id']), number, 'sub category'),
+                    variable_key=values['key'], variable_value=values['value'],
+                )
+                for number, values in entries
+            ]
+            self._upsert('variable', StatisticsVar, rows, ('sub_category_id', 'variable_key'), ['variable_value'])
+            # variables are rendered into the catalog of every plant using their sub category
+            self.layout_changed = True
+
+        if pending['statistic']:
+            entries = pending['statistic'].values()
+            self._resolve_plants([values['plant_id'] for _, values in entries])
+            self._resolve_sub_categories([(values['category_id'], values['sub_category_id']) for _, values in entries])
+            rows = [
+                VizStatistics(
+                    plant_id=self._pk(self.plants, values['plant_id'], number, 'plant'),
+                    sub_category_id=self._pk(self.sub_categories, (values['category_id'], values['sub_category_id']), number, 'sub category'),
+                    url_name=values['url_name'], url=values['url'],
+                )
+                for number, values in entries
+            ]
+            self._upsert('statistic', VizStatistics, rows, ('plant_id', 'sub_category_id', 'url_name'), ['url'])
+            self.plant_pks.update(row.plant_id for row in rows)
+
+        for batch in pending.values():
+            batch.clear()
+
+    def rebuild_snapshots(self):
+        """
+        Rebuild the catalog snapshots the imported rows are part of: those of
+        every plant when the layout changed, of the imported plants otherwise.
+        Returns the number of plant x language pairs rebuilt.
+        """
+        if not self.layout_changed and not self.plant_pks:
+            return 0
+        with transaction.atomic():
+            return rebuild_snapshots(None if self.layout_changed else self.plant_pks)
+
+
+def import_catalog(stream, format, batch_size=1000):
+    """
+    Import the records of ``stream`` in one transaction. Returns the
+    CatalogImporter, with the number of rows upserted by record type in
+    ``counts``: its snapshots are left to rebuild_snapshots(), as bulk upserts
+    fire no signal.
+    """
+    importer = CatalogImporter(batch_size=batch_size)
+    with transaction.atomic():
+        for number, record in enumerate(read_records(stream, format), 1):
+            if not isinstance(record, dict):
+                raise CatalogImportError(number, f"expected an object, got {type(record).__name__}")
+            importer.add(number, record)
+        importer.flush()
+        transaction.on_commit(bump_catalog_version)
+
+    return importer
@@ -0,0 +1,55 @@
+import time
+from django.db import DatabaseError, transaction
+from django.core.management.base import BaseCommand, CommandError
+
+from database.models import PlantInfo, CatalogTemplate
+from database.signals import schedule_rebuild, wait_for_rebuilds
+from database.catalog_templates import apply_template
+
+
+class Command(BaseCommand):
+    help = 'Create or refresh the statistic urls of a catalog template for many plants at once'
+
+    def add_arguments(self, parser):
+        parser.add_argument('template', help='name of the catalog template')
+        parser.add_argument('--plant', action='append', dest='plants', help='plant_id to apply the template to, may be repeated')
+        parser.add_argument('--location', action='append', dest='locations', help='apply to the plants of this location, may be repeated')
+        parser.add_argument('--all', action='store_true', help='apply to every plant')
+        parser.add_argument('--batch-size', type=int, default=1000, help='plants per bulk upsert')
+        parser.add_argument('--no-snapshots', action='store_true', help='do not rebuild the catalog snapshots of the plants')
+
+    def handle(self, *args, **kwargs):
+        try:
+            template = CatalogTemplate.objects.get(name=kwargs['template'])
+        except CatalogTemplate.DoesNotExist:
+            raise CommandError(f"no catalog template named {kwargs['template']}")
+
+        if not (kwargs['plants'] or kwargs['locations'] or kwargs['all']):
+            raise CommandError('pass --plant, --location or --all')
+        plants = PlantInfo.objects.all()
+        if kwargs['plants']:
+            plants = plants.filter(plant_id__in=kwargs['plants'])
+        if kwargs['locations']:
+            plants = plants.filter(plant_location__in=kwargs['locations'])
+
+        try:
+            result = apply_template(template, plants, batch_size=kwargs['batch_size'], snapshots=False)
+        except (ValueError, DatabaseError) as e:
+            raise CommandError(f"template not applied, {e}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Applied {template} to {len(result.plant_ids)} plants: {result.rows} rows matched, {result.created} created, {result.updated} updated, '
+            f'in {result.elapsed:.2f}s ({result.rows_per_second:.0f} rows/s)'
+        ))
+
+        if kwargs['no_snapshots'] or not (result.created or result.updated):
+            if result.created or result.updated:
+                self.stdout.write(self.style.WARNING('Catalog snapshots not rebuilt, run rebuild_catalog_snapshots'))
+            return
+
+        start = time.perf_counter()
+        with transaction.atomic():
+            schedule_rebuild(result.plant_ids)
+        # many plants are rebuilt in the background, the command waits for them
+        wait_for_rebuilds()
+        self.stdout.write(f'Rebuilt the snapshots of {len(result.plant_ids)} plants in {time.perf_counter() - start:.2f}s')
@@ -0,0 +1,32 @@
+import sys
+import time
+from django.core.management.base import BaseCommand
+
+from database.dump import dump_catalog
+
+
+class Command(BaseCommand):
+    help = 'Write the catalog (plants, languages, categories, localizations, variables, statistics) to a compact binary dump'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='file to write, - for stdout')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='rows read and encoded at a time')
+        parser.add_argument('--level', type=int, default=6, choices=range(0, 10), metavar='0-9', help='zlib compression level')
+
+    def handle(self, *args, **kwargs):
+        start = time.perf_counter()
+        if kwargs['path'] == '-':
+            counts = dump_catalog(sys.stdout.buffer, kwargs['chunk_size'], kwargs['level'])
+            size = None
+        else:
+            with open(kwargs['path'], 'wb') as stream:
+                counts = dump_catalog(stream, kwargs['chunk_size'], kwargs['level'])
+                size = stream.tell()
+
+        # stdout carries the dump, report on stderr then
+        out = self.stderr if kwargs['path'] == '-' else self.stdout
+        out.write(self.style.SUCCESS(
+            f'Dumped {sum(counts.values())} rows in {time.perf_counter() - start:.2f}s'
+            + (f', {size / 1024:.1f} KiB' if size is not None else '') + ': '
+            + ', '.join(f'{count} {model}' for model, count in counts.items())
+        ))
@@ -0,0 +1,50 @@
+import sys
+import time
+from django.db import DatabaseError
+from django.core.management.base import BaseCommand, CommandError
+
+from database.importer import FORMATS, CatalogImportError, detect_format, import_catalog
+
+
+class Command(BaseCommand):
+    help = (
+        'Upsert plants, categories, sub categories, localizations, variables and statistic urls '
+        'from a json, jsonl, csv or yaml file of records, in one transaction'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="file to import, - for stdin (requires --format)")
+        parser.add_argument('--format', choices=FORMATS, help='format of the input (default: from the file extension)')
+        parser.add_argument('--batch-size', type=int, default=1000, help='rows per bulk upsert')
+        parser.add_argument('--no-snapshots', action='store_true', help='do not rebuild the catalog snapshots after the import')
+
+    def handle(self, *args, **kwargs):
+        path = kwargs['path']
+        format = kwargs['format'] or (detect_format(path) if path != '-' else None)
+        if format is None:
+            raise CommandError(f"cannot tell the format of {path}, pass --format")
+
+        start = time.perf_counter()
+        try:
+            if path == '-':
+                importer = import_catalog(sys.stdin, format, kwargs['batch_size'])
+            else:
+                with open(path, newline='' if format == 'csv' else None, encoding='utf-8') as stream:
+                    importer = import_catalog(stream, format, kwargs['batch_size'])
+        except (CatalogImportError, ValueError, OSError, DatabaseError) as e:
+            raise CommandError(f"nothing imported, {e}")
+
+        elapsed = time.perf_counter() - start
+        rows = sum(importer.counts.values())
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {rows} rows in {elapsed:.2f}s ({rows / elapsed:.0f} rows/s): '
+            + ', '.join(f'{count} {kind}' for kind, count in importer.counts.items() if count)
+        ))
+
+        if kwargs['no_snapshots']:
+            self.stdout.write(self.style.WARNING('Catalog snapshots not rebuilt, run rebuild_catalog_snapshots'))
+            return
+
+        start = time.perf_counter()
+        count = importer.rebuild_snapshots()
+        self.stdout.write(f'Rebuilt {count} plant x language snapshots in {time.perf_counter() - start:.2f}s')
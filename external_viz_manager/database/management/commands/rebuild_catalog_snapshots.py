@@ -0,0 +1,36 @@
+import time
+from django.db import transaction
+from django.core.management.base import BaseCommand
+
+from database.models import PlantInfo, Language, CatalogSnapshot
+from database.snapshots import rebuild_snapshots, rebuild_stale_snapshots
+
+
+class Command(BaseCommand):
+    help = 'Re-render the catalog snapshots served by the data api from the catalog tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--plant', action='append', dest='plants', help='plant_id to rebuild, may be repeated (default: all plants)')
+        parser.add_argument('--language', action='append', dest='languages', help='language code to rebuild, may be repeated (default: all languages)')
+        parser.add_argument('--stale', action='store_true', help='only rebuild the snapshots marked stale, e.g. by a failed or interrupted rebuild')
+
+    def handle(self, *args, **kwargs):
+        plant_ids = language_ids = None
+        if kwargs['plants']:
+            plant_ids = list(PlantInfo.objects.filter(plant_id__in=kwargs['plants']).values_list('pk', flat=True))
+        if kwargs['languages']:
+            language_ids = list(Language.objects.filter(code__in=kwargs['languages']).values_list('pk', flat=True))
+
+        # snapshots are rendered again from the catalog rather than deleted, so that
+        # their versions keep increasing and clients never see a version twice
+        start = time.perf_counter()
+        with transaction.atomic():
+            if kwargs['stale']:
+                count = rebuild_stale_snapshots(plant_ids, language_ids)
+            else:
+                count = rebuild_snapshots(plant_ids, language_ids)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {count} plant x language snapshots in {time.perf_counter() - start:.2f}s, '
+            f'{CatalogSnapshot.objects.count()} snapshots stored'
+        ))
@@ -0,0 +1,43 @@
+import sys
+import time
+from django.db import DatabaseError, transaction
+from django.core.management.base import BaseCommand, CommandError
+
+from database.dump import DumpFormatError, restore_catalog
+from database.snapshots import rebuild_snapshots
+
+
+class Command(BaseCommand):
+    help = 'Restore a catalog dump written by dump_catalog, in one transaction'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='dump to read, - for stdin')
+        parser.add_argument('--replace', action='store_true', help='delete the catalog and templates of the database first, making it a copy of the dump')
+        parser.add_argument('--batch-size', type=int, default=2000, help='rows per bulk insert')
+        parser.add_argument('--no-snapshots', action='store_true', help='do not rebuild the catalog snapshots after the restore')
+
+    def handle(self, *args, **kwargs):
+        start = time.perf_counter()
+        options = dict(replace=kwargs['replace'], snapshots=False, batch_size=kwargs['batch_size'])
+        try:
+            if kwargs['path'] == '-':
+                counts = restore_catalog(sys.stdin.buffer, **options)
+            else:
+                with open(kwargs['path'], 'rb') as stream:
+                    counts = restore_catalog(stream, **options)
+        except (DumpFormatError, OSError, DatabaseError) as e:
+            raise CommandError(f"nothing restored, {e}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Restored {sum(counts.values())} rows in {time.perf_counter() - start:.2f}s: '
+            + ', '.join(f'{count} {model}' for model, count in counts.items())
+        ))
+
+        if kwargs['no_snapshots']:
+            self.stdout.write(self.style.WARNING('Catalog snapshots not rebuilt, run rebuild_catalog_snapshots'))
+            return
+
+        start = time.perf_counter()
+        with transaction.atomic():
+            count = rebuild_snapshots()
+        self.stdout.write(f'Rebuilt {count} plant x language snapshots in {time.perf_counter() - start:.2f}s')
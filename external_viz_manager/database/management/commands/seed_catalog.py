@@ -0,0 +1,42 @@
+import time
+from django.core.management.base import BaseCommand
+
+from database.synthetic import generate_catalog, clear_catalog
+
+
+class Command(BaseCommand):
+    help = 'Seed a synthetic catalog of plants x categories x sub categories x languages, for benchmarks and load tests'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--plants', type=int, default=10)
+        parser.add_argument('--categories', type=int, default=5)
+        parser.add_argument('--sub-categories', type=int, default=4, help='sub categories per category')
+        parser.add_argument('--languages', type=int, default=2)
+        parser.add_argument('--urls', type=int, default=2, help='statistics per plant and sub category')
+        parser.add_argument('--variables', type=int, default=2, help='variables per sub category')
+        parser.add_argument('--no-snapshots', action='store_true', help='leave the catalog snapshots of the generated plants out')
+        parser.add_argument('--clear', action='store_true', help='delete a previously generated catalog first')
+        parser.add_argument('--clear-only', action='store_true', help='delete the generated catalog and stop')
+
+    def handle(self, *args, **kwargs):
+        if kwargs['clear'] or kwargs['clear_only']:
+            deleted = clear_catalog()
+            self.stdout.write(f'Deleted {deleted} generated rows')
+            if kwargs['clear_only']:
+                return
+
+        start = time.perf_counter()
+        counts = generate_catalog(
+            plants=kwargs['plants'],
+            categories=kwargs['categories'],
+            sub_categories=kwargs['sub_categories'],
+            languages=kwargs['languages'],
+            urls=kwargs['urls'],
+            variables=kwargs['variables'],
+            snapshots=not kwargs['no_snapshots'],
+        )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {sum(counts.values())} rows in {time.perf_counter() - start:.2f}s: '
+            + ', '.join(f'{count} {model}' for model, count in counts.items())
+        ))
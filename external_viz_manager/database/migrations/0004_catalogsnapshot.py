@@ -0,0 +1,31 @@
+# Generated by Django 4.2 on 2026-10-17 18:39
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('database', '0003_alter_statisticsubcategory_sub_category_id_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.JSONField()),
+                ('layout', models.JSONField(default=dict)),
+                ('version', models.PositiveIntegerField(default=1)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('language', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='catalog_snapshots', to='database.language')),
+                ('plant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='catalog_snapshots', to='database.plantinfo')),
+            ],
+            options={
+                'verbose_name_plural': 'Catalog Snapshots',
+                'db_table': 'catalog_snapshot',
+                'unique_together': {('plant', 'language')},
+            },
+        ),
+    ]
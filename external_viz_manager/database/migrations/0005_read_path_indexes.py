@@ -0,0 +1,29 @@
+# Generated by Django 4.2 on 2026-10-17 18:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('database', '0004_catalogsnapshot'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='plantinfo',
+            index=models.Index(fields=['domain'], name='plant_info_domain_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='statisticcategorylocalization',
+            index=models.Index(fields=['language', 'category'], name='category_loc_language_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='statisticsubcategorylocalization',
+            index=models.Index(fields=['language', 'sub_category'], name='sub_category_loc_language_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vizstatistics',
+            index=models.Index(fields=['plant', 'sub_category'], name='viz_stat_plant_sub_idx'),
+        ),
+    ]
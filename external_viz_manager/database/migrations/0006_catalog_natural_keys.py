@@ -0,0 +1,37 @@
+# Generated by Django 4.2 on 2026-10-17 19:40
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def drop_duplicates(apps, schema_editor):
+    # variable keys are dict keys of the rendered catalog, of duplicates only
+    # the last row shows. Keep the last one of duplicate url names too
+    for model_name, fields in (
+        ('VizStatistics', ('plant', 'sub_category', 'url_name')),
+        ('StatisticsVar', ('sub_category', 'variable_key')),
+    ):
+        model = apps.get_model('database', model_name)
+        duplicates = model.objects.values(*fields).annotate(count=Count('pk'), last=Max('pk')).filter(count__gt=1)
+        for duplicate in duplicates.iterator():
+            key = {field: duplicate[field] for field in fields}
+            model.objects.filter(**key).exclude(pk=duplicate['last']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('database', '0005_read_path_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='vizstatistics',
+            constraint=models.UniqueConstraint(fields=('plant', 'sub_category', 'url_name'), name='viz_stat_plant_sub_url_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='statisticsvar',
+            constraint=models.UniqueConstraint(fields=('sub_category', 'variable_key'), name='statistic_var_key_uniq'),
+        ),
+    ]
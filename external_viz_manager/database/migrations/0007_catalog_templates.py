@@ -0,0 +1,45 @@
+# Generated by Django 4.2 on 2026-10-17 19:41
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('database', '0006_catalog_natural_keys'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogTemplate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('description', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Catalog Templates',
+                'db_table': 'catalog_template',
+            },
+        ),
+        migrations.CreateModel(
+            name='CatalogTemplateItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url_name', models.CharField(max_length=255)),
+                ('url_pattern', models.CharField(help_text='e.g. https://{domain}/d/{plant_id}/overview, placeholders: {plant_id}, {plant_name}, {plant_location}, {domain}', max_length=255)),
+                ('sub_category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='template_items', to='database.statisticsubcategory')),
+                ('template', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='database.catalogtemplate')),
+            ],
+            options={
+                'verbose_name_plural': 'Catalog Template Items',
+                'db_table': 'catalog_template_item',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='catalogtemplateitem',
+            constraint=models.UniqueConstraint(fields=('template', 'sub_category', 'url_name'), name='catalog_template_item_uniq'),
+        ),
+    ]
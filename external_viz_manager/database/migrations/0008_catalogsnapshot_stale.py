@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-17 20:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('database', '0007_catalog_templates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='catalogsnapshot',
+            name='stale',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2 on 2026-10-17 20:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('database', '0008_catalogsnapshot_stale'),
+    ]
+
+    # the importer matches the natural keys itself (database.importer.upsert),
+    # rows sharing one are kept rather than the database refusing them
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='statisticsvar',
+            name='statistic_var_key_uniq',
+        ),
+        migrations.RemoveConstraint(
+            model_name='vizstatistics',
+            name='viz_stat_plant_sub_url_uniq',
+        ),
+        migrations.AddIndex(
+            model_name='statisticsvar',
+            index=models.Index(fields=['sub_category', 'variable_key'], name='statistic_var_key_idx'),
+        ),
+    ]
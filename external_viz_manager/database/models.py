@@ -1,4 +1,5 @@
 from django.db import models
+from django.core.exceptions import ValidationError
 
 # Create your models here.
 class PlantInfo(models.Model):
@@ -13,6 +14,9 @@ class PlantInfo(models.Model):
         db_table = 'plant_info'
         verbose_name_plural = 'Plant Information'
         unique_together = ('plant_name', 'plant_location')
+        indexes = [
+            models.Index(fields=['domain'], name='plant_info_domain_idx'),
+        ]
 
     def __str__(self):
         return f"{self.plant_name} in {self.plant_location}"
@@ -52,6 +56,9 @@ class StatisticCategoryLocalization(models.Model):
     class Meta:
         db_table = 'statistic_category_Localization'
         unique_together = ('category', 'language')
+        indexes = [
+            models.Index(fields=['language', 'category'], name='category_loc_language_idx'),
+        ]
         verbose_name_plural = 'Statistic Category Localizations'
 
     def __str__(self):
@@ -80,6 +87,9 @@ class StatisticSubCategoryLocalization(models.Model):
     class Meta:
         db_table = 'statistic_sub_category_Localization'
         unique_together = ('sub_category', 'language')
+        indexes = [
+            models.Index(fields=['language', 'sub_category'], name='sub_category_loc_language_idx'),
+        ]
         verbose_name_plural = 'Statistic Sub Category Localizations'
 
     def __str__(self):
@@ -95,6 +105,9 @@ class VizStatistics(models.Model):
     class Meta:
         db_table = 'visual_statistics'
         verbose_name_plural = 'Visual Statistics'
+        indexes = [
+            models.Index(fields=['plant', 'sub_category'], name='viz_stat_plant_sub_idx'),
+        ]
 
     def __str__(self):
         return f"{self.sub_category} - {self.url_name}"
@@ -108,6 +121,77 @@ class StatisticsVar(models.Model):
     class Meta:
         db_table = "statistic_variables"
         verbose_name_plural = 'Statistic Variables'
+        indexes = [
+            models.Index(fields=['sub_category', 'variable_key'], name='statistic_var_key_idx'),
+        ]
 
     def __str__(self):
         return f"{self.sub_category.sub_category_id} - {self.variable_key}"
+
+class CatalogSnapshot(models.Model):
+    """
+    Pre-rendered statistic catalog (the ``data`` tree of the statistic endpoints)
+    of a plant in a language, rebuilt whenever the catalog rows it is made of change.
+    ``layout`` holds what the category endpoints need to slice ``data``. A
+    ``stale`` snapshot is not served until it is rebuilt, see database.signals.
+    """
+    plant = models.ForeignKey(PlantInfo, on_delete=models.CASCADE, related_name='catalog_snapshots')
+    language = models.ForeignKey(Language, on_delete=models.CASCADE, related_name='catalog_snapshots')
+    data = models.JSONField()
+    layout = models.JSONField(default=dict)
+    version = models.PositiveIntegerField(default=1)
+    stale = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'catalog_snapshot'
+        verbose_name_plural = 'Catalog Snapshots'
+        unique_together = ('plant', 'language')
+
+    def __str__(self):
+        return f"{self.plant} - {self.language} (v{self.version})"
+
+class CatalogTemplate(models.Model):
+    """
+    Named set of statistic urls applied at once to many plants, see
+    database.catalog_templates.
+    """
+    name = models.CharField(max_length=255, unique=True)
+    description = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'catalog_template'
+        verbose_name_plural = 'Catalog Templates'
+
+    def __str__(self):
+        return self.name
+
+class CatalogTemplateItem(models.Model):
+    """
+    A statistic url of a template, ``url_pattern`` rendered for each plant
+    with the placeholders of database.catalog_templates.PLACEHOLDERS.
+    """
+    template = models.ForeignKey(CatalogTemplate, on_delete=models.CASCADE, related_name='items')
+    sub_category = models.ForeignKey(StatisticSubCategory, on_delete=models.CASCADE, related_name='template_items')
+    url_name = models.CharField(max_length=255)
+    url_pattern = models.CharField(
+        max_length=255, help_text='e.g. https://{domain}/d/{plant_id}/overview, placeholders: {plant_id}, {plant_name}, {plant_location}, {domain}',
+    )
+
+    class Meta:
+        db_table = 'catalog_template_item'
+        verbose_name_plural = 'Catalog Template Items'
+        constraints = [
+            models.UniqueConstraint(fields=['template', 'sub_category', 'url_name'], name='catalog_template_item_uniq'),
+        ]
+
+    def clean(self):
+        from .catalog_templates import check_pattern
+        try:
+            check_pattern(self.url_pattern)
+        except ValueError as e:
+            raise ValidationError({'url_pattern': str(e)})
+
+    def __str__(self):
+        return f"{self.template} - {self.url_name}"
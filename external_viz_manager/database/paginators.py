@@ -0,0 +1,83 @@
+from django.db import connections
+from django.core.paginator import Paginator
+from django.forms.models import BaseInlineFormSet
+from django.utils.functional import cached_property
+
+
+def estimated_rows(model, using='default'):
+    """
+    The planner's estimate of the number of rows of the table of ``model``,
+    read from the statistics of the database without scanning the table.
+    None where the backend keeps no estimate (sqlite) or the table was never
+    analyzed.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)", [connection.ops.quote_name(table)])
+        elif connection.vendor == 'mysql':
+            cursor.execute(
+                "SELECT table_rows FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = %s", [table],
+            )
+        else:
+            return None
+        row = cursor.fetchone()
+
+    # reltuples is -1 for a table never vacuumed nor analyzed
+    if row is None or row[0] is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator of the admin changelists of large tables. Unfiltered, the number
+    of rows is the planner's estimate rather than a COUNT(*) scanning the
+    whole table, once the table holds at least ``threshold`` rows: the last
+    pages may then come out short or empty. Filtered or searched querysets
+    and small tables are counted exactly.
+    """
+    threshold = 100_000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if hasattr(queryset, 'query') and not queryset.query.where:
+            estimate = estimated_rows(queryset.model, queryset.db)
+            if estimate is not None and estimate >= self.threshold:
+                return estimate
+        return super().count
+
+
+class PaginatedInlineFormSet(BaseInlineFormSet):
+    """
+    Inline formset editing one page of ``per_page`` related rows, the page
+    ``page_number``. The page is read from the query string by
+    PaginatedInlineMixin, for a form posted back to the url it was rendered
+    at to edit the same rows.
+    """
+    per_page = 20
+    page_number = 1
+
+    def get_queryset(self):
+        if not hasattr(self, 'page'):
+            self.page = Paginator(super().get_queryset(), self.per_page).get_page(self.page_number)
+            self._queryset = self.page.object_list
+        return self._queryset
+
+
+class PaginatedInlineMixin:
+    """
+    Tabular inline listing its rows ``per_page`` at a time, with links to the
+    other pages under the table.
+    """
+    formset = PaginatedInlineFormSet
+    template = 'admin/edit_inline/paginated_tabular.html'
+    per_page = 20
+
+    def get_formset(self, request, obj=None, **kwargs):
+        formset = super().get_formset(request, obj, **kwargs)
+        formset.per_page = self.per_page
+        formset.page_number = request.GET.get(f'{formset.get_default_prefix()}-page', 1)
+        return formset
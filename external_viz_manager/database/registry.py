@@ -0,0 +1,157 @@
+import sys
+
+from .models import Language, StatisticCategory, StatisticSubCategory, StatisticsVar
+from .models import StatisticCategoryLocalization, StatisticSubCategoryLocalization
+
+
+class LanguageRef:
+    __slots__ = ('pk', 'code', 'name')
+
+    def __init__(self, pk, code, name):
+        self.pk = pk
+        self.code = code
+        self.name = name
+
+    def __str__(self):
+        return f"{self.name} ({self.code})"
+
+
+class CategoryRef:
+    __slots__ = ('pk', 'category_id')
+
+    def __init__(self, pk, category_id):
+        self.pk = pk
+        self.category_id = category_id
+
+
+class VariableRef:
+    __slots__ = ('variable_key', 'variable_value')
+
+    def __init__(self, variable_key, variable_value):
+        self.variable_key = variable_key
+        self.variable_value = variable_value
+
+
+class Variables(tuple):
+    """
+    VariableRefs of a sub category. ``all()`` mirrors the related manager so
+    the catalog renderers accept both.
+    """
+    __slots__ = ()
+
+    def all(self):
+        return self
+
+
+class SubCategoryRef:
+    __slots__ = ('pk', 'sub_category_id', 'category', 'category_id', 'variables')
+
+    def __init__(self, pk, sub_category_id, category, variables):
+        self.pk = pk
+        self.sub_category_id = sub_category_id
+        self.category = category
+        self.category_id = category.pk
+        self.variables = variables
+
+
+class CategoryLocalizationRef:
+    __slots__ = ('category_name', 'url')
+
+    def __init__(self, category_name, url):
+        self.category_name = category_name
+        self.url = url
+
+
+class SubCategoryLocalizationRef:
+    __slots__ = ('sub_category_name', 'description', 'url')
+
+    def __init__(self, sub_category_name, description, url):
+        self.sub_category_name = sub_category_name
+        self.description = description
+        self.url = url
+
+
+class ReferenceRegistry:
+    """
+    Languages, categories, sub categories with their variables and the
+    localizations of both, loaded at once into slotted objects keyed by primary
+    key (and by their public ids). Never modified once built: a change of the
+    reference data builds a new registry.
+
+    The refs quack like the model instances they stand for, so they can be
+    passed wherever the catalog functions take models.
+    """
+    __slots__ = (
+        'languages', 'languages_by_code', 'categories', 'categories_by_id',
+        'sub_categories', 'sub_categories_by_id', 'category_sub_categories',
+        'category_locs', 'sub_category_locs',
+    )
+
+    def __init__(self):
+        languages = [LanguageRef(*row) for row in Language.objects.order_by('pk').values_list('pk', 'code', 'name')]
+        self.languages = {language.pk: language for language in languages}
+        self.languages_by_code = {language.code: language for language in languages}
+
+        categories = [CategoryRef(*row) for row in StatisticCategory.objects.order_by('pk').values_list('pk', 'category_id')]
+        self.categories = {category.pk: category for category in categories}
+        self.categories_by_id = {category.category_id: category for category in categories}
+
+        variables = {}
+        for sub_category_pk, key, value in StatisticsVar.objects.order_by('pk').values_list('sub_category_id', 'variable_key', 'variable_value'):
+            variables.setdefault(sub_category_pk, []).append(VariableRef(key, value))
+
+        self.sub_categories = {}
+        self.sub_categories_by_id = {}
+        category_sub_categories = {}
+        rows = StatisticSubCategory.objects.order_by('pk').values_list('pk', 'sub_category_id', 'category_id')
+        for pk, sub_category_id, category_pk in rows:
+            category = self.categories[category_pk]
+            sub_category = SubCategoryRef(pk, sub_category_id, category, Variables(variables.get(pk, ())))
+            self.sub_categories[pk] = sub_category
+            self.sub_categories_by_id[(category.category_id, sub_category_id)] = sub_category
+            category_sub_categories.setdefault(category_pk, []).append(sub_category)
+        self.category_sub_categories = {pk: tuple(items) for pk, items in category_sub_categories.items()}
+
+        self.category_locs = {
+            (language_pk, category_pk): CategoryLocalizationRef(name, url)
+            for language_pk, category_pk, name, url in StatisticCategoryLocalization.objects.values_list(
+                'language_id', 'category_id', 'category_name', 'url'
+            )
+        }
+        self.sub_category_locs = {
+            (language_pk, sub_category_pk): SubCategoryLocalizationRef(name, description, url)
+            for language_pk, sub_category_pk, name, description, url in StatisticSubCategoryLocalization.objects.values_list(
+                'language_id', 'sub_category_id', 'sub_category_name', 'description', 'url'
+            )
+        }
+
+    def footprint(self):
+        """
+        Approximate memory used by the registry in bytes, counting every
+        container, ref and value it holds once.
+        """
+        seen = set()
+
+        def size(value):
+            if id(value) in seen:
+                return 0
+            seen.add(id(value))
+            total = sys.getsizeof(value)
+            if isinstance(value, dict):
+                total += sum(size(key) + size(item) for key, item in value.items())
+            elif isinstance(value, (list, tuple, set, frozenset)):
+                total += sum(size(item) for item in value)
+            elif hasattr(value, '__slots__'):
+                total += sum(size(getattr(value, slot)) for slot in value.__slots__ if hasattr(value, slot))
+            return total
+
+        return sum(size(getattr(self, slot)) for slot in self.__slots__)
+
+    def stats(self):
+        return {
+            "languages": len(self.languages),
+            "categories": len(self.categories),
+            "sub_categories": len(self.sub_categories),
+            "localizations": len(self.category_locs) + len(self.sub_category_locs),
+            "bytes": self.footprint(),
+        }
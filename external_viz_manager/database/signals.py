@@ -0,0 +1,202 @@
+import logging
+import threading
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import receiver
+
+from .models import PlantInfo, Language, StatisticCategory, StatisticSubCategory, StatisticsVar, VizStatistics
+from .models import StatisticCategoryLocalization, StatisticSubCategoryLocalization
+from .snapshots import rebuild_snapshots, mark_stale
+from .cache_version import bump_catalog_version
+
+logger = logging.getLogger(__name__)
+
+SYNC_PLANTS = getattr(settings, 'CATALOG_SNAPSHOT_SYNC_PLANTS', 1)
+
+
+def _rebuild(scopes):
+    """
+    Rebuild the snapshots of each ``(plant_ids, language_ids)`` scope, then
+    invalidate the shared response cache. The snapshots of a scope failing to
+    rebuild are marked stale, so that they are not served with the data and
+    ETag they had before the change.
+    """
+    for plant_ids, language_ids in scopes:
+        if plant_ids is not None and not plant_ids:
+            continue
+        try:
+            rebuild_snapshots(plant_ids, language_ids)
+        except Exception:
+            logger.exception("failed to rebuild catalog snapshots for plants %s, languages %s", plant_ids, language_ids)
+            try:
+                mark_stale(plant_ids, language_ids)
+            except Exception:
+                logger.exception("failed to mark catalog snapshots stale for plants %s, languages %s", plant_ids, language_ids)
+
+    bump_catalog_version()
+
+
+class _Rebuilder:
+    """
+    Rebuilds snapshot scopes in a thread of its own, started when scopes are
+    submitted and ending once none is left. Scopes submitted while it runs
+    are merged and rebuilt together in its next round.
+    """
+    def __init__(self):
+        self._scopes = set()
+        self._thread = None
+        self._condition = threading.Condition()
+
+    def submit(self, scopes):
+        with self._condition:
+            self._scopes |= scopes
+            if self._thread is None:
+                # not a daemon: a process exiting finishes the rebuild first
+                self._thread = threading.Thread(target=self._run, name='catalog-snapshots')
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                scopes, self._scopes = self._scopes, set()
+                if not scopes:
+                    self._thread = None
+                    self._condition.notify_all()
+                    return
+            if (None, None) in scopes:
+                scopes = {(None, None)}
+            try:
+                _rebuild(scopes)
+            except Exception:
+                logger.exception("failed to rebuild catalog snapshots")
+            finally:
+                connections.close_all()
+
+    def wait(self, timeout=None):
+        """
+        Wait for the submitted scopes to be rebuilt, returns whether they were.
+        """
+        with self._condition:
+            return self._condition.wait_for(lambda: self._thread is None, timeout)
+
+
+_rebuilder = _Rebuilder()
+
+
+def wait_for_rebuilds(timeout=None):
+    """
+    Wait for the snapshots rebuilt in the background to be done, returns
+    whether they were within ``timeout`` seconds.
+    """
+    return _rebuilder.wait(timeout)
+
+
+class _Batch:
+    """
+    Scopes scheduled within one transaction, handled once it commits. When
+    they touch at most SYNC_PLANTS plants (one by default, an edit of a
+    statistic) they are rebuilt before the commit hook returns. Otherwise,
+    and always for all plants, they are marked stale at once and rebuilt in
+    the background, so that the transaction does not wait for the renders.
+    """
+    def __init__(self):
+        self.scopes = set()
+
+    def __call__(self):
+        plants = set()
+        for plant_ids, _ in self.scopes:
+            plants |= plant_ids or set()
+        background = {
+            (plant_ids, language_ids) for plant_ids, language_ids in self.scopes
+            if plant_ids is None or len(plants) > SYNC_PLANTS
+        }
+        try:
+            for plant_ids, language_ids in background:
+                mark_stale(plant_ids, language_ids)
+            _rebuild(self.scopes - background)
+        finally:
+            if background:
+                _rebuilder.submit(background)
+
+
+def _pending_batch(connection):
+    # the batch of the transaction if its hook is registered yet, dropped with
+    # the hooks of the transaction or savepoint it was registered in on rollback
+    for _, callback, _ in reversed(connection.run_on_commit):
+        if isinstance(callback, _Batch):
+            return callback
+    return None
+
+
+def schedule_rebuild(plant_ids=None, language_ids=None, using=None):
+    """
+    Rebuild the snapshots of ``plant_ids`` x ``language_ids`` (None meaning all)
+    and invalidate the shared response cache once the current transaction
+    commits, or at once outside a transaction. Scopes scheduled within the
+    same transaction are handled together after the commit and forgotten if
+    it rolls back.
+    """
+    scope = (
+        frozenset(plant_ids) if plant_ids is not None else None,
+        frozenset(language_ids) if language_ids is not None else None,
+    )
+    connection = transaction.get_connection(using)
+    batch = _pending_batch(connection) if connection.in_atomic_block else None
+    if batch is not None:
+        batch.scopes.add(scope)
+        return
+
+    batch = _Batch()
+    batch.scopes.add(scope)
+    transaction.on_commit(batch, using)
+
+
+@receiver(post_save, sender=PlantInfo)
+def plant_changed(sender, instance, **kwargs):
+    schedule_rebuild([instance.pk])
+
+
+@receiver(post_save, sender=Language)
+def language_changed(sender, instance, **kwargs):
+    schedule_rebuild(language_ids=[instance.pk])
+
+
+@receiver(pre_save, sender=VizStatistics)
+def statistic_moving(sender, instance, **kwargs):
+    if instance.pk is not None:
+        instance._previous_plant_id = VizStatistics.objects.filter(pk=instance.pk).values_list('plant_id', flat=True).first()
+
+
+@receiver(post_save, sender=VizStatistics)
+@receiver(post_delete, sender=VizStatistics)
+def statistic_changed(sender, instance, **kwargs):
+    plant_ids = {instance.plant_id}
+    if getattr(instance, '_previous_plant_id', None) is not None:
+        plant_ids.add(instance._previous_plant_id)
+    schedule_rebuild(plant_ids)
+
+
+# categories, sub categories and their localizations are part of the layout
+# shared by every snapshot, so changing them touches all plants
+@receiver(post_save, sender=StatisticCategory)
+@receiver(post_save, sender=StatisticSubCategory)
+@receiver(post_delete, sender=StatisticSubCategory)
+def sub_category_changed(sender, instance, **kwargs):
+    schedule_rebuild()
+
+
+@receiver(post_save, sender=StatisticCategoryLocalization)
+@receiver(post_delete, sender=StatisticCategoryLocalization)
+@receiver(post_save, sender=StatisticSubCategoryLocalization)
+@receiver(post_delete, sender=StatisticSubCategoryLocalization)
+def localization_changed(sender, instance, **kwargs):
+    schedule_rebuild(language_ids=[instance.language_id])
+
+
+@receiver(post_save, sender=StatisticsVar)
+@receiver(post_delete, sender=StatisticsVar)
+def variable_changed(sender, instance, **kwargs):
+    plant_ids = VizStatistics.objects.filter(sub_category_id=instance.sub_category_id).values_list('plant_id', flat=True)
+    schedule_rebuild(set(plant_ids))
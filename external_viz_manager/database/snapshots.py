@@ -0,0 +1,182 @@
+from django.db import transaction
+
+from .catalog import load_catalog, load_catalogs, catalog_layout, slice_catalog, LocalizationNotFound
+from .models import PlantInfo, Language, CatalogSnapshot
+
+
+def rebuild_snapshot(plant, language, layout=None):
+    """
+    Re-render the catalog of ``plant`` in ``language`` into its CatalogSnapshot.
+
+    The version is only bumped when the rendered data changed, a stale snapshot is
+    served again either way. Plants whose catalog cannot be rendered (no statistics
+    or a missing localization) get no snapshot, so the endpoints fall back to the
+    live path and report the error. ``layout`` may be passed when rebuilding many
+    plants in the same language.
+    Returns the snapshot or None.
+    """
+    with transaction.atomic():
+        snapshot = CatalogSnapshot.objects.select_for_update().filter(plant=plant, language=language).first()
+        try:
+            data = load_catalog(plant, language)
+        except LocalizationNotFound:
+            data = None
+
+        if not data:
+            if snapshot is not None:
+                snapshot.delete()
+            return None
+
+        if layout is None:
+            layout = catalog_layout(language)
+        if snapshot is None:
+            return CatalogSnapshot.objects.create(plant=plant, language=language, data=data, layout=layout)
+
+        if snapshot.data != data or snapshot.layout != layout:
+            snapshot.data = data
+            snapshot.layout = layout
+            snapshot.version += 1
+            snapshot.stale = False
+            snapshot.save(update_fields=['data', 'layout', 'version', 'stale', 'updated_at'])
+        elif snapshot.stale:
+            snapshot.stale = False
+            snapshot.save(update_fields=['stale', 'updated_at'])
+
+        return snapshot
+
+
+def rebuild_snapshots(plant_ids=None, language_ids=None):
+    """
+    Rebuild the snapshots of every plant x language pair, restricted to
+    ``plant_ids`` / ``language_ids`` when given. Returns the number of pairs rebuilt.
+    """
+    plants = PlantInfo.objects.all()
+    if plant_ids is not None:
+        plants = plants.filter(pk__in=plant_ids)
+
+    languages = Language.objects.all()
+    if language_ids is not None:
+        languages = languages.filter(pk__in=language_ids)
+
+    languages = list(languages)
+    layouts = {language.pk: catalog_layout(language) for language in languages}
+    count = 0
+    for plant in plants:
+        for language in languages:
+            rebuild_snapshot(plant, language, layouts[language.pk])
+            count += 1
+
+    return count
+
+
+def mark_stale(plant_ids=None, language_ids=None):
+    """
+    Stop serving the snapshots of ``plant_ids`` x ``language_ids`` (None
+    meaning all) until they are rebuilt: readers render the catalog from its
+    tables meanwhile. Returns the number of snapshots marked.
+    """
+    snapshots = CatalogSnapshot.objects.filter(stale=False)
+    if plant_ids is not None:
+        snapshots = snapshots.filter(plant_id__in=plant_ids)
+    if language_ids is not None:
+        snapshots = snapshots.filter(language_id__in=language_ids)
+    return snapshots.update(stale=True)
+
+
+def rebuild_stale_snapshots(plant_ids=None, language_ids=None):
+    """
+    Rebuild the snapshots marked stale, restricted to ``plant_ids`` /
+    ``language_ids`` when given. Returns the number rebuilt.
+    """
+    snapshots = CatalogSnapshot.objects.filter(stale=True)
+    if plant_ids is not None:
+        snapshots = snapshots.filter(plant_id__in=plant_ids)
+    if language_ids is not None:
+        snapshots = snapshots.filter(language_id__in=language_ids)
+
+    count = 0
+    for snapshot in snapshots.select_related('plant', 'language').defer('data', 'layout'):
+        rebuild_snapshot(snapshot.plant, snapshot.language)
+        count += 1
+    return count
+
+
+def get_snapshot(plant, language_code):
+    """
+    The CatalogSnapshot of ``plant`` in the language ``language_code``, with its
+    language, or None if the plant has no snapshot in that language or it is
+    stale.
+
+    ``data`` and ``layout`` are deferred so that checking the version is cheap,
+    they are loaded on first access.
+    """
+    snapshots = CatalogSnapshot.objects.select_related('language').defer('data', 'layout')
+    return snapshots.filter(plant=plant, language__code=language_code, stale=False).first()
+
+
+def snapshot_versions(plant, languages):
+    """
+    Versions of the fresh snapshots of ``plant`` in each of ``languages``, in
+    their order and None for a language without one, read with one query.
+    """
+    versions = dict(
+        CatalogSnapshot.objects.filter(plant=plant, language_id__in=[language.pk for language in languages], stale=False)
+        .values_list('language_id', 'version')
+    )
+    return tuple(versions.get(language.pk) for language in languages)
+
+
+def load_snapshot_catalogs(entries, fields=None):
+    """
+    load_catalogs answering the ``(plant, language, category, sub_category)``
+    entries from their CatalogSnapshot where there is a fresh one: snapshots are read
+    with one query and only the remaining entries reach load_catalogs.
+
+    Snapshots hold every field of the items: with ``fields`` (see
+    catalog.item_fields) all entries are rendered by load_catalogs instead,
+    reading only what those fields need.
+    """
+    if fields is not None:
+        return load_catalogs(entries, fields)
+
+    snapshots = {
+        (snapshot.plant_id, snapshot.language_id): snapshot
+        for snapshot in CatalogSnapshot.objects.filter(
+            plant_id__in={plant.pk for plant, _, _, _ in entries},
+            language_id__in={language.pk for _, language, _, _ in entries},
+            stale=False,
+        )
+    }
+
+    live = [entry for entry in entries if (entry[0].pk, entry[1].pk) not in snapshots]
+    loaded = iter(load_catalogs(live))
+
+    results = []
+    for plant, language, category, sub_category in entries:
+        snapshot = snapshots.get((plant.pk, language.pk))
+        if snapshot is None:
+            results.append(next(loaded))
+        elif category is None:
+            results.append(snapshot.data)
+        else:
+            sub_category_id = sub_category.sub_category_id if sub_category is not None else None
+            try:
+                results.append(slice_catalog(snapshot.data, snapshot.layout, category.category_id, sub_category_id))
+            except LocalizationNotFound as e:
+                results.append(e)
+
+    return results
+
+
+async def aget_snapshot(plant, language_code):
+    """
+    Asynchronous version of get_snapshot. Deferred fields cannot be loaded
+    lazily from async code, use aload_snapshot_data before reading them.
+    """
+    snapshots = CatalogSnapshot.objects.select_related('language').defer('data', 'layout')
+    return await snapshots.filter(plant=plant, language__code=language_code, stale=False).afirst()
+
+
+async def aload_snapshot_data(snapshot):
+    snapshot.data, snapshot.layout = await CatalogSnapshot.objects.values_list('data', 'layout').aget(pk=snapshot.pk)
+    return snapshot
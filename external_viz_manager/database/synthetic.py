@@ -0,0 +1,147 @@
+from django.db import transaction
+
+from .models import PlantInfo, Language, StatisticCategory, StatisticSubCategory, StatisticsVar, VizStatistics
+from .models import StatisticCategoryLocalization, StatisticSubCategoryLocalization, CatalogTemplateItem
+from .snapshots import rebuild_snapshots
+from .cache_version import bump_catalog_version
+
+# ids of the generated rows, clear_catalog only deletes rows carrying them
+PREFIX = 'synthetic'
+LANGUAGE_PREFIX = 'syn'
+
+
+def generate_catalog(plants=10, categories=5, sub_categories=4, languages=2, urls=2, variables=2, snapshots=True, batch_size=1000):
+    """
+    Seed a synthetic catalog into the configured database: ``plants`` plants
+    x ``categories`` categories x ``sub_categories`` sub categories each,
+    localized in ``languages`` languages, with ``urls`` statistics per plant
+    and sub category and ``variables`` variables per sub category.
+
+    Rows are bulk created, so no signal fires: the catalog snapshots of the
+    generated plants are rebuilt at the end unless ``snapshots`` is False.
+    The database must not hold a generated catalog already, see clear_catalog.
+    Returns the number of rows created by model name.
+    """
+    with transaction.atomic():
+        Language.objects.bulk_create(
+            [Language(code=f'{LANGUAGE_PREFIX}{l}', name=f'Synthetic {l}') for l in range(languages)],
+            batch_size=batch_size,
+        )
+        language_rows = list(Language.objects.filter(code__startswith=LANGUAGE_PREFIX).order_by('pk'))
+
+        StatisticCategory.objects.bulk_create(
+            [StatisticCategory(category_id=f'{PREFIX}-category-{c}') for c in range(categories)],
+            batch_size=batch_size,
+        )
+        category_rows = list(StatisticCategory.objects.filter(category_id__startswith=f'{PREFIX}-').order_by('pk'))
+
+        StatisticSubCategory.objects.bulk_create(
+            [
+                StatisticSubCategory(category=category, sub_category_id=f'{PREFIX}-sub-{s}')
+                for category in category_rows for s in range(sub_categories)
+            ],
+            batch_size=batch_size,
+        )
+        sub_category_rows = list(StatisticSubCategory.objects.filter(category__in=category_rows).order_by('pk'))
+
+        StatisticCategoryLocalization.objects.bulk_create(
+            [
+                StatisticCategoryLocalization(
+                    category=category, language=language, category_name=f'Category {c} ({language.code})', url=f'/{PREFIX}/{c}',
+                )
+                for c, category in enumerate(category_rows) for language in language_rows
+            ],
+            batch_size=batch_size,
+        )
+        StatisticSubCategoryLocalization.objects.bulk_create(
+            [
+                StatisticSubCategoryLocalization(
+                    sub_category=sub_category, language=language,
+                    sub_category_name=f'Sub category {sub_category.sub_category_id} ({language.code})',
+                    description=f'Synthetic sub category {s}', url=f'/{PREFIX}/sub/{s}',
+                )
+                for s, sub_category in enumerate(sub_category_rows) for language in language_rows
+            ],
+            batch_size=batch_size,
+        )
+        StatisticsVar.objects.bulk_create(
+            [
+                StatisticsVar(sub_category=sub_category, variable_key=f'var-{v}', variable_value={'value': v, 'unit': '%'})
+                for sub_category in sub_category_rows for v in range(variables)
+            ],
+            batch_size=batch_size,
+        )
+
+        PlantInfo.objects.bulk_create(
+            [
+                PlantInfo(
+                    plant_id=f'{PREFIX}-plant-{p}', plant_name=f'Synthetic Plant {p}', plant_location=PREFIX,
+                    domain=f'plant-{p}.{PREFIX}.local',
+                )
+                for p in range(plants)
+            ],
+            batch_size=batch_size,
+        )
+        plant_rows = list(PlantInfo.objects.filter(plant_id__startswith=f'{PREFIX}-').order_by('pk'))
+
+        statistics = 0
+        for plant in plant_rows:
+            # a plant at a time, the rows of a large catalog would not fit in memory at once
+            VizStatistics.objects.bulk_create(
+                [
+                    VizStatistics(
+                        plant=plant, sub_category=sub_category, url_name=f'url-{u}',
+                        url=f'https://grafana.{PREFIX}.local/d/{plant.pk}/{sub_category.pk}/{u}?orgId=1&kiosk',
+                    )
+                    for sub_category in sub_category_rows for u in range(urls)
+                ],
+                batch_size=batch_size,
+            )
+            statistics += len(sub_category_rows) * urls
+
+        snapshot_count = 0
+        if snapshots:
+            snapshot_count = rebuild_snapshots([plant.pk for plant in plant_rows], [language.pk for language in language_rows])
+        transaction.on_commit(bump_catalog_version)
+
+    return {
+        'PlantInfo': len(plant_rows),
+        'Language': len(language_rows),
+        'StatisticCategory': len(category_rows),
+        'StatisticSubCategory': len(sub_category_rows),
+        'StatisticCategoryLocalization': len(category_rows) * len(language_rows),
+        'StatisticSubCategoryLocalization': len(sub_category_rows) * len(language_rows),
+        'StatisticsVar': len(sub_category_rows) * variables,
+        'VizStatistics': statistics,
+        'CatalogSnapshot': snapshot_count,
+    }
+
+
+def clear_catalog():
+    """
+    Delete the rows created by generate_catalog, and only those. Returns the
+    number of rows deleted.
+    """
+    with transaction.atomic():
+        # catalog rows are deleted without loading them nor firing the signals
+        # that would rebuild the snapshots of every plant, those of the
+        # generated plants go with them
+        deleted = sum(
+            queryset._raw_delete(queryset.db) for queryset in (
+                VizStatistics.objects.filter(plant__plant_id__startswith=f'{PREFIX}-'),
+                CatalogTemplateItem.objects.filter(sub_category__category__category_id__startswith=f'{PREFIX}-'),
+                StatisticsVar.objects.filter(sub_category__category__category_id__startswith=f'{PREFIX}-'),
+                StatisticSubCategoryLocalization.objects.filter(sub_category__category__category_id__startswith=f'{PREFIX}-'),
+                StatisticCategoryLocalization.objects.filter(category__category_id__startswith=f'{PREFIX}-'),
+                StatisticSubCategory.objects.filter(category__category_id__startswith=f'{PREFIX}-'),
+            )
+        )
+        for queryset in (
+            PlantInfo.objects.filter(plant_id__startswith=f'{PREFIX}-'),
+            StatisticCategory.objects.filter(category_id__startswith=f'{PREFIX}-'),
+            Language.objects.filter(code__startswith=LANGUAGE_PREFIX),
+        ):
+            deleted += queryset.delete()[0]
+        transaction.on_commit(bump_catalog_version)
+
+    return deleted
@@ -1,3 +1,1497 @@
-from django.test import TestCase
+import json
+import re
+import time
+from unittest import mock
 
-# Create your tests here.
+from django.db import connection, transaction
+from django.urls import reverse
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+from .models import PlantInfo, Language, StatisticCategory, StatisticSubCategory, VizStatistics, StatisticsVar
+from .models import StatisticCategoryLocalization, StatisticSubCategoryLocalization, CatalogSnapshot
+from .models import CatalogTemplate, CatalogTemplateItem
+from .dump import TABLES
+from .signals import wait_for_rebuilds
+
+
+class ReadPathQueryPlanTests(TestCase):
+    """
+    The queries of the statistic read path must be answered from an index,
+    never by scanning a whole table.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.language = Language.objects.create(code='de', name='German')
+        cls.plant = PlantInfo.objects.create(plant_id='plant', plant_name='Plant', plant_location='here', domain='plant.example.com')
+        cls.categories, cls.sub_categories = [], []
+        for c in range(3):
+            category = StatisticCategory.objects.create(category_id=f'category-{c}')
+            StatisticCategoryLocalization.objects.create(category=category, language=cls.language, category_name=f'Category {c}', url='/')
+            cls.categories.append(category)
+            for s in range(3):
+                sub_category = StatisticSubCategory.objects.create(category=category, sub_category_id=f'sub-{s}')
+                StatisticSubCategoryLocalization.objects.create(sub_category=sub_category, language=cls.language, sub_category_name=f'Sub {s}', url='/')
+                StatisticsVar.objects.create(sub_category=sub_category, variable_key='threshold', variable_value={'value': s})
+                VizStatistics.objects.create(plant=cls.plant, sub_category=sub_category, url_name=f'url-{c}-{s}', url='https://example.com')
+                cls.sub_categories.append(sub_category)
+        CatalogSnapshot.objects.create(plant=cls.plant, language=cls.language, data={})
+
+    def setUp(self):
+        if connection.vendor == 'postgresql':
+            # tiny test tables are cheaper to scan, only fall back to it without a usable index
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+        elif connection.vendor != 'sqlite':
+            self.skipTest(f"no query plan check for {connection.vendor}")
+
+    def assertIndexed(self, queryset):
+        plan = queryset.explain()
+        if connection.vendor == 'postgresql':
+            scans = re.findall(r'Seq Scan on "?(\w+)"?', plan)
+        else:
+            scans = re.findall(r'\bSCAN "?(\w+)"?', plan)
+        self.assertEqual(scans, [], f"sequential scan in the plan of {queryset.query}:\n{plan}")
+
+    def test_plant_lookup(self):
+        self.assertIndexed(PlantInfo.objects.filter(domain='plant.example.com'))
+        self.assertIndexed(PlantInfo.objects.filter(plant_id='plant'))
+
+    def test_plant_statistics(self):
+        self.assertIndexed(VizStatistics.objects.filter(plant=self.plant))
+        self.assertIndexed(VizStatistics.objects.filter(plant=self.plant, sub_category__in=self.sub_categories[:3]))
+
+    def test_sub_categories_and_variables(self):
+        self.assertIndexed(StatisticSubCategory.objects.filter(category__in=self.categories))
+        self.assertIndexed(StatisticsVar.objects.filter(sub_category__in=self.sub_categories))
+
+    def test_localizations(self):
+        self.assertIndexed(StatisticCategoryLocalization.objects.filter(language=self.language, category__in=self.categories))
+        self.assertIndexed(StatisticSubCategoryLocalization.objects.filter(language=self.language, sub_category__in=self.sub_categories))
+        self.assertIndexed(StatisticSubCategoryLocalization.objects.filter(language=self.language))
+
+    def test_snapshot(self):
+        self.assertIndexed(CatalogSnapshot.objects.filter(plant=self.plant, language__code='de'))
+
+
+class PlantIndexTests(SimpleTestCase):
+    """
+    An explicit domain matches exactly, a Host header case-insensitively,
+    without port and against wildcard domains.
+    """
+    def setUp(self):
+        from data_api.cache.plant_resolver import PlantIndex
+        self.plants = {
+            domain: PlantInfo(plant_id=domain, domain=domain)
+            for domain in ('plant.example.com', 'Upper.example.com', '*.wild.example.com', '.dot.example.com')
+        }
+        self.index = PlantIndex([*self.plants.values(), PlantInfo(plant_id='twin', domain='plant.example.com')])
+
+    def test_domain_name_is_exact(self):
+        self.assertEqual(self.index.by_domain_name('Upper.example.com'), self.plants['Upper.example.com'])
+        for domain in ('upper.example.com', 'Upper.example.com:8000', 'a.wild.example.com', 'dot.example.com', '', None):
+            with self.subTest(domain=domain):
+                self.assertIsNone(self.index.by_domain_name(domain))
+        # a shared domain designates the first plant given, the lowest pk
+        self.assertEqual(self.index.by_domain_name('plant.example.com'), self.plants['plant.example.com'])
+
+    def test_host_is_normalized(self):
+        self.assertEqual(self.index.by_host('UPPER.example.com:8000'), self.plants['Upper.example.com'])
+        self.assertEqual(self.index.by_host('a.b.wild.example.com'), self.plants['*.wild.example.com'])
+        self.assertEqual(self.index.by_host('dot.example.com'), self.plants['.dot.example.com'])
+        self.assertEqual(self.index.by_host('a.dot.example.com'), self.plants['.dot.example.com'])
+        for host in ('wild.example.com', 'plant.example.com', 'other.example.com', '', None):
+            with self.subTest(host=host):
+                self.assertIsNone(self.index.by_host(host))
+
+
+class ResponseCacheTests(SimpleTestCase):
+    """
+    Bounds and expiry of the in-process LRU cache, and the lookup / store /
+    release cycle of a response through both cache tiers.
+    """
+    def test_eviction(self):
+        from data_api.cache.response_cache import LRUCache
+        cache = LRUCache(max_entries=3, max_bytes=100)
+        for key in 'abc':
+            cache.set(key, b'x' * 10)
+        cache.get('a')
+        cache.set('d', b'x' * 10)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual([key for key in 'acd' if cache.get(key) is not None], ['a', 'c', 'd'])
+
+        # the least recently used entries go until the new one fits in max_bytes
+        cache.set('e', b'x' * 85)
+        self.assertEqual([key for key in 'acde' if cache.get(key) is not None], ['d', 'e'])
+        self.assertEqual(cache.stats()['bytes'], 95)
+        self.assertEqual(cache.stats()['evictions'], 3)
+
+        # larger than the whole cache, never stored
+        cache.set('f', b'x' * 101)
+        self.assertIsNone(cache.get('f'))
+        self.assertEqual(cache.stats()['entries'], 2)
+
+    def test_ttl(self):
+        from data_api.cache.response_cache import LRUCache
+        cache = LRUCache(ttl=10)
+        with mock.patch('data_api.cache.response_cache.time.monotonic', return_value=100):
+            cache.set('a', b'a')
+        with mock.patch('data_api.cache.response_cache.time.monotonic', return_value=109.9):
+            self.assertEqual(cache.get('a'), b'a')
+        with mock.patch('data_api.cache.response_cache.time.monotonic', return_value=110):
+            self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.stats()['expirations'], 1)
+        self.assertEqual(cache.stats()['bytes'], 0)
+
+    def test_ticket(self):
+        from django.core.cache.backends.locmem import LocMemCache
+        from data_api.cache import response_cache
+        from data_api.cache.shared_cache import SharedCache
+        from database.cache_version import VERSION_KEY
+
+        local = response_cache.LRUCache()
+        shared = SharedCache(LocMemCache('test-ticket', {}), lock_wait=0.2)
+        key = (1, 'de', None, None, None)
+        with mock.patch.object(response_cache, 'response_cache', local), mock.patch.object(response_cache, 'shared_cache', shared):
+            ticket = response_cache.lookup(key)
+            self.assertEqual((ticket.status, ticket.value), ('MISS', None))
+            self.assertIsNotNone(ticket.lock)
+
+            # another worker waits for the rebuild lock, then builds the response itself
+            waiting = response_cache.lookup(key)
+            self.assertEqual((waiting.status, waiting.value, waiting.lock), ('MISS', None, None))
+            self.assertEqual(shared.lock_waits, 1)
+
+            body = response_cache.store(ticket, {'data': 'value'})
+            response_cache.release(ticket)
+            self.assertIsNone(shared.cache.get(ticket.lock[0]))
+
+            hit = response_cache.lookup(key)
+            self.assertEqual(hit.status, 'HIT')
+            self.assertIs(hit.value, body)
+
+            local.invalidate()
+            hit = response_cache.lookup(key)
+            self.assertEqual(hit.status, 'HIT-SHARED')
+            self.assertEqual(hit.value.identity, body.identity)
+            response_cache.release(hit)
+
+            # a catalog write moves the version, older responses are not served
+            shared.cache.incr(VERSION_KEY)
+            ticket = response_cache.lookup(key)
+            self.assertEqual(ticket.status, 'MISS')
+            response_cache.release(ticket)
+
+
+class SharedCacheTests(SimpleTestCase):
+    """
+    The shared cache, backed by LocMemCache: versioned keys, the rebuild lock
+    and the bypass of a failing backend.
+    """
+    def setUp(self):
+        from django.core.cache.backends.locmem import LocMemCache
+        from data_api.cache.shared_cache import SharedCache
+        self.backend = LocMemCache(f'test-{self._testMethodName}', {})
+        self.shared = SharedCache(self.backend, lock_wait=0.2, retry_after=30)
+
+    def test_version_bump(self):
+        from database import cache_version
+        key = (1, 'de', None, None, None)
+        version = self.shared.version()
+        self.assertIsInstance(version, int)
+        self.assertEqual(self.shared.version(), version)
+        self.shared.set(key, version, b'old')
+        self.assertEqual(self.shared.get(key, version), b'old')
+
+        with mock.patch.object(cache_version, 'caches', {cache_version.CATALOG_CACHE: self.backend}):
+            cache_version.bump_catalog_version()
+        self.assertEqual(self.shared.version(), version + 1)
+        self.assertIsNone(self.shared.get(key, version + 1))
+        self.assertEqual((self.shared.hits, self.shared.misses), (1, 1))
+
+        # a lost version key restarts from a version never handed out before
+        self.backend.delete(cache_version.VERSION_KEY)
+        self.assertGreater(self.shared.version(), version + 1)
+
+    def test_lock(self):
+        key = (1, 'de', None, None, None)
+        version = self.shared.version()
+        value, lock = self.shared.acquire(key, version)
+        self.assertIsNone(value)
+        self.assertIsNotNone(lock)
+
+        # held: the lock is not handed out twice, waiters give up after lock_wait
+        self.assertEqual(self.shared.acquire(key, version), (None, None))
+        self.assertEqual(self.shared.lock_waits, 1)
+
+        # a waiter gets the value built by the lock holder
+        self.shared.set(key, version, b'built')
+        self.assertEqual(self.shared.acquire(key, version), (b'built', None))
+
+        # only the holder's token releases the lock
+        self.shared.release((lock[0], 'other'))
+        self.assertEqual(self.backend.get(lock[0]), lock[1])
+        self.shared.release(lock)
+        self.assertIsNone(self.backend.get(lock[0]))
+        self.assertIsNotNone(self.shared.acquire((2, 'de', None, None, None), version)[1])
+
+    def test_bypass(self):
+        key = (1, 'de', None, None, None)
+        version = self.shared.version()
+        with mock.patch.object(self.backend, 'get', side_effect=ConnectionError), mock.patch('data_api.cache.shared_cache.time.monotonic', return_value=1000):
+            with self.assertLogs('data_api.cache.shared_cache', 'WARNING'):
+                self.assertIsNone(self.shared.get(key, version))
+            self.assertFalse(self.shared.available)
+            self.assertEqual(self.shared.errors, 1)
+
+            # bypassed without calling the backend until retry_after elapses
+            self.assertIsNone(self.shared.version())
+            self.assertEqual(self.shared.acquire(key, version), (None, None))
+            self.shared.set(key, version, b'value')
+            self.assertEqual(self.backend.get.call_count, 1)
+            self.assertEqual(self.shared.errors, 1)
+
+        with mock.patch('data_api.cache.shared_cache.time.monotonic', return_value=1030):
+            self.assertTrue(self.shared.available)
+            self.assertEqual(self.shared.version(), version)
+            self.assertIsNone(self.shared.get(key, version))
+
+
+class ReferenceRegistryTests(TestCase):
+    """
+    The registry mirrors the reference tables, and the warm indexes holding
+    it are rebuilt after a change.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.language = Language.objects.create(code='de', name='German')
+        category = StatisticCategory.objects.create(category_id='category')
+        StatisticCategoryLocalization.objects.create(category=category, language=cls.language, category_name='Category', url='/c')
+        cls.sub_category = StatisticSubCategory.objects.create(category=category, sub_category_id='sub')
+        StatisticSubCategoryLocalization.objects.create(sub_category=cls.sub_category, language=cls.language, sub_category_name='Sub', url='/s')
+        for key in ('b', 'a'):
+            StatisticsVar.objects.create(sub_category=cls.sub_category, variable_key=key, variable_value={'value': key})
+
+    def test_registry(self):
+        from .registry import ReferenceRegistry
+        registry = ReferenceRegistry()
+        self.assertEqual(registry.languages_by_code['de'].pk, self.language.pk)
+        sub_category = registry.sub_categories_by_id[('category', 'sub')]
+        self.assertIs(sub_category.category, registry.categories_by_id['category'])
+        self.assertEqual([variable.variable_key for variable in sub_category.variables.all()], ['b', 'a'])
+        self.assertEqual(registry.category_sub_categories[sub_category.category_id], (sub_category,))
+        self.assertEqual(registry.sub_category_locs[(self.language.pk, sub_category.pk)].sub_category_name, 'Sub')
+
+        footprint = registry.footprint()
+        self.assertGreater(footprint, 0)
+        self.assertEqual(registry.stats()['bytes'], footprint)
+        StatisticsVar.objects.create(sub_category=self.sub_category, variable_key='c', variable_value={'value': 'c' * 1000})
+        self.assertGreater(ReferenceRegistry().footprint(), footprint + 1000)
+
+    def test_rebuild_after_invalidation(self):
+        from data_api.cache.warm_index import WarmIndex
+        from data_api.cache import warm_index
+        index = WarmIndex('test_index', mock.Mock(side_effect=object), senders=(Language,), ttl=30)
+        self.assertFalse(index.warm)
+        first = index.get()
+        self.assertIs(index.get(), first)
+        self.assertEqual(index.rebuilds, 1)
+        self.assertTrue(index.warm)
+
+        # a change of a sender in this process
+        Language.objects.create(code='en', name='English')
+        second = index.get()
+        self.assertIsNot(second, first)
+
+        # a catalog write of another process
+        with mock.patch.object(warm_index.shared_cache, 'version', return_value=2):
+            third = index.get()
+            self.assertIsNot(third, second)
+            self.assertIs(index.get(), third)
+
+        # the ttl
+        with mock.patch('data_api.cache.warm_index.time.monotonic', return_value=time.monotonic() + 31):
+            self.assertIsNot(index.get(), third)
+        self.assertEqual(index.rebuilds, 4)
+
+    def test_reference_data(self):
+        from data_api.cache.reference_data import reference_data
+        reference_data.invalidate()
+        registry = reference_data.get()
+        StatisticsVar.objects.create(sub_category=self.sub_category, variable_key='c', variable_value={'value': 'c'})
+        rebuilt = reference_data.get()
+        self.assertIsNot(rebuilt, registry)
+        self.assertEqual([variable.variable_key for variable in rebuilt.sub_categories[self.sub_category.pk].variables], ['b', 'a', 'c'])
+        self.assertEqual(len(registry.sub_categories[self.sub_category.pk].variables), 2)
+
+
+class CatalogImportTests(TestCase):
+    """
+    Imports match the statistics and variables already in the database by
+    natural key, duplicates included, without deleting any row.
+    """
+    RECORDS = [
+        {'type': 'statistic', 'plant_id': 'plant', 'category_id': 'category', 'sub_category_id': 'sub', 'url_name': 'url', 'url': 'https://example.org'},
+        {'type': 'statistic', 'plant_id': 'plant', 'category_id': 'category', 'sub_category_id': 'sub', 'url_name': 'new', 'url': 'https://example.org/new'},
+        {'type': 'variable', 'category_id': 'category', 'sub_category_id': 'sub', 'key': 'threshold', 'value': {'value': 2}},
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        category = StatisticCategory.objects.create(category_id='category')
+        cls.sub_category = StatisticSubCategory.objects.create(category=category, sub_category_id='sub')
+        cls.plant = PlantInfo.objects.create(plant_id='plant', plant_name='Plant', plant_location='here')
+        for url in ('https://example.com/1', 'https://example.com/2'):
+            VizStatistics.objects.create(plant=cls.plant, sub_category=cls.sub_category, url_name='url', url=url)
+            StatisticsVar.objects.create(sub_category=cls.sub_category, variable_key='threshold', variable_value={'value': 1})
+
+    def import_records(self):
+        import io
+        import json
+        from .importer import import_catalog
+        with self.captureOnCommitCallbacks(execute=True):
+            return import_catalog(io.StringIO('\n'.join(json.dumps(record) for record in self.RECORDS)), 'jsonl')
+
+    def test_pre_existing_duplicates(self):
+        importer = self.import_records()
+        self.assertEqual(importer.counts['statistic'], 2)
+        self.assertEqual(importer.counts['variable'], 1)
+        self.assertEqual(
+            sorted(VizStatistics.objects.values_list('url_name', 'url')),
+            [('new', 'https://example.org/new'), ('url', 'https://example.org'), ('url', 'https://example.org')],
+        )
+        self.assertEqual(list(StatisticsVar.objects.values_list('variable_value', flat=True)), [{'value': 2}, {'value': 2}])
+        self.assertEqual(importer.plant_pks, {self.plant.pk})
+
+        # imported again, nothing is written
+        with CaptureQueriesContext(connection) as context:
+            self.import_records()
+        writes = [query['sql'] for query in context if query['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))]
+        self.assertEqual(writes, [])
+        self.assertEqual(VizStatistics.objects.count(), 3)
+        self.assertEqual(StatisticsVar.objects.count(), 2)
+
+    def test_json_key_order(self):
+        self.RECORDS = [{**self.RECORDS[2], 'value': {'low': 1, 'high': 2}}]
+        self.import_records()
+        # the database may hand json back in another key order, not a change
+        self.RECORDS = [{**self.RECORDS[0], 'value': {'high': 2, 'low': 1}}]
+        with CaptureQueriesContext(connection) as context:
+            self.import_records()
+        writes = [query['sql'] for query in context if query['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))]
+        self.assertEqual(writes, [])
+
+    def test_unknown_parent(self):
+        from .importer import CatalogImportError
+        self.RECORDS = [{**self.RECORDS[0], 'plant_id': 'other'}]
+        with self.assertRaisesMessage(CatalogImportError, 'record 1: unknown plant other'):
+            self.import_records()
+        self.assertEqual(VizStatistics.objects.filter(url='https://example.org').count(), 0)
+
+
+class CatalogTemplateTests(TestCase):
+    """
+    Templates create the statistics a plant lacks and only rewrite the urls
+    that differ: applying one again writes nothing.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        category = StatisticCategory.objects.create(category_id='category')
+        sub_category = StatisticSubCategory.objects.create(category=category, sub_category_id='sub')
+        for plant_id, location in (('north-1', 'north'), ('north-2', 'north'), ('south-1', 'south')):
+            PlantInfo.objects.create(plant_id=plant_id, plant_name=plant_id, plant_location=location, domain=f'{plant_id}.example.com')
+        cls.template = CatalogTemplate.objects.create(name='template')
+        for url_name in ('overview', 'detail'):
+            CatalogTemplateItem.objects.create(template=cls.template, sub_category=sub_category, url_name=url_name, url_pattern=f'https://{{domain}}/{url_name}')
+
+    def apply(self, plants=None):
+        from .catalog_templates import apply_template
+        with mock.patch('database.catalog_templates.schedule_rebuild') as schedule_rebuild:
+            result = apply_template(self.template, plants)
+        return result, schedule_rebuild.call_args_list
+
+    def test_idempotent(self):
+        result, rebuilds = self.apply()
+        self.assertEqual((result.rows, result.created, result.updated), (6, 6, 0))
+        self.assertEqual(rebuilds, [mock.call(result.plant_ids)])
+        self.assertEqual(
+            VizStatistics.objects.get(plant__plant_id='south-1', url_name='detail').url, 'https://south-1.example.com/detail',
+        )
+
+        with CaptureQueriesContext(connection) as context:
+            result, rebuilds = self.apply()
+        self.assertEqual((result.rows, result.created, result.updated), (6, 0, 0))
+        writes = [query['sql'] for query in context if query['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))]
+        self.assertEqual(writes, [])
+        self.assertEqual(rebuilds, [])
+
+        # only the urls of the changed pattern are rewritten
+        self.template.items.filter(url_name='detail').update(url_pattern='https://{domain}/details')
+        result, _ = self.apply()
+        self.assertEqual((result.rows, result.created, result.updated), (6, 0, 3))
+        self.assertEqual(VizStatistics.objects.count(), 6)
+
+    def test_command(self):
+        import io
+        from django.core.management import call_command
+        from django.core.management.base import CommandError
+
+        def apply(*args):
+            out = io.StringIO()
+            call_command('apply_catalog_template', 'template', *args, '--no-snapshots', stdout=out)
+            return out.getvalue()
+
+        def plants():
+            return sorted(set(VizStatistics.objects.values_list('plant__plant_id', flat=True)))
+
+        self.assertIn('to 1 plants: 2 rows matched, 2 created, 0 updated', apply('--plant', 'south-1'))
+        self.assertEqual(plants(), ['south-1'])
+        self.assertIn('to 2 plants: 4 rows matched, 4 created, 0 updated', apply('--location', 'north'))
+        self.assertEqual(plants(), ['north-1', 'north-2', 'south-1'])
+        self.assertIn('to 3 plants: 6 rows matched, 0 created, 0 updated', apply('--all'))
+        with self.assertRaisesMessage(CommandError, 'pass --plant, --location or --all'):
+            apply()
+
+    def test_admin_action(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'admin'))
+        url = reverse('admin:database_plantinfo_changelist')
+        plants = PlantInfo.objects.filter(plant_location='north')
+        data = {'action': 'apply_catalog_template', 'template': self.template.pk, '_selected_action': [plant.pk for plant in plants]}
+        for message in ('4 statistics matched, 4 created, 0 updated', '4 statistics matched, 0 created, 0 updated'):
+            response = self.client.post(url, data, follow=True)
+            self.assertIn(message, [str(m) for m in response.context['messages']][0])
+
+
+class FakeConnection:
+    """
+    DB-API connection of the pool tests, ``alive`` turning off its cursor.
+    """
+    def __init__(self):
+        self.closed = False
+        self.alive = True
+        self.rollbacks = 0
+
+    def cursor(self):
+        if not self.alive:
+            raise ConnectionError("server closed the connection")
+        return mock.Mock()
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    """
+    Checkout / checkin of the ConnectionPool: reuse, overflow, waiting for a
+    connection, recycling and pre-ping.
+    """
+    def pool(self, **kwargs):
+        from database.backends.pool import ConnectionPool
+        self.opened = []
+
+        def connect():
+            self.opened.append(FakeConnection())
+            return self.opened[-1]
+
+        return ConnectionPool(connect, **{'size': 2, 'max_overflow': 1, 'timeout': 0.1, **kwargs})
+
+    def test_reuse(self):
+        pool = self.pool()
+        first = pool.checkout()
+        pool.checkin(first)
+        self.assertIs(pool.checkout(), first)
+        self.assertEqual(len(self.opened), 1)
+        # checked in without an open transaction
+        self.assertGreaterEqual(first.rollbacks, 1)
+        self.assertEqual(pool.stats()['in_use'], 1)
+
+    def test_overflow_and_timeout(self):
+        from database.backends.pool import PoolTimeout
+        pool = self.pool()
+        connections = [pool.checkout() for _ in range(3)]
+        self.assertEqual(pool.stats()['open'], 3)
+        with self.assertRaises(PoolTimeout):
+            pool.checkout()
+        self.assertEqual(pool.stats()['timeouts'], 1)
+
+        # over size, the first connection returned is closed, the others kept
+        for connection in connections:
+            pool.checkin(connection)
+        self.assertEqual([connection.closed for connection in connections], [True, False, False])
+        self.assertEqual((pool.stats()['open'], pool.stats()['idle']), (2, 2))
+
+        pool.close()
+        self.assertTrue(all(connection.closed for connection in connections))
+        self.assertEqual(pool.stats()['open'], 0)
+
+    def test_wait(self):
+        import threading
+        pool = self.pool(size=1, max_overflow=0, timeout=5)
+        connection = pool.checkout()
+        threading.Timer(0.05, pool.checkin, [connection]).start()
+        self.assertIs(pool.checkout(), connection)
+        self.assertEqual(pool.stats()['waits'], 1)
+
+    def test_stale_connections(self):
+        pool = self.pool()
+        connection = pool.checkout()
+        pool.checkin(connection)
+        connection.alive = False
+        fresh = pool.checkout()
+        self.assertIsNot(fresh, connection)
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.stats()['ping_failures'], 1)
+
+        pool.checkin(fresh, discard=True)
+        self.assertTrue(fresh.closed)
+
+        with mock.patch('database.backends.pool.time.monotonic', return_value=0):
+            old = pool.checkout()
+            pool.checkin(old)
+        self.assertIsNot(pool.checkout(), old)
+        self.assertTrue(old.closed)
+        self.assertEqual(pool.stats()['recycled'], 1)
+        self.assertEqual(pool.stats()['open'], 1)
+
+
+class RequestScopedConnectionTests(SimpleTestCase):
+    """
+    Routes release the database connections of the thread their endpoint ran
+    in once it returns, even when it raises.
+    """
+    def test_sync_endpoint(self):
+        from data_api import connections
+        calls = []
+        with mock.patch.object(connections, 'close_old_connections', side_effect=lambda: calls.append('release')):
+            endpoint = connections.request_scoped(lambda value: calls.append(value) or value)
+            self.assertEqual(endpoint(value='query'), 'query')
+            self.assertEqual(calls, ['release', 'query', 'release'])
+
+            failing = connections.request_scoped(mock.Mock(side_effect=ValueError))
+            with self.assertRaises(ValueError):
+                failing()
+            self.assertEqual(calls.count('release'), 4)
+
+    def test_async_endpoint(self):
+        from asgiref.sync import async_to_sync
+        from data_api import connections
+
+        async def endpoint(value):
+            if value is None:
+                raise ValueError
+            return value
+
+        with mock.patch.object(connections, 'arelease_connections', new_callable=mock.AsyncMock) as release:
+            scoped = connections.request_scoped(endpoint)
+            self.assertEqual(async_to_sync(scoped)(value='query'), 'query')
+            with self.assertRaises(ValueError):
+                async_to_sync(scoped)(value=None)
+            self.assertEqual(release.await_count, 2)
+
+    def test_route(self):
+        from fastapi import APIRouter, FastAPI
+        from fastapi.testclient import TestClient
+        from data_api import connections
+
+        router = APIRouter(route_class=connections.ConnectionRoute)
+
+        @router.get('/echo')
+        def echo(value: int):
+            return {'value': value}
+
+        app = FastAPI()
+        app.include_router(router)
+        with mock.patch.object(connections, 'close_old_connections') as release:
+            # the wrapped endpoint keeps the signature FastAPI reads its parameters from
+            self.assertEqual(TestClient(app).get('/echo?value=3').json(), {'value': 3})
+            self.assertEqual(release.call_count, 2)
+
+
+class StatisticRouteTestCase(TransactionTestCase):
+    """
+    Catalog of 3 categories of 3 sub categories in German, of a ``small``
+    plant with one statistic and a ``large`` one with a statistic per sub
+    category, both with a snapshot. Routes commit and read through other
+    threads, hence the TransactionTestCase.
+    """
+    def setUp(self):
+        from data_api.warmup import INDEXES
+        from data_api.cache.response_cache import response_cache
+        self.response_cache = response_cache
+
+        # one transaction, for its snapshots to be built once on commit
+        with transaction.atomic():
+            language = Language.objects.create(code='de', name='German')
+            sub_categories = []
+            for c in range(3):
+                category = StatisticCategory.objects.create(category_id=f'category-{c}')
+                StatisticCategoryLocalization.objects.create(category=category, language=language, category_name=f'Category {c}', url='/')
+                for s in range(3):
+                    sub_category = StatisticSubCategory.objects.create(category=category, sub_category_id=f'sub-{s}')
+                    StatisticSubCategoryLocalization.objects.create(sub_category=sub_category, language=language, sub_category_name=f'Sub {s}', url='/')
+                    StatisticsVar.objects.create(sub_category=sub_category, variable_key='threshold', variable_value={'value': s})
+                    sub_categories.append(sub_category)
+
+            small = PlantInfo.objects.create(plant_id='small', plant_name='Small', plant_location='here', domain='small.example.com')
+            large = PlantInfo.objects.create(plant_id='large', plant_name='Large', plant_location='here', domain='large.example.com')
+            VizStatistics.objects.create(plant=small, sub_category=sub_categories[0], url_name='url', url='https://example.com')
+            for n, sub_category in enumerate(sub_categories):
+                VizStatistics.objects.create(plant=large, sub_category=sub_category, url_name=f'url-{n}', url='https://example.com')
+        wait_for_rebuilds()
+        self.addCleanup(wait_for_rebuilds)
+
+        # the indexes of the app outlive the flush between tests, rebuild them
+        # as a worker does at startup so that only the requests are counted
+        for index in INDEXES:
+            index.invalidate()
+            index.get()
+        response_cache.invalidate()
+
+    def client_for(self, async_routes=False):
+        from fastapi.testclient import TestClient
+        from data_api.main import create_app
+        return TestClient(create_app(async_routes=async_routes))
+
+
+class StatisticRouteTests(StatisticRouteTestCase):
+    """
+    Error answers of the statistic routes, sync and async alike.
+    """
+    PATHS = ('/api/v1/statistic', '/api/v1/statistic/category-0', '/api/v1/statistic/category-0/sub-0')
+
+    def test_unknown_language(self):
+        for async_routes in (False, True):
+            with self.client_for(async_routes) as client:
+                for path in self.PATHS:
+                    with self.subTest(path=path, async_routes=async_routes):
+                        response = client.get(f'{path}?plant_id=small&language=xx')
+                        self.assertEqual(response.status_code, 404, response.text)
+                        self.assertEqual(response.json()['error']['status_description'], 'language xx not found')
+
+    def test_same_errors(self):
+        errors = (
+            '/api/v1/statistic?plant_id=nowhere&language=de',
+            '/api/v1/statistic?domain=nowhere.example.com&language=de',
+            '/api/v1/statistic?language=de',
+            '/api/v1/statistic?plant_id=small&language=de,xx',
+            '/api/v1/statistic/category-x?plant_id=small&language=de',
+            '/api/v1/statistic/category-0/sub-x?plant_id=small&language=de',
+        )
+        with self.client_for() as sync_client, self.client_for(async_routes=True) as async_client:
+            for url in errors:
+                with self.subTest(url=url):
+                    expected = sync_client.get(url, headers={'Host': 'nowhere'})
+                    self.assertIn(expected.status_code, (400, 404), expected.text)
+                    self.assertIn('error', expected.json())
+                    response = async_client.get(url, headers={'Host': 'nowhere'})
+                    self.assertEqual((response.status_code, response.json()), (expected.status_code, expected.json()))
+
+    def test_shared_domain(self):
+        twin = PlantInfo.objects.create(plant_id='twin', plant_name='Twin', plant_location='there', domain='large.example.com')
+        VizStatistics.objects.create(plant=twin, sub_category=StatisticSubCategory.objects.first(), url_name='url', url='https://example.com')
+        for async_routes in (False, True):
+            with self.client_for(async_routes) as client:
+                for path in self.PATHS:
+                    with self.subTest(path=path, async_routes=async_routes):
+                        response = client.get(f'{path}?domain=large.example.com&language=de')
+                        self.assertEqual(response.status_code, 200, response.text)
+                        self.assertEqual(response.json()['plant_id'], 'large')
+
+        with self.client_for() as client:
+            response = client.post('/api/v1/statistic/batch', json=[{'domain': 'large.example.com', 'language': 'de'}])
+            self.assertEqual(response.json()['results'][0]['plant_id'], 'large')
+
+
+def original_catalog(plant, language, category=None, sub_category=None):
+    """
+    The ``data`` tree as the statistic routes built it before the catalog was
+    loaded in bulk: a few queries per VizStatistics row.
+    """
+    data = {}
+    if category is None:
+        for stat in VizStatistics.objects.filter(plant=plant):
+            category = stat.sub_category.category
+            category_loc = StatisticCategoryLocalization.objects.get(category=category, language=language)
+            sub_categories_loc = StatisticSubCategoryLocalization.objects.get(sub_category=stat.sub_category, language=language)
+            if category.category_id not in data:
+                data[category.category_id] = {"name": category_loc.category_name, "items": {}}
+            if stat.sub_category.sub_category_id not in data[category.category_id]["items"]:
+                data[category.category_id]["items"][stat.sub_category.sub_category_id] = {
+                    "name": sub_categories_loc.sub_category_name,
+                    "api_url": sub_categories_loc.url,
+                    "description": sub_categories_loc.description,
+                    "var_names": {var.variable_key: var.variable_value for var in StatisticsVar.objects.filter(sub_category=stat.sub_category)},
+                    "urls": [],
+                }
+            data[category.category_id]["items"][stat.sub_category.sub_category_id]["urls"].append(
+                {stat.url_name: {"name": stat.url_name, "url": stat.url}}
+            )
+        return data
+
+    if sub_category is None:
+        sub_categories = StatisticSubCategory.objects.filter(category=category)
+    else:
+        sub_categories = [sub_category]
+    for sub_category in sub_categories:
+        category_loc = StatisticCategoryLocalization.objects.get(category=category, language=language)
+        sub_categories_loc = StatisticSubCategoryLocalization.objects.get(sub_category=sub_category, language=language)
+        for stat in VizStatistics.objects.filter(plant=plant, sub_category=sub_category):
+            if category.category_id not in data:
+                data[category.category_id] = {"name": category_loc.category_name, "items": {}}
+            if sub_category.sub_category_id not in data[category.category_id]["items"]:
+                data[category.category_id]["items"][sub_category.sub_category_id] = {
+                    "name": sub_categories_loc.sub_category_name,
+                    "api_url": sub_categories_loc.url,
+                    "description": sub_categories_loc.description,
+                    "var_names": {var.variable_key: var.variable_value for var in StatisticsVar.objects.filter(sub_category=sub_category)},
+                    "urls": [],
+                }
+            data[category.category_id]["items"][sub_category.sub_category_id]["urls"].append(
+                {stat.url_name: {"name": stat.url_name, "url": stat.url}}
+            )
+    return data
+
+
+class CatalogGoldenTests(StatisticRouteTestCase):
+    """
+    render_catalog, load_catalog and the statistic routes build the same data
+    tree, in the same order, as the original per row loop of each route.
+    """
+    def setUp(self):
+        super().setUp()
+        # statistics of sub categories spread over the categories, several per
+        # sub category and not next to each other, with several variables
+        with transaction.atomic():
+            sub_categories = list(StatisticSubCategory.objects.order_by('pk'))
+            for sub_category in sub_categories[::2]:
+                StatisticsVar.objects.create(sub_category=sub_category, variable_key='colour', variable_value={'value': 'red'})
+            mixed = PlantInfo.objects.create(plant_id='mixed', plant_name='Mixed', plant_location='there', domain='mixed.example.com')
+            for n in range(12):
+                VizStatistics.objects.create(plant=mixed, sub_category=sub_categories[(n * 5) % 7], url_name=f'url-{n}', url=f'https://example.com/{n}')
+        wait_for_rebuilds()
+
+    def catalogs(self):
+        """
+        ``(path, plant, language, category, sub_category)`` of every plant and
+        route of the seeded catalog.
+        """
+        language = Language.objects.get(code='de')
+        for plant in PlantInfo.objects.all():
+            yield '/api/v1/statistic', plant, language, None, None
+            for category in StatisticCategory.objects.all():
+                yield f'/api/v1/statistic/{category.category_id}', plant, language, category, None
+                for sub_category in StatisticSubCategory.objects.filter(category=category):
+                    yield f'/api/v1/statistic/{category.category_id}/{sub_category.sub_category_id}', plant, language, category, sub_category
+
+    def assertGolden(self, data, expected):
+        # the order of the keys is part of the answer
+        self.assertEqual(json.dumps(data), json.dumps(expected))
+
+    def test_render_catalog(self):
+        from .catalog import load_catalog, render_catalog
+        from .registry import ReferenceRegistry
+        registry = ReferenceRegistry()
+        for path, plant, language, category, sub_category in self.catalogs():
+            with self.subTest(path=path, plant=plant.plant_id):
+                expected = original_catalog(plant, language, category, sub_category)
+                self.assertGolden(load_catalog(plant, language, category, sub_category), expected)
+                self.assertGolden(render_catalog(
+                    registry, plant, registry.languages_by_code[language.code],
+                    category and registry.categories_by_id[category.category_id],
+                    sub_category and registry.sub_categories_by_id[(category.category_id, sub_category.sub_category_id)],
+                ), expected)
+
+    def test_routes(self):
+        golden = [(path, plant.plant_id, original_catalog(plant, language, category, sub_category))
+                  for path, plant, language, category, sub_category in self.catalogs()]
+        self.assertTrue(any(len(expected) > 1 for _, _, expected in golden))
+        for snapshots in (True, False):
+            if not snapshots:
+                CatalogSnapshot.objects.all().delete()
+            self.response_cache.invalidate()
+            for async_routes in (False, True):
+                with self.client_for(async_routes) as client:
+                    for path, plant_id, expected in golden:
+                        with self.subTest(path=path, plant=plant_id, snapshots=snapshots, async_routes=async_routes):
+                            response = client.get(f'{path}?plant_id={plant_id}&language=de')
+                            self.assertEqual(response.status_code, 200, response.text)
+                            self.assertGolden(response.json()['data'], expected)
+
+
+class MultiLanguageTests(StatisticRouteTestCase):
+    """
+    language=de,en answers with the data of each language, as the single
+    language requests would, sync and async.
+    """
+    PATHS = ('/api/v1/statistic', '/api/v1/statistic/category-0', '/api/v1/statistic/category-0/sub-0')
+
+    def setUp(self):
+        super().setUp()
+        with transaction.atomic():
+            english = Language.objects.create(code='en', name='English')
+            for category in StatisticCategory.objects.all():
+                StatisticCategoryLocalization.objects.create(category=category, language=english, category_name=f'{category.category_id} en', url='/')
+            for sub_category in StatisticSubCategory.objects.all():
+                StatisticSubCategoryLocalization.objects.create(sub_category=sub_category, language=english, sub_category_name=f'{sub_category.sub_category_id} en', url='/')
+        wait_for_rebuilds()
+
+    def bodies(self, query=''):
+        """
+        The body of the de,en request of each path, sync and async, once
+        checked against the de and en requests.
+        """
+        for async_routes in (False, True):
+            with self.client_for(async_routes) as client:
+                for path in self.PATHS:
+                    with self.subTest(path=path, async_routes=async_routes, query=query):
+                        response = client.get(f'{path}?plant_id=large&language=de,en{query}')
+                        self.assertEqual(response.status_code, 200, response.text)
+                        body = response.json()
+                        self.assertEqual(body['languages'], {'de': 'German', 'en': 'English'})
+                        self.assertEqual(list(body['data']), ['de', 'en'])
+                        for code in ('de', 'en'):
+                            single = client.get(f'{path}?plant_id=large&language={code}{query}').json()
+                            self.assertEqual(body['data'][code], single['data'])
+                            self.assertEqual(body['plant_id'], single['plant_id'])
+                        yield body
+
+    def test_languages(self):
+        for body in self.bodies():
+            self.assertNotEqual(body['data']['de'], body['data']['en'])
+
+    def test_fields(self):
+        for body in self.bodies('&fields=name,urls'):
+            for data in body['data'].values():
+                for category in data.values():
+                    for item in category['items'].values():
+                        self.assertEqual(list(item), ['name', 'urls'])
+
+    def test_missing_localization(self):
+        StatisticSubCategoryLocalization.objects.filter(language__code='en', sub_category__sub_category_id='sub-0').delete()
+        wait_for_rebuilds()
+        for async_routes in (False, True):
+            with self.client_for(async_routes) as client:
+                for path in self.PATHS:
+                    with self.subTest(path=path, async_routes=async_routes):
+                        response = client.get(f'{path}?plant_id=large&language=de,en')
+                        single = client.get(f'{path}?plant_id=large&language=en')
+                        self.assertEqual(response.status_code, 404, response.text)
+                        self.assertEqual(response.json()['error'], single.json()['error'])
+
+                        # with * the languages missing a localization are left out
+                        response = client.get(f'{path}?plant_id=large&language=*')
+                        self.assertEqual(response.status_code, 200, response.text)
+                        self.assertEqual(response.json()['languages'], {'de': 'German'})
+
+
+class ConditionalRequestTests(StatisticRouteTestCase):
+    """
+    Responses served from a snapshot carry an ETag derived from its version,
+    weak on compressed bodies, and If-None-Match answers them with a 304.
+    """
+    URL = '/api/v1/statistic?plant_id=large&language=de'
+    IDENTITY = {'Accept-Encoding': 'identity'}
+
+    def test_etag(self):
+        for async_routes in (False, True):
+            with self.subTest(async_routes=async_routes), self.client_for(async_routes) as client:
+                response = client.get(self.URL, headers=self.IDENTITY)
+                etag = response.headers['ETag']
+                version = CatalogSnapshot.objects.get(plant__plant_id='large').version
+                self.assertRegex(etag, rf'^"{version}-[0-9a-f]{{16}}"$')
+                self.assertIn('Last-Modified', response.headers)
+                self.assertEqual(client.get(self.URL, headers=self.IDENTITY).headers['ETag'], etag)
+                self.assertNotEqual(client.get('/api/v1/statistic/category-1?plant_id=large&language=de', headers=self.IDENTITY).headers['ETag'], etag)
+
+                url = f'https://example.org/{async_routes}'
+                statistic = VizStatistics.objects.get(plant__plant_id='large', url_name='url-0')
+                statistic.url = url
+                statistic.save()
+                changed = client.get(self.URL, headers=self.IDENTITY)
+                self.assertNotEqual(changed.headers['ETag'], etag)
+                self.assertEqual(changed.json()['data']['category-0']['items']['sub-0']['urls'], [{'url-0': {'name': 'url-0', 'url': url}}])
+
+    def test_not_modified(self):
+        for async_routes in (False, True):
+            with self.subTest(async_routes=async_routes), self.client_for(async_routes) as client:
+                etag = client.get(self.URL, headers=self.IDENTITY).headers['ETag']
+                for if_none_match in (etag, f'W/{etag}', f'"other", {etag}', '*'):
+                    response = client.get(self.URL, headers={**self.IDENTITY, 'If-None-Match': if_none_match})
+                    self.assertEqual(response.status_code, 304, if_none_match)
+                    self.assertEqual(response.content, b'')
+                    self.assertEqual(response.headers['ETag'], etag)
+                response = client.get(self.URL, headers={**self.IDENTITY, 'If-None-Match': '"other"'})
+                self.assertEqual(response.status_code, 200)
+
+    def test_compressed_etag(self):
+        with self.client_for() as client:
+            plain = client.get(self.URL, headers=self.IDENTITY)
+            compressed = client.get(self.URL, headers={'Accept-Encoding': 'gzip'})
+            self.assertEqual(compressed.headers['Content-Encoding'], 'gzip')
+            self.assertEqual(compressed.headers['ETag'], 'W/' + plain.headers['ETag'])
+            self.assertEqual(compressed.content, plain.content)
+            self.assertIn('Accept-Encoding', compressed.headers['Vary'])
+
+            response = client.get(self.URL, headers={'Accept-Encoding': 'gzip', 'If-None-Match': compressed.headers['ETag']})
+            self.assertEqual(response.status_code, 304)
+
+    def test_body_etag(self):
+        # several languages and no snapshot: the ETag is a digest of the body
+        urls = ('/api/v1/statistic?plant_id=large&language=*', '/api/v1/statistic/category-0?plant_id=large&language=de,de', self.URL.replace('large', 'small'))
+        for async_routes in (False, True):
+            CatalogSnapshot.objects.filter(plant__plant_id='small').delete()
+            with self.client_for(async_routes) as client:
+                for n, url in enumerate(urls):
+                    with self.subTest(url=url, async_routes=async_routes):
+                        response = client.get(url, headers=self.IDENTITY)
+                        etag = response.headers['ETag']
+                        self.assertEqual(client.get(url, headers=self.IDENTITY).headers['ETag'], etag)
+                        not_modified = client.get(url, headers={**self.IDENTITY, 'If-None-Match': etag})
+                        self.assertEqual(not_modified.status_code, 304)
+                        self.assertEqual(not_modified.content, b'')
+
+                        plant_id = 'small' if 'small' in url else 'large'
+                        statistic = VizStatistics.objects.filter(plant__plant_id=plant_id).first()
+                        statistic.url = f'https://example.org/{async_routes}/{n}'
+                        statistic.save()
+                        changed = client.get(url, headers={**self.IDENTITY, 'If-None-Match': etag})
+                        self.assertEqual(changed.status_code, 200)
+                        self.assertNotEqual(changed.headers['ETag'], etag)
+
+
+class ResponseCacheInvalidationTests(StatisticRouteTestCase):
+    """
+    A catalog write made in another process (the admin) and whose signals the
+    worker never receives still changes the responses the worker serves.
+    """
+    URL = '/api/v1/statistic/category-0?plant_id=large&language=de'
+
+    def test_other_process(self):
+        from data_api.cache import response_cache
+        worker, admin = response_cache.LRUCache(), response_cache.LRUCache()
+
+        with self.client_for() as client:
+            with mock.patch.object(response_cache, 'response_cache', worker):
+                self.assertEqual(client.get(self.URL).headers['X-Cache'], 'MISS')
+                self.assertEqual(client.get(self.URL).headers['X-Cache'], 'HIT')
+
+            with mock.patch.object(response_cache, 'response_cache', admin):
+                statistic = VizStatistics.objects.get(plant__plant_id='large', url_name='url-0')
+                statistic.url = 'https://example.org/admin'
+                statistic.save()
+            self.assertEqual(worker.stats()['invalidations'], 0)
+
+            with mock.patch.object(response_cache, 'response_cache', worker):
+                response = client.get(self.URL)
+                self.assertEqual(response.headers['X-Cache'], 'MISS')
+                self.assertIn('https://example.org/admin', response.text)
+
+            # the snapshot data is unchanged, the plant fields echoed are not
+            with mock.patch.object(response_cache, 'response_cache', admin):
+                PlantInfo.objects.filter(plant_id='large').update(plant_name='Renamed')
+                PlantInfo.objects.get(plant_id='large').save()
+
+            with mock.patch.object(response_cache, 'response_cache', worker):
+                response = client.get(self.URL)
+                self.assertEqual(response.headers['X-Cache'], 'MISS')
+                self.assertEqual(response.json()['plant_name'], 'Renamed')
+
+    def test_no_snapshot(self):
+        # nothing tells a stale window from the next one, nothing is cached
+        CatalogSnapshot.objects.filter(plant__plant_id='large').update(stale=True)
+        for async_routes in (False, True):
+            with self.subTest(async_routes=async_routes), self.client_for(async_routes) as client:
+                for _ in range(2):
+                    response = client.get(self.URL)
+                    self.assertEqual(response.status_code, 200, response.text)
+                    self.assertEqual(response.headers['X-Cache'], 'BYPASS')
+        self.assertEqual(self.response_cache.stats()['entries'], 0)
+
+
+class BatchStatisticTests(StatisticRouteTestCase):
+    """
+    A batch answers each item with the body of its single endpoint, in order,
+    with a number of queries independent of the number of items.
+    """
+    ITEMS = [
+        {'plant_id': 'large', 'language': 'de'},
+        {'plant_id': 'missing', 'language': 'de'},
+        {'plant_id': 'small', 'language': 'de', 'category': 'category-0'},
+        {'plant_id': 'large', 'language': 'de', 'category': 'category-9'},
+        {'domain': 'small.example.com', 'language': 'xx'},
+        {'language': 'de'},
+        {'domain': 'large.example.com', 'language': 'de', 'category': 'category-1', 'sub_category': 'sub-2'},
+        {'plant_id': 'large', 'language': 'de', 'category': 'category-1', 'sub_category': 'sub-9'},
+    ]
+
+    @staticmethod
+    def single_url(item):
+        path = '/'.join(['/api/v1/statistic', *(item[key] for key in ('category', 'sub_category') if key in item)])
+        query = '&'.join(f'{key}={item[key]}' for key in ('plant_id', 'domain', 'language') if key in item)
+        return f'{path}?{query}'
+
+    def test_batch(self):
+        from data_api import metrics
+
+        with mock.patch.object(metrics, 'DB_HEADERS', True), self.client_for() as client:
+            for snapshots in (True, False):
+                if not snapshots:
+                    CatalogSnapshot.objects.all().delete()
+                self.response_cache.invalidate()
+                with self.subTest(snapshots=snapshots):
+                    response = client.post('/api/v1/statistic/batch', json=self.ITEMS)
+                    self.assertEqual(response.status_code, 200, response.text)
+                    results = response.json()['results']
+                    self.assertEqual(len(results), len(self.ITEMS))
+                    for item, result in zip(self.ITEMS, results):
+                        # the host of the test client designates no plant
+                        single = client.get(self.single_url(item), headers={'Host': 'nowhere'}).json()
+                        self.assertEqual(result, single, item)
+                    self.assertEqual([result.get('status_code') for result in results], ['ok', None, 'ok', None, None, None, 'ok', None])
+
+                    queries = int(response.headers['X-DB-Queries'])
+                    doubled = client.post('/api/v1/statistic/batch', json=self.ITEMS * 2)
+                    self.assertEqual(doubled.json()['results'], results * 2)
+                    self.assertEqual(int(doubled.headers['X-DB-Queries']), queries)
+
+
+class ExportTests(StatisticRouteTestCase):
+    """
+    The NDJSON export streams one line per plant and language with the body of
+    /statistic, whatever the chunk size.
+    """
+    def test_export(self):
+        import json
+        PlantInfo.objects.create(plant_id='empty', plant_name='Empty', plant_location='here', domain='empty.example.com')
+        with self.client_for() as client:
+            response = client.get('/api/v1/export/statistic')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.headers['Content-Type'], 'application/x-ndjson')
+            lines = [json.loads(line) for line in response.text.splitlines()]
+            self.assertEqual([(line['plant_id'], line['language']) for line in lines], [('small', 'de'), ('large', 'de')])
+            for line in lines:
+                single = client.get(f"/api/v1/statistic?plant_id={line['plant_id']}&language=de").json()
+                self.assertEqual(line['data'], single['data'])
+
+            for chunk_size in (1, 2):
+                with self.subTest(chunk_size=chunk_size):
+                    self.assertEqual(client.get(f'/api/v1/export/statistic?chunk_size={chunk_size}').text, response.text)
+            self.assertEqual(client.get('/api/v1/export/statistic?language=de').text, response.text)
+
+            response = client.get('/api/v1/export/statistic?language=de,xx')
+            self.assertEqual(response.status_code, 404)
+            self.assertEqual(response.json()['error']['status_description'], 'language xx not found')
+
+
+class DumpRestoreTests(StatisticRouteTestCase):
+    """
+    A dump restored into an empty catalog serves the same responses, with the
+    rows, their timestamps and the key order of the variable values of the
+    source.
+    """
+    URLS = (
+        '/api/v1/statistic?plant_id=large&language=de',
+        '/api/v1/statistic/category-1?domain=small.example.com&language=de',
+        '/api/v1/statistic/category-2/sub-1?plant_id=large&language=de',
+    )
+
+    def responses(self, client):
+        self.response_cache.invalidate()
+        return [client.get(url).json() for url in self.URLS]
+
+    def rows(self):
+        return {
+            model.__name__: sorted(
+                tuple(str(value) for value in row)
+                for row in model.objects.values_list(*(name for name, kind in fields if kind not in ('int', 'fk')))
+            )
+            for model, fields in TABLES
+        }
+
+    def test_round_trip(self):
+        import io
+        from .dump import dump_catalog, restore_catalog, clear_catalog_tables
+        from data_api.warmup import INDEXES
+
+        StatisticsVar.objects.filter(variable_key='threshold').update(variable_value={'max': 2, 'min': 1, 'avg': 0})
+        StatisticsVar.objects.filter(variable_key='threshold').first().save()
+        with self.client_for() as client:
+            before = self.responses(client)
+            self.assertEqual(list(before[0]['data']['category-0']['items']['sub-0']['var_names']['threshold']), ['max', 'min', 'avg'])
+            rows = self.rows()
+
+            stream = io.BytesIO()
+            dump_catalog(stream, chunk_size=4)
+            clear_catalog_tables()
+            self.assertFalse(PlantInfo.objects.exists())
+
+            stream.seek(0)
+            counts = restore_catalog(stream, batch_size=3)
+            self.assertEqual(counts['VizStatistics'], 10)
+            self.assertEqual(self.rows(), rows)
+            for index in INDEXES:
+                index.invalidate()
+            self.assertEqual(self.responses(client), before)
+
+            # restoring again over the same catalog adds nothing
+            stream.seek(0)
+            restore_catalog(stream)
+            self.assertEqual(self.rows(), rows)
+
+    def test_replace_with_template(self):
+        import io
+        from .dump import dump_catalog, restore_catalog
+
+        template = CatalogTemplate.objects.create(name='dashboards')
+        for sub_category in StatisticSubCategory.objects.all()[:2]:
+            CatalogTemplateItem.objects.create(template=template, sub_category=sub_category, url_name='dashboard', url_pattern='https://{domain}/d')
+        rows = self.rows()
+        stream = io.BytesIO()
+        dump_catalog(stream)
+
+        # template items point to sub categories the restore replaces
+        other = CatalogTemplate.objects.create(name='other')
+        CatalogTemplateItem.objects.create(template=other, sub_category=StatisticSubCategory.objects.last(), url_name='other', url_pattern='/')
+        VizStatistics.objects.filter(url_name='url-0').delete()
+
+        stream.seek(0)
+        counts = restore_catalog(stream, replace=True)
+        self.assertEqual((counts['CatalogTemplate'], counts['CatalogTemplateItem']), (1, 2))
+        self.assertEqual(self.rows(), rows)
+        self.assertEqual(
+            sorted(CatalogTemplateItem.objects.values_list('template__name', 'sub_category__sub_category_id')),
+            [('dashboards', 'sub-0'), ('dashboards', 'sub-1')],
+        )
+
+    def test_clear_synthetic_catalog(self):
+        from .synthetic import generate_catalog, clear_catalog
+        rows = self.rows()
+        generate_catalog(plants=2, categories=1, sub_categories=2, languages=1, snapshots=False)
+        template = CatalogTemplate.objects.create(name='dashboards')
+        for sub_category in StatisticSubCategory.objects.all():
+            CatalogTemplateItem.objects.create(template=template, sub_category=sub_category, url_name='dashboard', url_pattern='/')
+
+        clear_catalog()
+        self.assertEqual(CatalogTemplateItem.objects.count(), 9)
+        CatalogTemplate.objects.all().delete()
+        self.assertEqual(self.rows(), rows)
+
+
+class SnapshotRebuildTests(StatisticRouteTestCase):
+    """
+    Every catalog edit reaches the snapshots it is part of, synchronously for
+    a few plants and in the background for all of them, never for a rolled
+    back transaction, and a failed rebuild leaves no outdated snapshot served.
+    """
+    def snapshot(self, plant_id='large'):
+        return CatalogSnapshot.objects.get(plant__plant_id=plant_id)
+
+    def assertRebuilt(self, before, text):
+        import json
+        from .catalog import load_catalog
+        wait_for_rebuilds()
+        snapshot = self.snapshot()
+        self.assertFalse(snapshot.stale)
+        self.assertGreater(snapshot.version, before.version)
+        self.assertEqual(snapshot.data, load_catalog(snapshot.plant, snapshot.language))
+        self.assertIn(text, json.dumps(snapshot.data))
+
+    def test_statistic_and_variable(self):
+        before = self.snapshot()
+        statistic = VizStatistics.objects.get(plant__plant_id='large', url_name='url-0')
+        statistic.url = 'https://example.org/changed'
+        statistic.save()
+        # a few plants are rebuilt before save() returns
+        self.assertGreater(self.snapshot().version, before.version)
+        self.assertRebuilt(before, 'https://example.org/changed')
+
+        before = self.snapshot()
+        variable = StatisticsVar.objects.filter(sub_category__sub_category_id='sub-1').first()
+        variable.variable_value = {'value': 'changed'}
+        variable.save()
+        self.assertRebuilt(before, '"changed"')
+
+    def test_layout(self):
+        from . import signals
+        language = Language.objects.get()
+        localized = {(None, frozenset([language.pk]))}
+        edits = (
+            ('category localization', StatisticCategoryLocalization.objects.filter(category__category_id='category-1').first(), localized),
+            ('sub category localization', StatisticSubCategoryLocalization.objects.filter(sub_category__sub_category_id='sub-2').first(), localized),
+            ('category', StatisticCategory.objects.get(category_id='category-2'), {(None, None)}),
+            ('sub category', StatisticSubCategory.objects.filter(sub_category_id='sub-0').first(), {(None, None)}),
+        )
+        for n, (model, instance, expected) in enumerate(edits):
+            with self.subTest(model=model):
+                # renamed without signals, for the edit of each model to publish it
+                before = self.snapshot()
+                StatisticCategoryLocalization.objects.filter(category__category_id='category-1').update(category_name=f'Renamed {n}')
+                instance.refresh_from_db()
+                with mock.patch.object(signals._rebuilder, 'submit') as submit:
+                    instance.save()
+                # all plants: marked stale at once, rebuilt in the background
+                self.assertTrue(self.snapshot().stale)
+                self.assertEqual(self.snapshot().version, before.version)
+                self.assertEqual(submit.call_count, 1)
+                scopes, = submit.call_args.args
+                self.assertEqual(scopes, expected)
+                with self.client_for() as client:
+                    self.response_cache.invalidate()
+                    response = client.get('/api/v1/statistic/category-1?plant_id=large&language=de')
+                    self.assertNotRegex(response.headers['ETag'], r'^"\d+-')  # the ETag of the body, not of a snapshot
+                    self.assertEqual(response.json()['data']['category-1']['name'], f'Renamed {n}')
+
+                signals._rebuilder.submit(scopes)
+                self.assertRebuilt(before, f'Renamed {n}')
+
+    def test_several_plants(self):
+        from . import signals
+        before = self.snapshot()
+        with mock.patch.object(signals._rebuilder, 'submit') as submit:
+            with transaction.atomic():
+                for statistic in VizStatistics.objects.filter(url_name__in=('url', 'url-0')):
+                    statistic.url = 'https://example.org/both'
+                    statistic.save()
+        # more plants than CATALOG_SNAPSHOT_SYNC_PLANTS: nothing is rendered on commit
+        self.assertEqual(list(CatalogSnapshot.objects.values_list('stale', flat=True)), [True, True])
+        self.assertEqual(self.snapshot().version, before.version)
+        scopes, = submit.call_args.args
+        signals._rebuilder.submit(scopes)
+        self.assertRebuilt(before, 'https://example.org/both')
+        self.assertFalse(self.snapshot('small').stale)
+
+    def test_new_sub_category(self):
+        before = self.snapshot()
+        with transaction.atomic():
+            category = StatisticCategory.objects.get(category_id='category-0')
+            sub_category = StatisticSubCategory.objects.create(category=category, sub_category_id='sub-new')
+            StatisticSubCategoryLocalization.objects.create(sub_category=sub_category, language=Language.objects.get(), sub_category_name='New', url='/')
+            VizStatistics.objects.create(plant=PlantInfo.objects.get(plant_id='large'), sub_category=sub_category, url_name='new', url='https://example.org/new')
+        self.assertRebuilt(before, 'https://example.org/new')
+
+    def test_rollback(self):
+        from . import signals
+        small = PlantInfo.objects.get(plant_id='small')
+        statistic = VizStatistics.objects.get(plant__plant_id='large', url_name='url-0')
+        with mock.patch.object(signals, 'rebuild_snapshots') as rebuild:
+            with self.assertRaises(ValueError), transaction.atomic():
+                statistic.url = 'https://example.org/rolled-back'
+                statistic.save()
+                raise ValueError
+            with transaction.atomic():
+                with self.assertRaises(ValueError), transaction.atomic():
+                    StatisticCategory.objects.first().save()
+                    raise ValueError
+                small.save()
+        # only the plant saved in the committed transaction
+        self.assertEqual(rebuild.call_args_list, [mock.call(frozenset([small.pk]), None)])
+
+    def test_failed_rebuild(self):
+        from django.core.management import call_command
+        before = self.snapshot()
+        statistic = VizStatistics.objects.get(plant__plant_id='large', url_name='url-0')
+        statistic.url = 'https://example.org/failed'
+        with mock.patch('database.signals.rebuild_snapshots', side_effect=RuntimeError), self.assertLogs('database.signals'):
+            statistic.save()
+        self.assertTrue(self.snapshot().stale)
+
+        # the routes render the catalog from its tables meanwhile
+        with self.client_for() as client:
+            self.response_cache.invalidate()
+            response = client.get('/api/v1/statistic/category-0?plant_id=large&language=de')
+            self.assertNotRegex(response.headers['ETag'], r'^"\d+-')  # the ETag of the body, not of a snapshot
+            self.assertIn('https://example.org/failed', response.text)
+
+        call_command('rebuild_catalog_snapshots', '--stale', stdout=mock.Mock())
+        self.assertRebuilt(before, 'https://example.org/failed')
+
+    def test_multi_language_cache(self):
+        from .snapshots import rebuild_snapshots
+        with transaction.atomic():
+            english = Language.objects.create(code='en', name='English')
+            for category in StatisticCategory.objects.all():
+                StatisticCategoryLocalization.objects.create(category=category, language=english, category_name='Category', url='/')
+            for sub_category in StatisticSubCategory.objects.all():
+                StatisticSubCategoryLocalization.objects.create(sub_category=sub_category, language=english, sub_category_name='Sub', url='/')
+        wait_for_rebuilds()
+
+        url = '/api/v1/statistic/category-0?plant_id=large&language=de,en'
+        with self.client_for() as client:
+            self.response_cache.invalidate()
+            self.assertEqual(client.get(url).headers['X-Cache'], 'MISS')
+            self.assertEqual(client.get(url).headers['X-Cache'], 'HIT')
+
+            # rebuilt by another process, which the signals of this one miss
+            StatisticCategoryLocalization.objects.filter(language=english).update(category_name='Renamed')
+            rebuild_snapshots(language_ids=[english.pk])
+            response = client.get(url)
+            self.assertEqual(response.headers['X-Cache'], 'MISS')
+            self.assertEqual(response.json()['data']['en']['category-0']['name'], 'Renamed')
+            self.assertEqual(client.get(url).headers['X-Cache'], 'HIT')
+
+
+class StatisticQueryBudgetTests(StatisticRouteTestCase):
+    """
+    The statistic routes run a fixed number of queries however many statistics
+    a plant has, with or without a catalog snapshot, sync and async.
+    """
+    # queries of a response rendered past the response cache, counted by data_api.metrics
+    MAX_QUERIES = 3
+
+    def assertQueryBudget(self, client, url, cache="MISS"):
+        """
+        Request ``url`` and check it stays within MAX_QUERIES, the number of
+        queries it ran.
+        """
+        response = client.get(url)
+        self.assertEqual(response.status_code, 200, response.text)
+        self.assertEqual(response.headers["X-Cache"], cache)
+        queries = int(response.headers["X-DB-Queries"])
+        self.assertLessEqual(queries, self.MAX_QUERIES, f"{url} ran {queries} queries")
+        return queries
+
+    def assertConstantQueries(self, async_routes):
+        from fastapi.testclient import TestClient
+        from data_api import metrics
+        from data_api.main import create_app
+
+        with mock.patch.object(metrics, 'DB_HEADERS', True), TestClient(create_app(async_routes=async_routes)) as client:
+            for snapshots in (True, False):
+                if not snapshots:
+                    CatalogSnapshot.objects.all().delete()
+                self.response_cache.invalidate()
+                for path in ('/api/v1/statistic', '/api/v1/statistic/category-0', '/api/v1/statistic/category-0/sub-0'):
+                    with self.subTest(path=path, snapshots=snapshots):
+                        # without a snapshot responses are not cached
+                        cache = "MISS" if snapshots else "BYPASS"
+                        small = self.assertQueryBudget(client, f'{path}?plant_id=small&language=de', cache)
+                        large = self.assertQueryBudget(client, f'{path}?plant_id=large&language=de', cache)
+                        self.assertEqual(small, large)
+
+    def test_sync_routes(self):
+        self.assertConstantQueries(async_routes=False)
+
+    def test_async_routes(self):
+        self.assertConstantQueries(async_routes=True)
+
+    def test_sparse_fields(self):
+        from fastapi.testclient import TestClient
+        from data_api.main import create_app
+        from .catalog import load_catalog
+
+        with TestClient(create_app()) as client:
+            for snapshots in (True, False):
+                if not snapshots:
+                    CatalogSnapshot.objects.all().delete()
+                for query in ('fields=urls,name', 'include=name&fields=urls', 'exclude=api_url,description,var_names'):
+                    with self.subTest(query=query, snapshots=snapshots):
+                        response = client.get(f'/api/v1/statistic/category-0?plant_id=large&language=de&{query}')
+                        self.assertEqual(response.status_code, 200, response.text)
+                        for item in response.json()['data']['category-0']['items'].values():
+                            self.assertEqual(list(item), ['name', 'urls'])
+
+            response = client.get('/api/v1/statistic?plant_id=large&language=de&fields=urls,colour')
+            self.assertEqual(response.status_code, 400)
+
+        # the variables are only queried for the var_names field
+        language = Language.objects.get(code='de')
+        plant = PlantInfo.objects.get(plant_id='large')
+        for fields, queries in ((None, 5), (('name', 'urls'), 4)):
+            with self.subTest(fields=fields), CaptureQueriesContext(connection) as context:
+                load_catalog(plant, language, fields=fields)
+            self.assertEqual(len(context), queries, [query['sql'] for query in context])
+
+
+class LoadTestSmokeTests(StatisticRouteTestCase):
+    """
+    benchmarks.load_test drives the app in-process and reports the throughput,
+    latency percentiles and error rate of every route.
+    """
+    def test_in_process(self):
+        import io
+        from contextlib import redirect_stdout
+        from benchmarks import load_test
+
+        for flags in ([], ['--async']):
+            argv = ['load_test', '--users', '3', '--duration', '1', '--think-time', '0.05', '--etag', '--json', *flags]
+            with self.subTest(flags=flags), mock.patch('sys.argv', argv), redirect_stdout(io.StringIO()) as output:
+                load_test.main()
+                report = json.loads(output.getvalue())
+                self.assertEqual(report['config']['target'], 'in-process')
+                self.assertEqual(set(report['routes']), set(load_test.ROUTES))
+                for row in [report['total'], *report['routes'].values()]:
+                    for key in ('throughput', 'p50_ms', 'p95_ms', 'p99_ms', 'error_rate'):
+                        self.assertIn(key, row)
+                total = report['total']
+                self.assertGreater(total['requests'], 0)
+                self.assertGreater(total['throughput'], 0)
+                self.assertLessEqual(total['p50_ms'], total['p95_ms'])
+                self.assertLessEqual(total['p95_ms'], total['p99_ms'])
+                self.assertEqual(total['error_rate'], 0.0, report['statuses'])
+
+
+class AdminChangelistQueryTests(TestCase):
+    """
+    Every changelist of the admin runs the same number of queries whatever the
+    number of rows it lists: no foreign key followed row by row.
+    """
+    def setUp(self):
+        user = User.objects.create_superuser('admin', 'admin@example.com', 'admin')
+        self.client.force_login(user)
+        self.rows = 0
+
+    def add_rows(self, count):
+        for n in range(self.rows, self.rows + count):
+            language = Language.objects.create(code=f'l{n}', name=f'Language {n}')
+            category = StatisticCategory.objects.create(category_id=f'category-{n}')
+            StatisticCategoryLocalization.objects.create(category=category, language=language, category_name=f'Category {n}', url='/')
+            sub_category = StatisticSubCategory.objects.create(category=category, sub_category_id=f'sub-{n}')
+            StatisticSubCategoryLocalization.objects.create(sub_category=sub_category, language=language, sub_category_name=f'Sub {n}', url='/')
+            StatisticsVar.objects.create(sub_category=sub_category, variable_key='threshold', variable_value={'value': n})
+            plant = PlantInfo.objects.create(plant_id=f'plant-{n}', plant_name=f'Plant {n}', plant_location='here')
+            VizStatistics.objects.create(plant=plant, sub_category=sub_category, url_name='url', url='https://example.com')
+            CatalogSnapshot.objects.create(plant=plant, language=language, data={})
+            template = CatalogTemplate.objects.create(name=f'template-{n}')
+            CatalogTemplateItem.objects.create(template=template, sub_category=sub_category, url_name='url', url_pattern='/{plant_id}')
+        self.rows += count
+
+    def changelist_queries(self):
+        queries = {}
+        for model in admin.site._registry:
+            if model._meta.app_label != 'database':
+                continue
+            url = reverse(f'admin:database_{model._meta.model_name}_changelist')
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            queries[url] = len(context)
+        return queries
+
+    def test_changelists(self):
+        self.add_rows(1)
+        few = self.changelist_queries()
+        self.add_rows(5)
+        many = self.changelist_queries()
+        for url, count in few.items():
+            with self.subTest(url=url):
+                self.assertEqual(many[url], count)
+
+    def test_sub_category_inline_pages(self):
+        self.add_rows(1)
+        sub_category = StatisticSubCategory.objects.get()
+        plants = [PlantInfo.objects.create(plant_id=f'paged-{n}', plant_name=f'Paged {n}', plant_location='here') for n in range(25)]
+        VizStatistics.objects.bulk_create(
+            [VizStatistics(plant=plant, sub_category=sub_category, url_name='url', url='https://example.com') for plant in plants]
+        )
+
+        url = reverse('admin:database_statisticsubcategory_change', args=[sub_category.pk])
+        first = self.client.get(url)
+        last = self.client.get(url, {'visual_statistics-page': 2})
+        self.assertEqual(first.context['inline_admin_formsets'][1].formset.initial_form_count(), 20)
+        self.assertEqual(last.context['inline_admin_formsets'][1].formset.initial_form_count(), 6)
+        self.assertContains(first, 'page 1 of 2, 26 Visual Statistics')
@@ -78,14 +78,119 @@ WSGI_APPLICATION = 'external_viz_manager.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': os.environ.get('DATABASE_ENGINE'),
-        'NAME': os.environ.get('DATABASE_NAME') if not 'sqlite3' in os.environ.get('DATABASE_ENGINE') else BASE_DIR / 'db.sqlite3',
+        'NAME': os.environ.get('DATABASE_NAME') if not 'sqlite3' in os.environ.get('DATABASE_ENGINE', '') else BASE_DIR / 'db.sqlite3',
         'USER': os.environ.get('DATABASE_USER'),
         'PASSWORD': os.environ.get('DATABASE_PASSWD'),
         'HOST': os.environ.get('DATABASE_HOST'),
-        'PORT': os.environ.get('DATABASE_PORT')
+        'PORT': os.environ.get('DATABASE_PORT'),
+        # bounded per process pool of the database.backends.postgresql backend:
+        # SIZE connections kept open, MAX_OVERFLOW more under load, waiting TIMEOUT
+        # seconds at most for one; connections are reopened after MAX_AGE seconds
+        # and checked with SELECT 1 before reuse with PRE_PING
+        'POOL': {
+            'SIZE': int(os.getenv('DATABASE_POOL_SIZE', 5)),
+            'MAX_OVERFLOW': int(os.getenv('DATABASE_POOL_MAX_OVERFLOW', 5)),
+            'TIMEOUT': float(os.getenv('DATABASE_POOL_TIMEOUT', 10)),
+            'MAX_AGE': float(os.getenv('DATABASE_POOL_MAX_AGE', 300)),
+            'PRE_PING': os.getenv('DATABASE_POOL_PRE_PING', 'true').lower() in ('1', 'true', 'yes'),
+        },
     }
 }
 
+# PostgreSQL connections are pooled unless DATABASE_POOL is turned off
+
+if DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql' and os.getenv('DATABASE_POOL', 'true').lower() in ('1', 'true', 'yes'):
+    DATABASES['default']['ENGINE'] = 'database.backends.postgresql'
+
+
+# Serve the statistic routes of data_api with async handlers and Django's async
+# ORM instead of sync handlers run in the threadpool
+
+DATA_API_ASYNC = os.getenv('DATA_API_ASYNC', 'false').lower() in ('1', 'true', 'yes')
+
+
+# In-process cache of rendered data_api responses
+
+DATA_API_RESPONSE_CACHE = {
+    'MAX_ENTRIES': int(os.getenv('DATA_API_CACHE_MAX_ENTRIES', 1024)),
+    'MAX_BYTES': int(os.getenv('DATA_API_CACHE_MAX_BYTES', 64 * 1024 * 1024)),
+    'TTL': float(os.getenv('DATA_API_CACHE_TTL', 300)),
+}
+
+
+# Cache shared by the data_api workers, Redis when REDIS_URL is set and
+# disabled otherwise. Catalog writes move its version key forward.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'catalog': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('REDIS_URL'),
+        'TIMEOUT': int(os.getenv('DATA_API_SHARED_CACHE_TTL', 3600)),
+        'OPTIONS': {
+            'socket_connect_timeout': 0.5,
+            'socket_timeout': 0.5,
+        },
+    } if os.getenv('REDIS_URL') else {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+    },
+}
+
+DATA_API_SHARED_CACHE = {
+    'LOCK_TIMEOUT': float(os.getenv('DATA_API_SHARED_CACHE_LOCK_TIMEOUT', 10)),
+    'LOCK_WAIT': float(os.getenv('DATA_API_SHARED_CACHE_LOCK_WAIT', 2)),
+    'RETRY_AFTER': float(os.getenv('DATA_API_SHARED_CACHE_RETRY_AFTER', 30)),
+}
+
+# Cache-Control of the statistic responses, clients revalidate them with the ETag
+
+DATA_API_CACHE_CONTROL = os.getenv('DATA_API_CACHE_CONTROL', 'max-age=0, must-revalidate')
+
+# Largest number of items accepted by POST /api/v1/statistic/batch
+
+DATA_API_BATCH_MAX_ITEMS = int(os.getenv('DATA_API_BATCH_MAX_ITEMS', 500))
+
+# Seconds a worker keeps its in-memory domain / plant_id index of the plants
+# before reloading it, changes made by other processes are seen at the latest then
+
+DATA_API_PLANT_RESOLVER_TTL = float(os.getenv('DATA_API_PLANT_RESOLVER_TTL', 30))
+
+# Seconds a worker keeps its in-memory registry of languages, categories, sub
+# categories and their localizations before reloading it
+
+DATA_API_REFERENCE_DATA_TTL = float(os.getenv('DATA_API_REFERENCE_DATA_TTL', 30))
+
+# Transactions touching at most this many plants rebuild their snapshots on
+# commit, larger ones (a category, a localization, an import, ...) mark the
+# snapshots stale and rebuild them in a background thread of the process
+
+CATALOG_SNAPSHOT_SYNC_PLANTS = int(os.getenv('CATALOG_SNAPSHOT_SYNC_PLANTS', 1))
+
+# Plants rendered at a time by the NDJSON catalog export
+
+DATA_API_EXPORT_CHUNK_SIZE = int(os.getenv('DATA_API_EXPORT_CHUNK_SIZE', 100))
+
+# Database queries a data_api request may run, and the seconds spent in them,
+# before it is logged as a warning. HEADERS returns both as X-DB-Queries and
+# X-DB-Time, for development and load tests.
+
+DATA_API_QUERY_BUDGET = {
+    'HEADERS': os.getenv('DATA_API_DB_HEADERS', 'false').lower() in ('1', 'true', 'yes'),
+    'MAX_QUERIES': int(os.getenv('DATA_API_MAX_QUERIES', 10)),
+    'MAX_TIME': float(os.getenv('DATA_API_MAX_DB_TIME', 0.5)),
+}
+
+# Compression of data_api responses. Cached statistic responses are compressed
+# once with gzip and brotli (when installed), other responses are gzipped on the fly.
+
+DATA_API_COMPRESSION = {
+    'MIN_SIZE': int(os.getenv('DATA_API_COMPRESS_MIN_SIZE', 1024)),
+    'GZIP_LEVEL': int(os.getenv('DATA_API_GZIP_LEVEL', 6)),
+    'BROTLI_QUALITY': int(os.getenv('DATA_API_BROTLI_QUALITY', 5)),
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
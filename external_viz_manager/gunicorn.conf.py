@@ -0,0 +1,55 @@
+"""
+Gunicorn settings of the data API, run by supervisord from this directory:
+
+    gunicorn -c gunicorn.conf.py data_api.main:app -b HOST:PORT
+
+The app is imported once by the master (preload_app), which also builds the
+in-memory indexes, then drops its database connections before every fork:
+workers start warm and open their own connections. DATA_API_RELOAD restores
+the former development mode, without preloading.
+
+Workers write their Prometheus samples to PROMETHEUS_MULTIPROC_DIR, emptied
+when the master starts, so that /metrics adds up those of every worker.
+"""
+import os
+import glob
+
+workers = int(os.getenv('DATA_API_WORKERS', 4))
+worker_class = 'uvicorn.workers.UvicornWorker'
+reload = os.getenv('DATA_API_RELOAD', 'false').lower() in ('1', 'true', 'yes')
+preload_app = not reload
+
+# before the app is loaded: prometheus_client picks its mode at import
+metrics_dir = os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/data_api_metrics')
+os.makedirs(metrics_dir, exist_ok=True)
+
+
+def on_starting(server):
+    # samples left by the workers of a previous run
+    for path in glob.glob(os.path.join(metrics_dir, '*.db')):
+        os.remove(path)
+
+
+def when_ready(server):
+    if not preload_app:
+        return
+
+    from data_api.warmup import warm_indexes
+    if not warm_indexes():
+        server.log.warning("indexes not warm before forking, workers build them at startup")
+
+
+def pre_fork(server, worker):
+    if not preload_app:
+        return
+
+    from data_api.warmup import reset_connections
+    reset_connections()
+
+
+def child_exit(server, worker):
+    try:
+        from prometheus_client import multiprocess
+    except ImportError:
+        return
+    multiprocess.mark_process_dead(worker.pid)